@@ -0,0 +1,187 @@
+# asgi_app.py
+# ASGI serving mode: the web IVR JSON API (/fetch_customer, /register,
+# /intent) and the Twilio webhooks from milestone2 in one FastAPI app, so
+# both IVR channels can run in a single uvicorn process:
+#
+#   uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+#
+# The web endpoints call the same process_* handlers as the Flask app. Their
+# blocking SQLite work runs on a bounded thread pool, so the event loop keeps
+# serving webhooks while queries are in flight.
+import asyncio
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+
+import milestone2
+import milestone4_backend as backend
+
+# ------------------ DB Executor ------------------
+DB_THREADS = int(os.environ.get("IVR_DB_THREADS", "8"))
+DB_MAX_PENDING = int(os.environ.get("IVR_DB_MAX_PENDING", "64"))
+
+db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="ivr-db")
+_db_slots = None  # created inside the running loop
+
+
+async def run_db(fn, *args):
+    """Run blocking `fn(*args)` on the DB pool; waits when DB_MAX_PENDING calls are already queued."""
+    global _db_slots
+    if _db_slots is None:
+        _db_slots = asyncio.Semaphore(DB_MAX_PENDING)
+    async with _db_slots:
+        return await asyncio.get_running_loop().run_in_executor(db_executor, fn, *args)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    backend.init_db()
+    milestone2.init_db()  # the mounted Twilio routes' lifespan does not run here
+    backend.prompt_audio_cache.start()
+    yield
+    db_executor.shutdown(wait=True)
+
+
+# ------------------ FastAPI app ------------------
+app = FastAPI(title="SmartTel IVR", lifespan=lifespan)
+
+
+def _too_many_requests(limited):
+    payload, status, retry_after = limited
+    return JSONResponse(payload, status_code=status, headers={"Retry-After": str(math.ceil(retry_after))})
+
+
+async def _route_limit(endpoint, request):
+    """The 429 response if `request` is over the Flask app's limit for `endpoint`, else None."""
+    limited = await run_db(backend.check_route_limit, endpoint, request.client.host if request.client else None)
+    return _too_many_requests(limited) if limited else None
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+# Each web route applies the same limits as the Flask app's limit_by_address
+# hook, under the Flask endpoint name.
+@app.get("/")
+async def index(request: Request):
+    limited = await _route_limit("index", request)
+    if limited:
+        return limited
+    return FileResponse("milestone4_frontend.html")
+
+
+@app.post("/fetch_customer")
+async def fetch_customer(request: Request):
+    limited = await _route_limit("fetch_customer", request)
+    if limited:
+        return limited
+    payload, status = await run_db(backend.process_fetch_customer, await _json_body(request))
+    return JSONResponse(payload, status_code=status)
+
+
+@app.post("/session/start")
+async def session_start(request: Request):
+    limited = await _route_limit("session_start", request)
+    if limited:
+        return limited
+    payload, status = await run_db(backend.process_session_start, await _json_body(request))
+    return JSONResponse(payload, status_code=status)
+
+
+@app.post("/register")
+async def register(request: Request):
+    limited = await _route_limit("register", request)
+    if limited:
+        return limited
+    payload, status = await run_db(backend.process_register, await _json_body(request))
+    return JSONResponse(payload, status_code=status)
+
+
+@app.post("/intent")
+async def intent(request: Request):
+    limited = await _route_limit("intent", request)
+    if limited:
+        return limited
+    data = await _json_body(request)
+    limited = await run_db(backend.check_intent_limit, data, request.client.host if request.client else None)
+    if limited:
+        return _too_many_requests(limited)
+    payload, status = await run_db(backend.process_intent, data, request.headers.get("Idempotency-Key"))
+    return JSONResponse(payload, status_code=status)
+
+
+@app.post("/intent/stream")
+async def intent_stream(request: Request):
+    limited = await _route_limit("intent_stream", request)
+    if limited:
+        return limited
+    data = await _json_body(request)
+    limited = await run_db(backend.check_intent_limit, data, request.client.host if request.client else None)
+    if limited:
+        return _too_many_requests(limited)
+    payload, status = await run_db(backend.process_intent, data, request.headers.get("Idempotency-Key"))
+    if status != 200:
+        return JSONResponse(payload, status_code=status)
+    return StreamingResponse(backend.stream_intent_events(payload), media_type="text/event-stream",
+                             headers=backend.SSE_HEADERS)
+
+
+@app.post("/intent/batch")
+async def intent_batch(request: Request):
+    limited = await _route_limit("intent_batch", request)
+    if limited:
+        return limited
+    payload, status = await run_db(backend.process_intent_batch, await _json_body(request))
+    return JSONResponse(payload, status_code=status)
+
+
+@app.get("/menu/{name}")
+async def menu(name: str, request: Request):
+    limited = await _route_limit("menu", request)
+    if limited:
+        return limited
+    payload, status = backend.process_menu(name)
+    return JSONResponse(payload, status_code=status, headers={"Cache-Control": "public, max-age=3600"})
+
+
+@app.get("/tts")
+async def tts(request: Request):
+    limited = await _route_limit("tts", request)
+    if limited:
+        return limited
+    body, status, headers = await run_db(backend.process_tts, request.query_params.get("text"),
+                                         request.headers.get("range"), request.headers.get("if-none-match"),
+                                         request.query_params.get("sig"))
+    if isinstance(body, bytes):
+        return Response(body, status_code=status, headers=headers)
+    return StreamingResponse(body, status_code=status, headers=headers)
+
+
+@app.get("/cache/stats")
+async def cache_stats(request: Request):
+    limited = await _route_limit("cache_stats", request)
+    if limited:
+        return limited
+    return {"status": "ok", "customer_cache": backend.customer_cache.stats(), "sessions": len(backend.sessions)}
+
+
+# Twilio voice channel (milestone2) served from the same process.
+for route in milestone2.app.router.routes:
+    if getattr(route, "path", "").startswith(("/twilio", "/ivr")):
+        app.router.routes.append(route)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(os.environ.get("PORT", 5000))
+    print(f"Starting ASGI backend on port {port}")
+    uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,54 @@
+# bench_classifier.py
+# The n-gram intent model against the keyword engine: accuracy on the
+# held-out paraphrases in models/intent_eval.tsv, per-utterance latency,
+# batch scoring (one matrix multiply for many utterances), and the cost of
+# opening the model memory-mapped versus reading it into memory.
+#
+#   python benchmarks/bench_classifier.py [--batch 100]
+import argparse
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import harness  # noqa: E402
+import intent_classifier  # noqa: E402
+import intent_engine  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+
+    model = intent_classifier.load()
+    if model is None:
+        sys.exit(f"no model: {intent_classifier._load_error}")
+    examples = intent_classifier.read_examples(intent_classifier.EVAL_PATH)
+    for name, accuracy in intent_classifier.evaluate(examples, model).items():
+        print(f"{name:<18} {accuracy:6.1%} of {len(examples)} held-out utterances")
+    print()
+
+    np = intent_classifier.np
+    texts = [text for _, text in examples]
+    batch = (texts * (args.batch // len(texts) + 1))[:args.batch]
+    counter = iter(range(10**12))
+    text = lambda: texts[next(counter) % len(texts)]  # noqa: E731
+    cases = {
+        "keywords, one utterance": lambda: intent_engine.classify(text()),
+        "model + fallback, one utterance": lambda: intent_classifier.classify(text()),
+        f"keywords, {args.batch} utterances": lambda: [intent_engine.classify(t) for t in batch],
+        f"model, {args.batch} one at a time": lambda: [intent_classifier.classify(t) for t in batch],
+        f"model, {args.batch} as one batch": lambda: intent_classifier.classify_many(batch),
+        "open model, mmap": lambda: np.load(intent_classifier.MODEL_PATH, mmap_mode="r"),
+        "open model, read": lambda: np.load(intent_classifier.MODEL_PATH),
+    }
+    results = {name: harness.summarize(harness.measure(fn, warmup=20, repeat=20, number=20))
+               for name, fn in cases.items()}
+    harness.report(results)
+
+
+if __name__ == "__main__":
+    main()
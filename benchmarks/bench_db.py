@@ -0,0 +1,123 @@
+# bench_db.py
+# Per-request DB latency of an /intent turn: the old connect-per-statement
+# helpers against the pooled WAL connections in ivr_db.
+#
+#   python benchmarks/bench_db.py [--turns 2000] [--threads 8]
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ivr_db  # noqa: E402
+from harness import percentile  # noqa: E402
+
+
+# ------------------ Legacy helpers (as in the original milestone4_backend) ------------------
+def legacy_fetch(db, cid):
+    conn = sqlite3.connect(db)
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM customers WHERE id=?", (cid,))
+    row = cur.fetchone()
+    conn.close()
+    return row
+
+def legacy_update_balance(db, cid, balance):
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE customers SET balance=? WHERE id=?", (balance, cid))
+    conn.commit()
+    conn.close()
+
+def legacy_turn(db, cid, write):
+    row = legacy_fetch(db, cid)
+    if write:
+        legacy_update_balance(db, cid, row[3] + 1)
+
+def pooled_turn(db, cid, write):
+    ivr_db.fetch_customer(db, cid)
+    if write:
+        ivr_db.add_balance(db, cid, 1)
+
+
+# ------------------ Harness ------------------
+def setup(db, wal):
+    conn = sqlite3.connect(db)
+    if wal:
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(ivr_db.SQL_CREATE_CUSTOMERS)
+    conn.executemany(ivr_db.SQL_SAVE_CUSTOMER, [
+        (str(1000 + i), f"User{i}", "SmartPlan 299", 150.0, "9999999999", "1.5 GB") for i in range(100)
+    ])
+    conn.commit()
+    conn.close()
+
+def run_serial(turn, db, turns, write):
+    samples = []
+    for i in range(turns):
+        start = time.perf_counter()
+        turn(db, str(1000 + i % 100), write)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def run_threaded(turn, db, turns, threads):
+    errors = []
+    samples = []
+    lock = threading.Lock()
+
+    def worker(n):
+        local = []
+        for i in range(turns // threads):
+            start = time.perf_counter()
+            try:
+                turn(db, str(1000 + (n * 7 + i) % 100), True)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+            local.append(time.perf_counter() - start)
+        with lock:
+            samples.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return samples, time.perf_counter() - start, errors
+
+def report(label, samples):
+    print(f"{label:<28} p50 {percentile(samples, 50) * 1e6:8.1f} us   "
+          f"p95 {percentile(samples, 95) * 1e6:8.1f} us   "
+          f"p99 {percentile(samples, 99) * 1e6:8.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The legacy path never enabled WAL, so it gets a rollback-journal file.
+        legacy_db = os.path.join(tmp, "legacy.db")
+        pooled_db = os.path.join(tmp, "pooled.db")
+        setup(legacy_db, wal=False)
+        setup(pooled_db, wal=True)
+        runs = (("legacy", legacy_turn, legacy_db), ("pooled", pooled_turn, pooled_db))
+
+        for write in (False, True):
+            kind = "write turn" if write else "read turn"
+            for label, turn, db in runs:
+                report(f"{label}  {kind}", run_serial(turn, db, args.turns, write))
+
+        for label, turn, db in runs:
+            samples, elapsed, errors = run_threaded(turn, db, args.turns, args.threads)
+            report(f"{label}  {args.threads} threads", samples)
+            print(f"{'':<28} {len(samples) / elapsed:8.0f} turns/s   {len(errors)} lock errors")
+        ivr_db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# bench_dialer.py
+# Outbound campaign throughput against dialer.FakeTwilioServer: calling
+# make_call-style one target at a time, against dialer.Dialer at several
+# concurrency levels with and without token-bucket pacing. The fake answers
+# after `--latency-ms` and refuses calls above `--cps` with 429, like the
+# Twilio REST API.
+#
+#   python benchmarks/bench_dialer.py [--calls 200] [--latency-ms 150] [--cps 40]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import dialer  # noqa: E402
+import ivr_db  # noqa: E402
+import milestone2  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--cps", type=int, default=40)
+    args = parser.parse_args()
+
+    def targets():
+        return (dialer.Target(f"+91{n:08d}") for n in range(args.calls))
+
+    print(f"{args.calls} calls, API latency {args.latency_ms:g} ms, provider limit {args.cps} calls/s")
+    print(f"{'mode':<36}{'seconds':>9}{'placed/s':>10}{'failed':>8}{'429s':>7}{'attempts':>10}")
+
+    def row(mode, seconds, fake, placed, attempts):
+        print(f"{mode:<36}{seconds:9.2f}{placed / seconds:10.1f}{args.calls - placed:8d}{fake.throttled:7d}"
+              f"{attempts:10d}")
+
+    fake = dialer.FakeTwilioServer(cps=args.cps, latency=args.latency_ms / 1000)
+    client = fake.client()
+    start = time.perf_counter()
+    for target in targets():
+        try:
+            milestone2.place_call(target.phone, twilio_client=client)
+        except Exception:
+            pass
+    row("one at a time", time.perf_counter() - start, fake, len(fake.calls), args.calls)
+    fake.close()
+
+    paced = f"{int(args.cps * 0.9)} per second"
+    for concurrency, rate in ((8, paced), (32, paced), (32, "100000 per second")):
+        fake = dialer.FakeTwilioServer(cps=args.cps, latency=args.latency_ms / 1000)
+        client = fake.client()
+        path = os.path.join(tempfile.mkdtemp(prefix="ivr-dialer-bench-"), "dialer.db")
+        campaign = dialer.Dialer(lambda phone: milestone2.place_call(phone, twilio_client=client), "bench",
+                                 path=path, concurrency=concurrency, rate=rate, burst=1, backoff=0.5)
+        start = time.perf_counter()
+        stats = campaign.run(targets())
+        label = f"{concurrency} concurrent, " + (f"paced {rate}" if rate == paced else "unpaced")
+        row(label, time.perf_counter() - start, fake, stats["placed"], stats["attempts"])
+        fake.close()
+        ivr_db.close_connections(path)
+
+
+if __name__ == "__main__":
+    main()
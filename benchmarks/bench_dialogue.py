@@ -0,0 +1,93 @@
+# bench_dialogue.py
+# Runs a scripted call through milestone3.main_ivr with the replay speech
+# input, so the dialogue can be timed with no microphone, network or
+# speakers. Reports how long the IVR took to answer each caller turn
+# (everything between one listen() and the next: intent, database, speech
+# output) and the whole call.
+#
+#   python benchmarks/bench_dialogue.py [--calls 20] [--script turns.txt] [--backend sphinx]
+#
+# A script has one caller turn per line: the words said, or a WAV file path
+# to run through the recognition backend.
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import speech_input  # noqa: E402
+
+DEFAULT_SCRIPT = [
+    "one zero zero one",
+    "main menu",
+    "check balance",
+    "what is my plan",
+    "any offers",
+    "recharge",
+    "299",
+    "exit",
+]
+
+
+class TimedReplay(speech_input.ReplayInput):
+    def __init__(self, items, backend=None):
+        super().__init__(items, backend)
+        self.turns = []
+        self._last = None
+
+    def listen(self, timeout=None):
+        now = time.perf_counter()
+        if self._last is not None:
+            self.turns.append(now - self._last)
+        try:
+            return super().listen(timeout)
+        finally:
+            self._last = time.perf_counter()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--script", help="file with one caller turn per line")
+    parser.add_argument("--backend", help="recognition backend for WAV turns (default: IVR_SPEECH_BACKEND)")
+    args = parser.parse_args()
+
+    items = DEFAULT_SCRIPT
+    if args.script:
+        with open(os.path.abspath(args.script), encoding="utf-8") as f:
+            items = [line.rstrip("\n") for line in f]
+    backend = speech_input.create_backend(args.backend) if args.backend else None
+
+    scratch = tempfile.mkdtemp(prefix="ivr-dialogue-bench-")
+    os.chdir(scratch)
+    os.environ.setdefault("IVR_TTS_OUTPUT_DIR", os.path.join(scratch, "tts"))
+    import milestone3
+
+    calls, turns, listens = [], [], []
+    for _ in range(args.calls):
+        milestone3.speech_in = replay = TimedReplay(items, backend)
+        start = time.perf_counter()
+        try:
+            milestone3.main_ivr()
+        except EOFError:
+            pass
+        calls.append(time.perf_counter() - start)
+        turns.extend(replay.turns)
+        listens.extend(replay.latencies)
+
+    def row(label, samples):
+        print(f"{label:<22}{statistics.median(samples) * 1000:9.2f} ms"
+              f"{statistics.fmean(samples) * 1000:9.2f} ms{max(samples) * 1000:9.2f} ms")
+
+    print(f"\n{'':<22}{'p50':>12}{'mean':>12}{'max':>12}")
+    row("IVR response per turn", turns)
+    row("speech input", listens)
+    row("whole call", calls)
+
+
+if __name__ == "__main__":
+    main()
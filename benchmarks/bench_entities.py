@@ -0,0 +1,91 @@
+# bench_entities.py
+# Spoken customer-ID handling: the chained str.replace mapping the local
+# IVR used before against entities.spoken_digits(), and settling a
+# misheard ID with one query per guessed variant against the in-memory
+# CustomerIndex. Also prints how many sample utterances each normalizer
+# turns into the intended digits.
+#
+#   python benchmarks/bench_entities.py [--customers 10000]
+import argparse
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import entities  # noqa: E402
+import harness  # noqa: E402
+import ivr_db  # noqa: E402
+
+SAMPLES = {
+    "one zero zero one": "1001",
+    "1001": "1001",
+    "1 0 0 1": "1001",
+    "one oh oh one": "1001",
+    "ten oh one": "1001",
+    "one double zero one": "1001",
+    "my id is four five six seven": "4567",
+    "triple seven two": "7772",
+    "twenty twenty one": "2021",
+}
+
+
+def chained_replace(text):
+    text = text.replace(" ", "")
+    mapping = {"one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6", "seven": "7",
+               "eight": "8", "nine": "9", "zero": "0"}
+    for w, n in mapping.items():
+        text = text.replace(w, n)
+    return text
+
+
+def guesses(cid):
+    """Every one-edit variant of a digit string, as a caller without an index would try them."""
+    for i in range(len(cid) + 1):
+        for d in "0123456789":
+            yield cid[:i] + d + cid[i:]
+            if i < len(cid):
+                yield cid[:i] + d + cid[i + 1:]
+        if i < len(cid):
+            yield cid[:i] + cid[i + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=10000)
+    args = parser.parse_args()
+
+    for label, fn in (("chained replace", chained_replace), ("entities.spoken_digits", entities.spoken_digits)):
+        right = sum(fn(text) == want for text, want in SAMPLES.items())
+        print(f"{label:<24} {right}/{len(SAMPLES)} sample IDs normalized correctly")
+    print()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="ivr-entities-bench-"), "ivr.db")
+    ivr_db.init_schema(path)
+    with ivr_db.transaction(path) as conn:
+        conn.executemany(ivr_db.SQL_SAVE_CUSTOMER, [(str(100000 + i * 7), "Bench", "SmartPlan 299", 150.0,
+                                                      "9999999999", "1.5 GB") for i in range(args.customers)])
+    index = entities.CustomerIndex(ivr_db.fetch_customer_ids(path))
+    misheard = "100008"  # one digit off 100007
+
+    def query_guesses():
+        for guess in guesses(misheard):
+            if ivr_db.fetch_customer(path, guess):
+                return guess
+
+    texts = list(SAMPLES)
+    cases = {
+        "normalize, chained replace": lambda: [chained_replace(t) for t in texts],
+        "normalize, entities": lambda: [entities.spoken_digits(t) for t in texts],
+        "near miss, query per guess": query_guesses,
+        "near miss, CustomerIndex": lambda: index.resolve(misheard),
+    }
+    results = {name: harness.summarize(harness.measure(fn, warmup=20, repeat=20, number=20))
+               for name, fn in cases.items()}
+    harness.report(results)
+
+
+if __name__ == "__main__":
+    main()
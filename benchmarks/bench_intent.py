@@ -0,0 +1,134 @@
+# bench_intent.py
+# Classification throughput of the compiled intent engine against the
+# if/elif keyword chains it replaced (milestone3 detect_intent and the
+# milestone4 /intent route), plus how each scales with a larger table.
+#
+#   python benchmarks/bench_intent.py [--rounds 20000]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import intent_engine  # noqa: E402
+
+UTTERANCES = [
+    "check balance",
+    "what is my plan",
+    "tell me the latest offers",
+    "upgrade my data",
+    "i have a recharge issue",
+    "recharge two hundred forty nine",
+    "main menu please",
+    "my network keeps dropping",
+    "sim activation is pending",
+    "i want to talk to customer care",
+    "thank you",
+    "bye",
+    "hello there i am not really sure what i need to ask about today",
+]
+
+
+# ------------------ Legacy chains ------------------
+def legacy_detect_intent(user_text):
+    if not user_text:
+        return "unknown"
+    if "balance" in user_text:
+        return "check_balance"
+    elif "plan" in user_text:
+        return "plan_details"
+    elif "offer" in user_text:
+        return "offers"
+    elif "data" in user_text or "upgrade" in user_text:
+        return "data_packs"
+    elif "recharge issue" in user_text:
+        return "recharge_issue"
+    elif "recharge" in user_text:
+        return "recharge"
+    elif "network" in user_text or "signal" in user_text:
+        return "network_issue"
+    elif "sim" in user_text or "activation" in user_text:
+        return "sim_issue"
+    elif "customer" in user_text or "care" in user_text or "talk" in user_text:
+        return "customer_care"
+    elif "exit" in user_text or "bye" in user_text:
+        return "exit"
+    else:
+        return "unknown"
+
+def legacy_backend_route(cmd):
+    if "balance" in cmd:
+        return "check_balance"
+    elif "plan" in cmd:
+        return "plan_details"
+    elif "offer" in cmd:
+        return "offers"
+    elif "data" in cmd or "upgrade" in cmd:
+        return "data_packs"
+    elif "recharge" in cmd:
+        return "recharge"
+    elif "menu" in cmd or "main menu" in cmd:
+        return "menu"
+    elif "network" in cmd or "sim" in cmd or "recharge issue" in cmd or "customer" in cmd or "care" in cmd or "talk" in cmd:
+        return "customer_care"
+    elif "exit" in cmd or "bye" in cmd:
+        return "exit"
+    return "unknown"
+
+
+# ------------------ Scaling ------------------
+def synthetic_table(n_intents, keywords_per_intent):
+    table = list(intent_engine.INTENT_TABLE)
+    for i in range(n_intents):
+        keywords = tuple(f"topic{i}x{k}" for k in range(keywords_per_intent))
+        table.append((f"synthetic_{i}", 1000 + i, keywords))
+    return table
+
+def chain_for(table):
+    rows = sorted(table, key=lambda row: row[1])
+
+    def chain(text):
+        for intent, _, keywords in rows:
+            for keyword in keywords:
+                if keyword in text:
+                    return intent
+        return "unknown"
+    return chain
+
+
+def measure(fn, rounds):
+    for text in UTTERANCES:  # warmup
+        fn(text)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in UTTERANCES:
+            fn(text)
+    elapsed = time.perf_counter() - start
+    calls = rounds * len(UTTERANCES)
+    return calls / elapsed, elapsed / calls * 1e6
+
+def report(label, fn, rounds):
+    rate, per_call = measure(fn, rounds)
+    print(f"{label:<40} {rate:12,.0f} utterances/s   {per_call:6.2f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("Current table")
+    report("legacy milestone3 detect_intent", legacy_detect_intent, args.rounds)
+    report("legacy milestone4 /intent chain", legacy_backend_route, args.rounds)
+    report("intent_engine.classify", intent_engine.classify, args.rounds)
+
+    for n_intents in (10, 50, 200):
+        table = synthetic_table(n_intents, 4)
+        engine = intent_engine.IntentEngine(table)
+        print(f"\n+{n_intents} intents x 4 keywords")
+        report("if/elif chain", chain_for(table), max(1, args.rounds // 10))
+        report("IntentEngine.classify", engine.classify, max(1, args.rounds // 10))
+
+
+if __name__ == "__main__":
+    main()
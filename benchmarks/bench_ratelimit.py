@@ -0,0 +1,76 @@
+# bench_ratelimit.py
+# Per-request cost of the /intent rate limiter: the shared SQLite token
+# bucket in rate_limit.py against the per-process in-memory storage that
+# flask-limiter used before (the `limits` strategies underneath it), plus
+# check throughput when several worker processes share one bucket file.
+#
+#   python benchmarks/bench_ratelimit.py [--checks 20000] [--workers 4]
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import harness  # noqa: E402
+import rate_limit  # noqa: E402
+
+
+def sqlite_limiter(path):
+    # High enough that every check is allowed, as for a well-behaved caller.
+    rate_limit.init_schema(path)
+    return rate_limit.TokenBucketLimiter(path, 10**9, 60)
+
+
+def worker_throughput(args):
+    path, checks, key = args
+    limiter = sqlite_limiter(path)
+    start = time.perf_counter()
+    for i in range(checks):
+        limiter.hit(key or f"customer:{i % 1000}")
+    return checks / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    from limits import parse, storage, strategies
+
+    path = os.path.join(tempfile.mkdtemp(prefix="ivr-ratelimit-bench-"), "ratelimit.db")
+    bucket = sqlite_limiter(path)
+    memory = storage.MemoryStorage()
+    item = parse("1000000000 per minute")
+    moving = strategies.MovingWindowRateLimiter(memory)
+    fixed = strategies.FixedWindowRateLimiter(memory)
+    keys = [f"customer:{i}" for i in range(1000)]
+    counter = iter(range(10**12))
+
+    cases = {
+        "limits moving window (memory)": lambda: moving.hit(item, "1001"),
+        "limits fixed window (memory)": lambda: fixed.hit(item, "1001"),
+        "sqlite token bucket, one key": lambda: bucket.hit("customer:1001"),
+        "sqlite token bucket, 1000 keys": lambda: bucket.hit(keys[next(counter) % 1000]),
+    }
+    number = max(1, args.checks // 30)
+    results = {name: harness.summarize(harness.measure(fn, warmup=500, repeat=30, number=number))
+               for name, fn in cases.items()}
+    harness.report(results)
+
+    # The in-memory storages are per process: N workers would each allow the
+    # full limit. The SQLite bucket is shared, so contention is the cost.
+    print(f"\nshared bucket file, {args.workers} processes x {args.checks} checks:")
+    with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+        for label, key in (("same key", "customer:1001"), ("spread keys", None)):
+            rates = pool.map(worker_throughput, [(path, args.checks, key)] * args.workers)
+            print(f"  {label:<12} {sum(rates):10.0f} checks/s total, {min(rates):9.0f} slowest worker")
+
+
+if __name__ == "__main__":
+    main()
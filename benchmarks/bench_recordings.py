@@ -0,0 +1,82 @@
+# bench_recordings.py
+# Recorded-issue ingestion for the Twilio IVR: handling each recording inside
+# the webhook (fetch, transcribe, classify before answering) against
+# recording_worker.RecordingPipeline, where the webhook only queues it. The
+# recordings come from a local stub server with `--fetch-ms` latency, and
+# transcription is simulated as a `--transcribe-ms` round trip (a cloud
+# recognizer), so no Twilio account or network is needed.
+#
+#   python benchmarks/bench_recordings.py [--recordings 64] [--fetch-ms 20] [--transcribe-ms 150]
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import recording_worker  # noqa: E402
+from harness import percentile  # noqa: E402
+
+ISSUES = ("my sim card is not working", "no signal in my area since morning",
+          "recharge failed but money was deducted", "i want to talk to someone about my bill")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recordings", type=int, default=64)
+    parser.add_argument("--fetch-ms", type=float, default=20)
+    parser.add_argument("--transcribe-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    server = recording_worker.StubRecordingServer(
+        {f"/R{n}.wav": ISSUES[n % len(ISSUES)].encode("utf-8") for n in range(args.recordings)},
+        delay=args.fetch_ms / 1000)
+    source = recording_worker.HttpSource(suffix=".wav")
+    urls = [server.url(f"/R{n}") for n in range(args.recordings)]
+
+    def transcribe(data):
+        time.sleep(args.transcribe_ms / 1000)
+        return data.decode("utf-8")
+
+    print(f"{args.recordings} recordings, fetch {args.fetch_ms:g} ms, transcription {args.transcribe_ms:g} ms")
+    print(f"{'mode':<22}{'webhook p50':>13}{'webhook p99':>13}{'all filed':>12}{'filed/s':>10}")
+
+    def row(mode, webhook, total):
+        print(f"{mode:<22}{percentile(webhook, 50) * 1000:10.2f} ms{percentile(webhook, 99) * 1000:10.2f} ms"
+              f"{total:10.2f} s{args.recordings / total:10.1f}")
+
+    inline = recording_worker.RecordingPipeline(source, transcribe=transcribe)
+    webhook = []
+    start = time.perf_counter()
+    for n, url in enumerate(urls):
+        t = time.perf_counter()
+        inline.process(recording_worker.Recording(f"CA{n}", "1001", url))
+        webhook.append(time.perf_counter() - t)
+    row("in the webhook", webhook, time.perf_counter() - start)
+
+    for workers in (1, 4, 16):
+        pipeline = recording_worker.RecordingPipeline(source, transcribe=transcribe, workers=workers)
+        pipeline.submit("warmup", "1001", urls[0])  # start the workers outside the timing
+        pipeline.join()
+        webhook = []
+        start = time.perf_counter()
+        for n, url in enumerate(urls):
+            t = time.perf_counter()
+            pipeline.submit(f"CA{n}", "1001", url)
+            webhook.append(time.perf_counter() - t)
+        pipeline.join()
+        row(f"queued, {workers} workers", webhook, time.perf_counter() - start)
+        pipeline.close()
+
+    burst = recording_worker.RecordingPipeline(source, transcribe=transcribe, workers=4, max_queued=16)
+    accepted = sum(burst.submit(f"CA{n}", "1001", url) is not None for n, url in enumerate(urls))
+    burst.join()
+    stats = burst.stats()
+    burst.close()
+    print(f"burst into a 16-deep queue: {accepted} accepted, {stats['rejected']} refused without blocking")
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
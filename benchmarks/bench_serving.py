@@ -0,0 +1,128 @@
+# bench_serving.py
+# Load comparison of the two serving modes of the web IVR API:
+#   flask  gunicorn (sync workers) running milestone4_backend:app
+#   asgi   uvicorn running asgi_app:app (web API + Twilio webhooks)
+#
+# Each server is started in a scratch directory with a seeded database,
+# driven by keep-alive HTTP clients at fixed concurrency, then stopped.
+#
+#   python benchmarks/bench_serving.py [--requests 5000] [--concurrency 32] [--workers 2]
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import ivr_db  # noqa: E402
+from harness import percentile  # noqa: E402
+
+SERVERS = {
+    "flask": lambda port, workers: [
+        sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+        "-w", str(workers), "-b", f"127.0.0.1:{port}",
+        "--log-level", "warning", "milestone4_backend:app",
+    ],
+    "asgi": lambda port, workers: [
+        sys.executable, "-m", "uvicorn", "asgi_app:app", "--workers", str(workers),
+        "--port", str(port), "--log-level", "warning", "--no-access-log",
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def drive(port, path, body, total, concurrency):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    payload = json.dumps(body)
+    headers = {"Content-Type": "application/json"}
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local = []
+        for _ in range(n):
+            start = time.perf_counter()
+            try:
+                conn.request("POST", path, payload, headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors[0] += 1
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(total // concurrency,)) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--mode", choices=sorted(SERVERS), action="append",
+                        help="serving mode(s) to run (default: all)")
+    args = parser.parse_args()
+
+    # Rate limiting is switched off so both modes serve every request.
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               IVR_RATELIMIT_ENABLED="0")
+    for mode in args.mode or sorted(SERVERS):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, "ivr_web.db")
+            ivr_db.init_schema(db)
+            ivr_db.save_customer(db, "1001", "Aiza", "SmartPlan 299", 150.0, "9999999999", "1.5 GB")
+            ivr_db.close_connections(db)
+
+            port = free_port()
+            proc = subprocess.Popen(SERVERS[mode](port, args.workers), cwd=tmp, env=env)
+            try:
+                wait_ready(port)
+                drive(port, "/fetch_customer", {"id": "1001"}, args.concurrency * 4, args.concurrency)  # warmup
+                latencies, elapsed, errors = drive(port, "/fetch_customer", {"id": "1001"},
+                                                   args.requests, args.concurrency)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+
+        print(f"{mode:<6} {len(latencies) / elapsed:9.0f} req/s   "
+              f"p50 {percentile(latencies, 50) * 1e3:7.2f} ms   "
+              f"p95 {percentile(latencies, 95) * 1e3:7.2f} ms   "
+              f"p99 {percentile(latencies, 99) * 1e3:7.2f} ms   {errors} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# bench_startup.py
+# Cold-start cost of the web backend: how long `import milestone4_backend`
+# takes in a fresh interpreter, and how long gunicorn takes from launch to
+# the first answered request. With --against, the same numbers are taken
+# for the tree at another git revision (exported with `git archive`), so
+# the current module can be tracked against an earlier one.
+#
+#   python benchmarks/bench_startup.py [--runs 10] [--against HEAD~1]
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+from bench_serving import free_port  # noqa: E402
+
+IMPORT_SNIPPET = ("import time; t = time.perf_counter(); import milestone4_backend; "
+                  "print(time.perf_counter() - t)")
+
+
+def export_tree(rev, dest):
+    archive = subprocess.run(["git", "-C", ROOT, "archive", rev], check=True, capture_output=True).stdout
+    subprocess.run(["tar", "-x", "-C", dest], input=archive, check=True)
+    return dest
+
+
+def import_time(tree, env):
+    with tempfile.TemporaryDirectory() as cwd:
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=cwd, env=env,
+                             check=True, capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def first_response_time(tree, env, timeout=60):
+    cmd = [sys.executable, "-m", "gunicorn", "-w", "1", "--log-level", "warning"]
+    conf = os.path.join(tree, "gunicorn.conf.py")
+    if os.path.exists(conf):
+        cmd += ["-c", conf]
+    port = free_port()
+    cmd += ["-b", f"127.0.0.1:{port}", "milestone4_backend:app"]
+    body = json.dumps({"id": "1001"})
+    with tempfile.TemporaryDirectory() as cwd:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env)
+        try:
+            while time.perf_counter() - start < timeout:
+                try:
+                    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                    conn.request("POST", "/fetch_customer", body, {"Content-Type": "application/json"})
+                    if conn.getresponse().status == 200:
+                        return time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.005)
+                finally:
+                    conn.close()
+            raise RuntimeError("gunicorn did not answer")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+def measure_tree(tree, runs):
+    env = dict(os.environ, PYTHONPATH=tree, IVR_RATELIMIT_ENABLED="0")
+    imports = [import_time(tree, env) for _ in range(runs)]
+    firsts = [first_response_time(tree, env) for _ in range(runs)]
+    return imports, firsts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--against", metavar="REV", help="also measure the tree at this git revision")
+    args = parser.parse_args()
+
+    trees = [("working tree", ROOT)]
+    scratch = tempfile.TemporaryDirectory()
+    if args.against:
+        trees.append((args.against, export_tree(args.against, scratch.name)))
+
+    print(f"{'tree':<16}{'import p50':>14}{'import min':>14}{'first response p50':>22}{'min':>12}")
+    for label, tree in trees:
+        imports, firsts = measure_tree(tree, args.runs)
+        print(f"{label:<16}{statistics.median(imports) * 1e3:11.1f} ms{min(imports) * 1e3:11.1f} ms"
+              f"{statistics.median(firsts) * 1e3:19.1f} ms{min(firsts) * 1e3:9.1f} ms")
+    scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
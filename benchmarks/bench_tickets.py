@@ -0,0 +1,80 @@
+# bench_tickets.py
+# Issue-ticket queries on a large ticket_store file: a deep page read with
+# LIMIT/OFFSET against the keyset cursor page() uses, and per-category
+# totals from a GROUP BY scan against the trigger-maintained counters.
+#
+#   python benchmarks/bench_tickets.py [--tickets 200000] [--page-size 50]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import ivr_db  # noqa: E402
+import ticket_store  # noqa: E402
+from harness import format_ns, measure, summarize  # noqa: E402
+
+CATEGORIES = ("network", "sim", "recharge", "general")
+SQL_OFFSET_PAGE = ("SELECT id, customer_id, category, status, channel, summary, created_at FROM tickets "
+                   "WHERE category = ? ORDER BY id DESC LIMIT ? OFFSET ?")
+SQL_SCAN_COUNTS = "SELECT category, status, COUNT(*) FROM tickets GROUP BY category, status"
+
+
+def setup(path, tickets):
+    ticket_store.init_schema(path)
+    rng = random.Random(7)
+    now = time.time() - tickets
+    start = time.perf_counter()
+    with ivr_db.transaction(path) as conn:
+        conn.executemany(ticket_store.SQL_ADD_TICKET, (
+            (str(1000 + rng.randrange(5000)), rng.choice(CATEGORIES), "web", f"issue {n}", now + n, None)
+            for n in range(tickets)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="ivr-tickets-bench-"), "tickets.db")
+    seconds = setup(path, args.tickets)
+    print(f"{args.tickets} tickets inserted in {seconds:.2f}s ({args.tickets / seconds:.0f}/s, counters included)")
+    conn = ivr_db.connect(path)
+    per_category = args.tickets // len(CATEGORIES)
+    _, first_cursor = ticket_store.page(path, args.page_size, category="network")
+
+    # cursor of the page 90% of the way into the "network" tickets
+    deep = int(per_category * 0.9) // args.page_size * args.page_size
+    deep_cursor = conn.execute("SELECT id FROM tickets WHERE category = 'network' ORDER BY id DESC LIMIT 1 OFFSET ?",
+                               (deep - 1,)).fetchone()[0]
+
+    def offset_page(offset):
+        rows = conn.execute(SQL_OFFSET_PAGE, ("network", args.page_size, offset))
+        return [ticket_store.row_to_ticket(row) for row in rows]
+
+    cases = {
+        "first page, OFFSET": lambda: offset_page(0),
+        "first page, keyset": lambda: ticket_store.page(path, args.page_size, category="network"),
+        "second page, OFFSET": lambda: offset_page(args.page_size),
+        "second page, keyset": lambda: ticket_store.page(path, args.page_size, category="network",
+                                                         before=first_cursor),
+        f"page {deep // args.page_size + 1}, OFFSET": lambda: offset_page(deep),
+        f"page {deep // args.page_size + 1}, keyset": lambda: ticket_store.page(path, args.page_size,
+                                                                              category="network", before=deep_cursor),
+        "counts, GROUP BY scan": lambda: conn.execute(SQL_SCAN_COUNTS).fetchall(),
+        "counts, counters": lambda: ticket_store.counts(path),
+    }
+    for name, fn in cases.items():
+        stats = summarize(measure(fn, warmup=3, repeat=10, number=5))
+        print(f"{name:<28}{format_ns(stats['p50_ns'])}")
+    ivr_db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# bench_tts.py
+# Speech output latency for the local voice IVR, measured in file-output
+# mode so it runs without speakers: the previous speak() (new pyttsx3
+# engine per utterance plus a 0.3 s sleep, reproduced below) against the
+# persistent TTSWorker rendering the same text, and against prompts that
+# are already in the pre-rendered cache.
+#
+#   python benchmarks/bench_tts.py [--rounds 5] [--no-sleep]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import speech_output  # noqa: E402
+
+UTTERANCES = [
+    "Main menu. You can say check balance, plan details, offers, data packs, recharge, talk to customer care, or exit.",
+    "Your current balance is rupees 150.",
+    "Your plan is Basic 199 with 1.5 GB per day data and unlimited calls.",
+    "Thank you for using SmartTel IVR. Goodbye!",
+]
+
+
+# ------------------ Previous speak() ------------------
+def legacy_render(text, path, sleep=True):
+    import pyttsx3
+    engine = pyttsx3.init()
+    voices = engine.getProperty('voices')
+    engine.setProperty('voice', voices[min(1, len(voices) - 1)].id)
+    engine.setProperty('rate', 165)
+    engine.save_to_file(text, path)
+    engine.runAndWait()
+    engine.stop()
+    if sleep:
+        time.sleep(0.3)
+
+
+def timed(fn, rounds):
+    samples = []
+    for i in range(rounds):
+        for j, text in enumerate(UTTERANCES):
+            start = time.perf_counter()
+            fn(text, i, j)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--no-sleep", action="store_true", help="leave the old 0.3 s pause out of the legacy timing")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="ivr-tts-bench-")
+    out_dir = os.path.join(scratch, "out")
+    os.makedirs(out_dir)
+
+    start = time.perf_counter()
+    worker = speech_output.TTSWorker(cache_dir=os.path.join(scratch, "cache"), output_dir=out_dir)
+    startup = time.perf_counter() - start
+
+    results = {
+        "init per utterance": timed(
+            lambda text, i, j: legacy_render(text, os.path.join(out_dir, f"legacy-{i}-{j}.wav"), not args.no_sleep),
+            args.rounds),
+        "persistent worker": timed(
+            lambda text, i, j: worker.render(text, os.path.join(out_dir, f"worker-{i}-{j}.wav")),
+            args.rounds),
+    }
+    for future in worker.prerender(UTTERANCES):
+        future.result()
+    results["pre-rendered cache"] = timed(lambda text, i, j: worker.speak(text), args.rounds)
+    worker.close()
+
+    print(f"worker startup (one engine init): {startup * 1000:.1f} ms")
+    print(f"{'mode':<22}{'p50':>12}{'mean':>12}{'max':>12}")
+    for label, samples in results.items():
+        print(f"{label:<22}{statistics.median(samples) * 1000:9.2f} ms"
+              f"{statistics.fmean(samples) * 1000:9.2f} ms{max(samples) * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
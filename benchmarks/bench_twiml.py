@@ -0,0 +1,97 @@
+# bench_twiml.py
+# Twilio webhook handler time and transient memory: the precompiled TwiML
+# documents in milestone2 against building a VoiceResponse tree and
+# serializing it on every call (the previous handlers, reproduced below).
+#
+#   python benchmarks/bench_twiml.py [--calls 20000]
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("IVR_SESSION_BACKEND", "memory")
+
+from fastapi.responses import Response  # noqa: E402
+from twilio.twiml.voice_response import VoiceResponse  # noqa: E402
+
+import milestone2  # noqa: E402
+from session_store import CallSession  # noqa: E402
+
+
+# ------------------ Previous handlers ------------------
+async def legacy_start(CallSid, From):
+    milestone2.call_sessions.save(CallSession(CallSid, "1001", "main_menu"))
+    resp = VoiceResponse()
+    gather = resp.gather(num_digits=1, action="/twilio/handle_input", method="POST")
+    gather.say("Welcome to SmartTel Customer Support!", voice="alice")
+    gather.say("Press 1 to check balance. Press 2 to recharge. Press 3 to report an issue.", voice="alice")
+    return Response(content=str(resp), media_type="application/xml")
+
+async def legacy_handle_input(Digits, CallSid):
+    response = VoiceResponse()
+    session = milestone2.call_sessions.get(CallSid)
+    customer = milestone2.customers[session.customer_id]
+    if Digits == "1":
+        response.say(f"Your remaining data balance is {customer['balance']}.", voice="alice")
+        response.redirect("/twilio/start")
+    else:
+        response.say("Invalid input. Returning to main menu.", voice="alice")
+        response.redirect("/twilio/start")
+    milestone2.call_sessions.save(session)
+    return Response(content=str(response), media_type="application/xml")
+
+async def legacy_recording(RecordingUrl, CallSid):
+    resp = VoiceResponse()
+    resp.say("Your issue has been recorded. Our support team will contact you.", voice="alice")
+    resp.redirect("/twilio/start")
+    return Response(content=str(resp), media_type="application/xml")
+
+
+CASES = [
+    ("start (static)", legacy_start, milestone2.twilio_start, {"CallSid": "CA1", "From": "+1"}),
+    ("balance (template)", legacy_handle_input, milestone2.twilio_handle_input, {"Digits": "1", "CallSid": "CA1"}),
+    ("invalid (static)", legacy_handle_input, milestone2.twilio_handle_input, {"Digits": "9", "CallSid": "CA1"}),
+]
+
+
+def measure(loop, handler, kwargs, calls):
+    async def run():
+        for _ in range(calls):
+            await handler(**kwargs)
+
+    loop.run_until_complete(run())  # warmup
+    start = time.perf_counter()
+    loop.run_until_complete(run())
+    per_call = (time.perf_counter() - start) / calls
+
+    tracemalloc.start()
+    loop.run_until_complete(handler(**kwargs))
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    loop.run_until_complete(handler(**kwargs))
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return per_call, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    for label, legacy, current, kwargs in CASES:
+        loop.run_until_complete(milestone2.twilio_start(CallSid="CA1", From="+1"))  # fresh session
+        old_time, old_mem = measure(loop, legacy, kwargs, args.calls)
+        new_time, new_mem = measure(loop, current, kwargs, args.calls)
+        print(f"{label:<20} build-per-call {old_time * 1e6:7.1f} us {old_mem:7d} B peak   "
+              f"precompiled {new_time * 1e6:7.1f} us {new_mem:7d} B peak   "
+              f"x{old_time / new_time:4.1f}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench_writes.py
+# Sustained recharge throughput: every call committing on its own (the
+# default write path) against write_queue.WriteQueue group commit, with
+# several threads (and optionally several processes, like gunicorn
+# workers) recharging at once. Each recharge waits until it is durable, as
+# the backend does with IVR_WRITE_ACK=commit.
+#
+#   python benchmarks/bench_writes.py [--seconds 3] [--threads 16] [--processes 1] [--flush-ms 0]
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import ivr_db  # noqa: E402
+import write_queue  # noqa: E402
+
+CUSTOMERS = 1000
+
+
+def setup(path):
+    ivr_db.init_schema(path)
+    with ivr_db.transaction(path) as conn:
+        conn.executemany(ivr_db.SQL_SAVE_CUSTOMER, [(str(1000 + i), "Bench", "SmartPlan 299", 150.0,
+                                                      "9999999999", "1.5 GB") for i in range(CUSTOMERS)])
+
+
+def run(args):
+    """Recharge from `threads` threads for `seconds`; returns (recharges, commits)."""
+    path, mode, threads, seconds, flush_ms = args
+    queue = write_queue.WriteQueue(path, flush_interval=flush_ms / 1000) if mode == "group commit" else None
+    counts = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(n):
+        i = n
+        while time.perf_counter() < stop:
+            cid = str(1000 + i % CUSTOMERS)
+            if queue:
+                queue.add_balance(cid, 1).result()
+            else:
+                ivr_db.add_balance(path, cid, 1)
+            counts[n] += 1
+            i += threads
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    if queue:
+        queue.close()
+        return sum(counts), queue.batches
+    return sum(counts), sum(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--flush-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.processes} process(es) x {args.threads} threads, {args.seconds:g}s each")
+    print(f"{'mode':<22}{'recharges/s':>14}{'commits/s':>12}{'writes/commit':>15}")
+    for mode in ("commit per call", "group commit"):
+        path = os.path.join(tempfile.mkdtemp(prefix="ivr-writes-bench-"), "ivr.db")
+        setup(path)
+        job = (path, mode, args.threads, args.seconds, args.flush_ms)
+        if args.processes == 1:
+            results = [run(job)]
+        else:
+            with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+                results = pool.map(run, [job] * args.processes)
+        recharges = sum(r for r, _ in results)
+        commits = sum(c for _, c in results)
+        print(f"{mode:<22}{recharges / args.seconds:14.0f}{commits / args.seconds:12.0f}{recharges / commits:15.1f}")
+        ivr_db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
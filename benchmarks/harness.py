@@ -0,0 +1,93 @@
+# harness.py
+# Minimal micro-benchmark harness: warmup, repeated timed rounds,
+# percentile reporting and comparison against a stored JSON baseline.
+import json
+import os
+import platform
+import statistics
+import time
+
+DEFAULT_TOLERANCE = 0.15  # p50 more than 15% above baseline counts as a regression
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def measure(fn, warmup=200, repeat=30, number=200):
+    """Time `fn()`; returns `repeat` per-call samples in nanoseconds, each averaged over `number` calls."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        start = clock()
+        for _ in range(number):
+            fn()
+        samples.append((clock() - start) / number)
+    return samples
+
+
+def summarize(samples):
+    return {
+        "min_ns": round(min(samples), 1),
+        "p50_ns": round(percentile(samples, 50), 1),
+        "p90_ns": round(percentile(samples, 90), 1),
+        "p99_ns": round(percentile(samples, 99), 1),
+        "mean_ns": round(statistics.fmean(samples), 1),
+        "stdev_ns": round(statistics.pstdev(samples), 1),
+        "rounds": len(samples),
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return {name: ratio} of current p50 over baseline p50, and the names that regressed."""
+    ratios = {}
+    regressions = []
+    for name, stats in results.items():
+        base = (baseline or {}).get("results", {}).get(name)
+        if not base:
+            continue
+        ratio = stats["p50_ns"] / base["p50_ns"]
+        ratios[name] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return ratios, regressions
+
+
+def format_ns(ns):
+    if ns >= 1_000_000:
+        return f"{ns / 1_000_000:8.2f} ms"
+    if ns >= 1_000:
+        return f"{ns / 1_000:8.2f} us"
+    return f"{ns:8.0f} ns"
+
+
+def report(results, ratios=None, regressions=()):
+    print(f"{'benchmark':<34}{'p50':>12}{'p90':>12}{'p99':>12}{'min':>12}   vs baseline")
+    for name, stats in results.items():
+        line = (f"{name:<34}{format_ns(stats['p50_ns']):>12}{format_ns(stats['p90_ns']):>12}"
+                f"{format_ns(stats['p99_ns']):>12}{format_ns(stats['min_ns']):>12}")
+        if ratios and name in ratios:
+            flag = "  REGRESSION" if name in regressions else ""
+            line += f"   {ratios[name]:5.2f}x{flag}"
+        print(line)
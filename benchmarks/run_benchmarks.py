@@ -0,0 +1,106 @@
+# run_benchmarks.py
+# Micro-benchmark suite for the IVR hot paths, compared against a stored
+# baseline so regressions show up as numbers:
+#
+#   python benchmarks/run_benchmarks.py                  # run + compare with baseline.json
+#   python benchmarks/run_benchmarks.py --save-baseline  # record a new baseline
+#   python benchmarks/run_benchmarks.py -k intent --fail-on-regression
+#
+# Everything runs in a scratch directory, so the database and logs in the
+# working tree are untouched.
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import harness  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+
+UTTERANCES = [
+    "check balance",
+    "what is my plan",
+    "upgrade my data",
+    "i have a recharge issue",
+    "recharge two hundred forty nine",
+    "my network keeps dropping",
+    "i want to talk to customer care",
+    "hello there i am not really sure what i need",
+]
+
+
+def build_suite():
+    """Import the apps inside the scratch directory and return {name: zero-arg callable}."""
+    os.environ.setdefault("IVR_SESSION_BACKEND", "memory")
+    import intent_classifier
+    import intent_engine
+    import ivr_db
+    import milestone2
+    import milestone4_backend as backend
+    from flask import jsonify
+
+    backend.init_db()
+    backend.save_customer_db("1001", "Aiza")
+    cust = backend.fetch_customer_db("1001")
+    utterances = itertools.cycle(UTTERANCES)
+    app_context = backend.app.app_context()
+    app_context.push()  # jsonify needs an app context; kept for the whole run
+
+    return {
+        "intent.classify": lambda: intent_engine.classify(next(utterances)),
+        "intent.classify_model": lambda: intent_classifier.classify(next(utterances)),
+        "customer.fetch_cached": lambda: backend.fetch_customer_db("1001"),
+        "customer.fetch_uncached": lambda: ivr_db.fetch_customer(backend.DB_FILE, "1001"),
+        "customer.save": lambda: backend.save_customer_db("2002", "Bench"),
+        "recharge.add_balance": lambda: ivr_db.add_balance(backend.DB_FILE, "1001", 1),
+        "recharge.intent": lambda: backend.intent_recharge(cust, 1),
+        "twiml.static_response": lambda: milestone2.twiml(milestone2.WELCOME_TWIML),
+        "twiml.balance_template": lambda: milestone2.BALANCE_TWIML.render(balance="500MB"),
+        "twiml.voice_response_build": lambda: str(milestone2._balance("500MB")),
+        "json.jsonify_message": lambda: jsonify({"status": "ok", "message": "Your current balance is rupees 150.0."}),
+        "json.process_intent": lambda: backend.process_intent({"id": "1001", "text": next(utterances)}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=harness.DEFAULT_TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    baseline = harness.load_baseline(args.baseline)
+    os.chdir(tempfile.mkdtemp(prefix="ivr-bench-"))
+    suite = build_suite()
+
+    results = {}
+    for name, fn in suite.items():
+        if args.pattern and args.pattern not in name:
+            continue
+        results[name] = harness.summarize(harness.measure(fn, repeat=args.repeat, number=args.number))
+
+    ratios, regressions = harness.compare(results, baseline, args.tolerance)
+    harness.report(results, ratios, regressions)
+
+    if args.save_baseline:
+        merged = dict((baseline or {}).get("results", {}))
+        merged.update(results)
+        harness.save_baseline(args.baseline, merged)
+        print(f"\nBaseline written to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# dialer.py
+# Outbound call campaigns (payment reminders, outage notices) on top of
+# milestone2.place_call.
+#
+# Targets are read as a stream, one at a time, only when a call slot is
+# free, so a list of any size is never held in memory. At most
+# `concurrency` calls are being placed at once, and every call first takes a
+# token from a rate_limit.TokenBucketLimiter, so all dialers sharing the
+# state file stay under the provider's calls-per-second limit together.
+# Transient failures (HTTP 429/5xx, network errors) are retried with
+# exponential backoff and full jitter; other failures are final.
+#
+# Per-call state (status, attempts, call SID, next retry) is kept in SQLite
+# through the pooled ivr_db connections. Running a campaign again with the
+# same name skips the targets it already finished and picks up pending
+# retries, so an interrupted campaign resumes where it stopped. A call that
+# was being placed when the process died is placed again (at least once).
+#
+# FakeTwilioServer is a local stand-in for the Twilio REST calls API, with
+# its own CPS limit, latency and scripted failures, for tests and dry runs.
+#
+#   python dialer.py targets.csv --campaign outage-2026-10 [--rate "1 per second"] [--concurrency 8] [--fake]
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import ivr_db
+import rate_limit
+
+DEFAULT_PATH = os.environ.get("IVR_DIALER_DB", "ivr_dialer.db")
+CONCURRENCY = int(os.environ.get("IVR_DIALER_CONCURRENCY", "8"))
+RATE = os.environ.get("IVR_DIALER_RATE", "1 per second")  # Twilio's default outbound CPS
+MAX_ATTEMPTS = int(os.environ.get("IVR_DIALER_MAX_ATTEMPTS", "4"))
+BACKOFF_SECONDS = float(os.environ.get("IVR_DIALER_BACKOFF", "2"))
+MAX_BACKOFF_SECONDS = 300.0
+
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+FINISHED = ("placed", "failed")
+
+# ------------------ SQL ------------------
+SQL_CREATE_CALLS = """
+    CREATE TABLE IF NOT EXISTS campaign_calls (
+        campaign TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        customer_id TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        call_sid TEXT,
+        error TEXT,
+        next_attempt_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (campaign, phone)
+    ) WITHOUT ROWID
+"""
+SQL_FETCH_CALL = "SELECT status, attempts, next_attempt_at FROM campaign_calls WHERE campaign=? AND phone=?"
+SQL_ADD_CALL = """
+    INSERT INTO campaign_calls (campaign, phone, customer_id, status, attempts, next_attempt_at, updated_at)
+    VALUES (?, ?, ?, 'pending', 0, 0, ?)
+"""
+SQL_SET_STATUS = """
+    UPDATE campaign_calls SET status=?, attempts=?, call_sid=?, error=?, next_attempt_at=?, updated_at=?
+    WHERE campaign=? AND phone=?
+"""
+SQL_PROGRESS = "SELECT status, COUNT(*) FROM campaign_calls WHERE campaign=? GROUP BY status"
+
+
+def init_schema(path=DEFAULT_PATH):
+    ivr_db.connect(path).execute(SQL_CREATE_CALLS)
+    rate_limit.init_schema(path)
+
+
+class Target:
+    __slots__ = ("phone", "customer_id")
+
+    def __init__(self, phone, customer_id=None):
+        self.phone = phone
+        self.customer_id = customer_id
+
+    def __repr__(self):
+        return f"Target({self.phone!r}, {self.customer_id!r})"
+
+
+def read_targets(path):
+    """Targets from a CSV file with a "phone" column (and optionally "customer_id"), read lazily."""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            phone = (row.get("phone") or "").strip()
+            if phone:
+                yield Target(phone, (row.get("customer_id") or "").strip() or None)
+
+
+def is_transient(error):
+    """Worth retrying: throttling or a server error from the provider, or a network failure."""
+    status = getattr(error, "status", None)
+    if isinstance(status, int):
+        return status in TRANSIENT_STATUSES
+    return isinstance(error, OSError)  # connection refused/reset, timeouts
+
+
+def backoff_delay(attempt, base=BACKOFF_SECONDS, cap=MAX_BACKOFF_SECONDS, rng=random):
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+    return rng.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def progress(path, campaign):
+    """{status: calls} for a campaign."""
+    return dict(ivr_db.connect(path).execute(SQL_PROGRESS, (campaign,)).fetchall())
+
+
+# ------------------ Dialer ------------------
+class Dialer:
+    def __init__(self, place_call, campaign, path=DEFAULT_PATH, concurrency=CONCURRENCY, rate=RATE, burst=1,
+                 max_attempts=MAX_ATTEMPTS, backoff=BACKOFF_SECONDS, clock=time.time):
+        self.place_call = place_call  # phone -> call SID; raises on failure
+        self.campaign = campaign
+        self.path = path
+        self.concurrency = concurrency
+        self.limiter = rate_limit.TokenBucketLimiter(path, *rate_limit.parse_limit(rate), burst=burst, name="dialer")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._retries = []  # heap of (due, seq, target, attempts so far)
+        self._seq = itertools.count()
+        self.stats = {"placed": 0, "failed": 0, "retried": 0, "skipped": 0, "attempts": 0}
+        init_schema(path)
+
+    def run(self, targets):
+        """Call every target not finished in an earlier run of this campaign; returns self.stats."""
+        jobs = self._jobs(targets)
+        streaming = True
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="ivr-dialer") as pool:
+            while True:
+                with self._cond:
+                    while self._in_flight >= self.concurrency:
+                        self._cond.wait()
+                    job = self._due_retry()
+                    if job is None and not streaming:
+                        if not self._retries and not self._in_flight:
+                            break
+                        self._cond.wait(self._retries[0][0] - self.clock() if self._retries else None)
+                        continue
+                    self._in_flight += 1  # hold the slot while the next target is read
+                if job is None:
+                    job = next(jobs, None)
+                    if job is None:
+                        streaming = False
+                        self._release()
+                        continue
+                self._pace()
+                pool.submit(self._dial, *job)
+        return self.stats
+
+    def _jobs(self, targets):
+        """(target, attempts so far) for each target still to call; pending retries wait for their time."""
+        conn = ivr_db.connect(self.path)
+        for target in targets:
+            row = conn.execute(SQL_FETCH_CALL, (self.campaign, target.phone)).fetchone()
+            if row is None:
+                conn.execute(SQL_ADD_CALL, (self.campaign, target.phone, target.customer_id, self.clock()))
+                yield target, 0
+            elif row[0] in FINISHED:
+                self.stats["skipped"] += 1
+            elif row[2] > self.clock():
+                self._schedule(row[2], target, row[1])
+            else:
+                yield target, row[1]
+
+    def _due_retry(self):
+        if self._retries and self._retries[0][0] <= self.clock():
+            _, _, target, attempts = heapq.heappop(self._retries)
+            return target, attempts
+        return None
+
+    def _schedule(self, due, target, attempts):
+        with self._cond:
+            heapq.heappush(self._retries, (due, next(self._seq), target, attempts))
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _pace(self):
+        while True:
+            allowed, retry_after = self.limiter.hit("calls")
+            if allowed:
+                return
+            time.sleep(retry_after)
+
+    def _save(self, target, status, attempts, call_sid=None, error=None, next_attempt_at=0.0):
+        ivr_db.connect(self.path).execute(SQL_SET_STATUS, (status, attempts, call_sid, error, next_attempt_at,
+                                                           self.clock(), self.campaign, target.phone))
+
+    def _dial(self, target, attempts):
+        attempts += 1
+        try:
+            self._save(target, "calling", attempts)
+            try:
+                call_sid = self.place_call(target.phone)
+            except Exception as e:
+                if is_transient(e) and attempts < self.max_attempts:
+                    due = self.clock() + backoff_delay(attempts, self.backoff)
+                    self._save(target, "pending", attempts, error=str(e), next_attempt_at=due)
+                    self._count("retried", attempts)
+                    self._schedule(due, target, attempts)
+                else:
+                    self._save(target, "failed", attempts, error=str(e))
+                    self._count("failed", attempts)
+            else:
+                self._save(target, "placed", attempts, call_sid=call_sid)
+                self._count("placed", attempts)
+        finally:
+            self._release()
+
+    def _count(self, outcome, attempts):
+        with self._cond:
+            self.stats[outcome] += 1
+            self.stats["attempts"] += 1
+
+
+# ------------------ Fake Twilio API ------------------
+class FakeTwilioServer:
+    """The Twilio calls endpoint on 127.0.0.1: POST /2010-04-01/Accounts/<sid>/Calls.json.
+
+    `cps` answers 429 above that many calls in any one second, `latency`
+    delays every answer, and `failures` maps a phone number to the HTTP
+    statuses its next attempts get before one succeeds.
+    """
+
+    ACCOUNT_SID = "AC" + "0" * 32
+    CALLS_PATH = re.compile(r"/2010-04-01/Accounts/(\w+)/Calls\.json")
+
+    def __init__(self, cps=None, latency=0.0, failures=None):
+        self.cps = cps
+        self.latency = latency
+        self.failures = {phone: list(statuses) for phone, statuses in (failures or {}).items()}
+        self.calls = []  # (time, phone) of every call accepted
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._recent = []  # request times within the last second
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not fake.CALLS_PATH.fullmatch(self.path.split("?")[0]):
+                    self._reply(404, {"code": 20404, "message": "The requested resource was not found",
+                                      "status": 404})
+                    return
+                form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+                phone = form.get("To", [""])[0]
+                status = fake._admit(phone)
+                try:
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    if status == 201:
+                        sid = "CA" + uuid.uuid4().hex
+                        self._reply(201, {"sid": sid, "to": phone, "from": form.get("From", [""])[0],
+                                          "status": "queued", "account_sid": fake.ACCOUNT_SID})
+                    else:
+                        self._reply(status, {"code": 20429 if status == 429 else 20500,
+                                             "message": f"fake error {status}", "status": status})
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="ivr-fake-twilio", daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def _admit(self, phone):
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self._recent = [t for t in self._recent if t > now - 1] + [now]
+            if self.cps and len(self._recent) > self.cps:
+                self.throttled += 1
+                return 429
+            if self.failures.get(phone):
+                return self.failures[phone].pop(0)
+            self.calls.append((now, phone))
+            return 201
+
+    def client(self):
+        """A twilio REST client that talks to this server."""
+        from twilio.rest import Client
+        client = Client(self.ACCOUNT_SID, "fake-auth-token")
+        client.api.base_url = self.url
+        return client
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run (or resume) an outbound call campaign.")
+    parser.add_argument("targets", help="CSV file with a phone column and optionally customer_id")
+    parser.add_argument("--campaign", required=True)
+    parser.add_argument("--rate", default=RATE, help='calls per period, e.g. "1 per second"')
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--fake", action="store_true", help="dial a local fake Twilio API instead")
+    args = parser.parse_args()
+
+    import milestone2
+
+    fake = FakeTwilioServer() if args.fake else None
+    twilio_client = fake.client() if fake else None
+    dialer = Dialer(lambda phone: milestone2.place_call(phone, twilio_client=twilio_client), args.campaign,
+                    concurrency=args.concurrency, rate=args.rate)
+    start = time.perf_counter()
+    try:
+        stats = dialer.run(read_targets(args.targets))
+    finally:
+        if fake:
+            fake.close()
+    print(f"{args.campaign}: {stats} in {time.perf_counter() - start:.1f}s")
+    print(f"campaign totals: {progress(dialer.path, args.campaign)}")
+
+
+if __name__ == "__main__":
+    main()
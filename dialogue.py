@@ -0,0 +1,111 @@
+# dialogue.py
+# Table-driven dialogue engine shared by the IVR channels.
+#
+# A flow is declared as a dict of states, each with an optional prompt key
+# and transitions `symbol -> (next_state, action)`; symbols are intents for
+# the voice channels and DTMF digits for Twilio. compile_flow() numbers the
+# states and flattens every transition into one dict keyed (state, symbol),
+# so a turn is a single lookup (falling back to the state's default) and a
+# caller is driven by a plain loop instead of recursive menu functions.
+#
+# Actions and prompt texts stay with each channel: the engine only says
+# which action to run and which prompt comes next. A dialogue position
+# serializes to a short "checksum.state" string, which any worker holding
+# the same flow definition can resume from.
+import hashlib
+
+END = "end"
+SILENCE = "silence"  # symbol for a turn where nothing was heard
+
+
+class Flow:
+    def __init__(self, name, states, prompts, table, defaults, start):
+        self.name = name
+        self.states = states  # state id -> name
+        self.ids = {state: i for i, state in enumerate(states)}
+        self.prompts = prompts  # state id -> prompt key or None
+        self.table = table  # (state id, symbol) -> (next state id, action)
+        self.defaults = defaults  # state id -> (next state id, action)
+        self.start = start
+        self.end = self.ids[END]
+        self.checksum = hashlib.sha1(repr((name, states, prompts, sorted(table.items()), defaults))
+                                     .encode("utf-8")).hexdigest()[:8]
+
+    def step(self, state, symbol):
+        """Return (next_state, action) for `symbol` heard in `state`; action may be None."""
+        return self.table.get((state, symbol)) or self.defaults[state]
+
+    def prompt(self, state):
+        return self.prompts[state]
+
+    def dumps(self, state):
+        return f"{self.checksum}.{state}"
+
+    def loads(self, data, default=None):
+        """State id from dumps() output (or a bare state name); `default` or start if unusable."""
+        checksum, _, state = (data or "").partition(".")
+        if checksum == self.checksum and state.isdigit() and int(state) < len(self.states):
+            return int(state)
+        fallback = self.start if default is None else default
+        return self.ids.get(data, fallback)
+
+
+def compile_flow(name, start, states, global_on=None):
+    """Compile {state: {"prompt": key, "on": {symbol: (next, action)}, "default": (next, action)}}.
+
+    `global_on` transitions apply in every state that does not override
+    them. A state without a default stays where it is and does nothing.
+    """
+    names = tuple(states) + ((END,) if END not in states else ())
+    ids = {state: i for i, state in enumerate(names)}
+
+    def resolve(state, transition):
+        target, action = transition
+        if target not in ids:
+            raise ValueError(f"{name}: transition from {state!r} to unknown state {target!r}")
+        return ids[target], action
+
+    table = {}
+    defaults = []
+    for state in names:
+        spec = states.get(state, {})
+        for symbol, transition in {**(global_on or {}), **spec.get("on", {})}.items():
+            table[ids[state], symbol] = resolve(state, transition)
+        defaults.append(resolve(state, spec.get("default", (state, None))))
+    prompts = tuple(states.get(state, {}).get("prompt") for state in names)
+    return Flow(name, names, prompts, table, tuple(defaults), ids[start])
+
+
+# ------------------ Voice flow ------------------
+# Shared by the local voice IVR (milestone3) and the web IVR backend.
+SERVICE_INTENTS = ("check_balance", "plan_details", "offers", "data_packs", "recharge",
+                   "recharge_issue", "network_issue", "sim_issue")
+
+VOICE_FLOW = compile_flow("voice", "welcome", {
+    "welcome": {
+        "prompt": "welcome",
+        "on": {"menu": ("main_menu", None), "customer_care": ("customer_care", "customer_care")},
+        "default": ("main_menu", "default_menu"),
+    },
+    "main_menu": {
+        "prompt": "main_menu",
+        "on": {**{intent: ("main_menu", intent) for intent in SERVICE_INTENTS},
+               "customer_care": ("customer_care", "customer_care"),
+               "exit": (END, "exit")},
+        "default": ("main_menu", "unknown"),
+    },
+    "customer_care": {
+        "prompt": None,  # the customer_care action already asked for the issue
+        "on": {**{intent: ("customer_care", intent) for intent in SERVICE_INTENTS},
+               "menu": ("main_menu", "care_menu"),
+               "thank": ("care_confirm", None),
+               "exit": (END, "care_exit"),
+               SILENCE: ("customer_care", None)},
+        "default": ("customer_care", "care_retry"),
+    },
+    "care_confirm": {
+        "prompt": "care_confirm",
+        "on": {"exit": (END, "care_thanks")},
+        "default": ("customer_care", None),
+    },
+})
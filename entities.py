@@ -0,0 +1,196 @@
+# entities.py
+# Spoken-entity normalization for the voice IVRs: customer IDs, recharge
+# amounts and plan names from recognizer text.
+#
+# One compiled regex splits the utterance into tokens and a single pass
+# folds runs of number words into numbers, handling digit strings, "oh",
+# "double five", "twenty one" and "two hundred and ninety nine". Known
+# customer IDs sit in an in-memory deletion index, so a near-miss
+# recognition (one digit dropped, added or misheard) resolves with a few
+# dict lookups instead of a database query per guess.
+import re
+
+TOKEN_RE = re.compile(r"\d+|[a-z]+")
+
+UNITS = {"zero": 0, "oh": 0, "o": 0, "nil": 0, "one": 1, "two": 2, "three": 3, "four": 4,
+         "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9}
+TEENS = {"ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+         "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19}
+TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70,
+        "eighty": 80, "ninety": 90}
+SCALES = {"hundred": 100, "thousand": 1000, "lakh": 100000}
+REPEATS = {"double": 2, "triple": 3}
+NUMBER_WORDS = set(UNITS) | set(TEENS) | set(TENS) | set(SCALES) | set(REPEATS)
+ZERO_ONLY = {"oh", "o"}  # zero only next to other number words ("oh I see" is not a number)
+
+# Plans the IVR can name, with their daily data allowance.
+PLANS = {
+    "SmartPlan 299": "1.5 GB",
+    "Premium 499": "2.5 GB",
+    "Super 699": "4 GB",
+}
+PLAN_WORDS = {"smartplan": "SmartPlan 299", "smart": "SmartPlan 299", "premium": "Premium 499",
+              "super": "Super 699"}
+
+
+class _Run:
+    """One run of number tokens, read both as a digit string and as a cardinal."""
+
+    def __init__(self):
+        self.digits = []  # spoken digit by digit: "one nine nine", "double five"
+        self.tens_open = False  # last piece was "twenty".."ninety", a unit may complete it
+        self.repeat = 1
+        self.total = 0  # cardinal reading: "two hundred ninety nine"
+        self.current = 0
+        self.scaled = False
+        self.words = set()
+
+    def add(self, token):
+        self.words.add(token)
+        if token in REPEATS:
+            self.repeat = REPEATS[token]
+            return
+        if token.isdigit():
+            self.digits.append(token * self.repeat if len(token) == 1 else token)
+            value, self.tens_open = int(token), False
+        elif token in UNITS:
+            value = UNITS[token]
+            if self.tens_open:
+                self.digits[-1] = str(int(self.digits[-1]) + value)
+                self.tens_open = False
+            else:
+                self.digits.append(str(value) * self.repeat)
+        elif token in SCALES:
+            scale = SCALES[token]
+            self.current = (self.current or 1) * scale
+            if scale >= 1000:
+                self.total += self.current
+                self.current = 0
+            self.scaled = True
+            self.repeat = 1
+            return
+        else:
+            value = TEENS.get(token) or TENS[token]
+            self.digits.append(str(value))
+            self.tens_open = token in TENS
+        self.repeat = 1
+        self.current += value
+
+    def text(self):
+        if self.words <= ZERO_ONLY | set(REPEATS):
+            return None
+        if self.scaled:
+            return str(self.total + self.current)
+        return "".join(self.digits) or None
+
+
+def numbers(text):
+    """All numbers spoken in `text`, as digit strings, in order."""
+    found = []
+    run = None
+    for token in TOKEN_RE.findall((text or "").lower()):
+        if token in NUMBER_WORDS or token.isdigit():
+            run = run or _Run()
+            run.add(token)
+        elif token == "and" and run and run.scaled:
+            continue  # "two hundred and ninety nine"
+        elif run:
+            found.append(run.text())
+            run = None
+    if run:
+        found.append(run.text())
+    return [number for number in found if number]
+
+
+def spoken_digits(text):
+    """Digits of an ID read out in `text` ("one oh double one" -> "1011"); "" if none."""
+    return "".join(numbers(text))
+
+
+def customer_id(text):
+    """Normalize a recognized customer ID.
+
+    Only an ID read out as numbers ("one double oh one", "1 0 0 1") is
+    folded into digits; anything with other words or letters is a typed ID
+    ("A12", "cust-1002") and is only stripped.
+    """
+    text = (text or "").strip()
+    tokens = TOKEN_RE.findall(text.lower())
+    if tokens and all(token.isdigit() or token in NUMBER_WORDS for token in tokens):
+        return spoken_digits(text) or text
+    return text
+
+
+def amount(text, choices=None, ignore=()):
+    """First amount spoken in `text` as an int, or None; limited to `choices` when given.
+
+    Numbers in `ignore` (digit strings, e.g. the caller's own ID) are skipped.
+    """
+    for number in numbers(text):
+        if number in ignore:
+            continue
+        value = int(number)
+        if choices is None or value in choices:
+            return value
+    return None
+
+
+def plan_name(text):
+    """The plan named in `text` by name or price, or None."""
+    tokens = TOKEN_RE.findall((text or "").lower())
+    for token in tokens:
+        if token in PLAN_WORDS:
+            return PLAN_WORDS[token]
+    prices = {plan.split()[-1]: plan for plan in PLANS}
+    for number in numbers(text):
+        if number in prices:
+            return prices[number]
+    return None
+
+
+# ------------------ Known IDs ------------------
+def _deletes(cid):
+    return {cid[:i] + cid[i + 1:] for i in range(len(cid))}
+
+
+class CustomerIndex:
+    """Known customer IDs with a one-deletion neighbourhood for near-miss lookups."""
+
+    def __init__(self, ids=()):
+        self.ids = set()
+        self.neighbours = {}  # id with one character deleted -> ids
+        for cid in ids:
+            self.add(cid)
+
+    def __contains__(self, cid):
+        return cid in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, cid):
+        if cid in self.ids:
+            return
+        self.ids.add(cid)
+        for variant in _deletes(cid):
+            self.neighbours.setdefault(variant, set()).add(cid)
+
+    def near(self, cid):
+        """Known IDs one edit (insert, delete, substitute) from `cid`, exact match excluded."""
+        found = set()
+        found.update(self.neighbours.get(cid, ()))  # caller dropped a digit
+        for variant in _deletes(cid):
+            if variant in self.ids:  # caller added a digit
+                found.add(variant)
+            for known in self.neighbours.get(variant, ()):  # one digit misheard
+                if len(known) == len(cid) and sum(a != b for a, b in zip(known, cid)) == 1:
+                    found.add(known)
+        found.discard(cid)
+        return found
+
+    def resolve(self, cid):
+        """`cid` if known, else the single near-miss ID, else None (unknown or ambiguous)."""
+        if cid in self.ids:
+            return cid
+        candidates = self.near(cid)
+        return candidates.pop() if len(candidates) == 1 else None
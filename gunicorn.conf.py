@@ -0,0 +1,20 @@
+# gunicorn.conf.py
+# Read automatically by `gunicorn milestone4_backend:app` run from this
+# directory.
+
+
+def on_starting(server):
+    # Create the schema once in the master, before any worker is forked.
+    # Workers then find milestone4_backend already imported and start
+    # serving without paying for the import themselves.
+    import milestone4_backend
+
+    milestone4_backend.init_db()
+
+
+def post_fork(server, worker):
+    # The TTS worker is a thread, so each worker starts its own after the
+    # fork; fixed prompts then render before the first /tts request.
+    import milestone4_backend
+
+    milestone4_backend.prompt_audio_cache.start()
@@ -0,0 +1,236 @@
+# intent_classifier.py
+# Offline n-gram intent classifier behind the keyword engine.
+#
+# An utterance is hashed into a fixed-width vector of word unigrams, word
+# bigrams and character trigrams, weighted by how few intents use each
+# feature, and scored against every intent centroid with one matrix
+# multiply. The trained model is a single .npy file, one row per feature
+# bucket (the bucket's value in each intent centroid, then its weight), so
+# scoring gathers only the rows an utterance uses. Workers open it with
+# mmap_mode="r": loading reads no data and every worker shares the same
+# page-cache pages.
+#
+# classify() keeps intent_engine.classify's signature. The keyword engine
+# answers first (about a microsecond); the model only scores utterances no
+# keyword matches, so it adds latency to paraphrases alone. Below THRESHOLD
+# confidence, without numpy, or without a model file the answer stays
+# UNKNOWN.
+#
+#   python intent_classifier.py train   # models/intent_train.tsv -> model files
+#   python intent_classifier.py eval    # accuracy on models/intent_eval.tsv
+import json
+import os
+import re
+import sys
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import intent_engine
+
+np = None  # numpy is optional and slow to import; load() brings it in
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.environ.get("IVR_INTENT_MODEL", os.path.join(HERE, "models", "intent_centroids.npy"))
+TRAIN_PATH = os.path.join(HERE, "models", "intent_train.tsv")
+EVAL_PATH = os.path.join(HERE, "models", "intent_eval.tsv")
+DIM = 4096  # hashed feature buckets
+THRESHOLD = float(os.environ.get("IVR_INTENT_THRESHOLD", "0.25"))
+ENABLED = os.environ.get("IVR_INTENT_MODEL_ENABLED", "1") != "0"
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _bucket(gram):
+    return zlib.crc32(gram.encode("utf-8")) % DIM
+
+
+@lru_cache(maxsize=16384)
+def _word_buckets(word):
+    """Buckets of a word and its character trigrams; IVR vocabulary is small, so this is mostly cached."""
+    padded = f"<{word}>"
+    return (_bucket(f"w:{word}"),) + tuple(_bucket(f"c:{padded[i:i + 3]}") for i in range(len(padded) - 2))
+
+
+def features(text):
+    """Hashed feature buckets of `text`, with repeats."""
+    words = WORD_RE.findall(text.lower())
+    buckets = [bucket for word in words for bucket in _word_buckets(word)]
+    buckets += [_bucket(f"b:{a} {b}") for a, b in zip(words, words[1:])]
+    return buckets
+
+
+def read_examples(path):
+    """(intent, utterance) pairs from a tab-separated file; # lines are comments."""
+    with open(path, encoding="utf-8") as f:
+        rows = [line.rstrip("\n").split("\t", 1) for line in f if line.strip() and not line.startswith("#")]
+    return [(intent, text) for intent, text in rows]
+
+
+class Model:
+    def __init__(self, matrix, labels):
+        self.matrix = matrix  # (DIM, intents + 1): L2-normalized centroid columns, then feature weights
+        self.labels = labels
+        self.index = {label: i for i, label in enumerate(labels)}
+
+    def scores(self, texts):
+        """(len(texts), intents) cosine scores.
+
+        The utterances' feature vectors are kept sparse: every (text, bucket)
+        pair gathers its matrix row, and one multiply of the weighted counts
+        against those rows scores all texts at once.
+        """
+        counted = [Counter(features(text)) for text in texts]
+        buckets = [bucket for c in counted for bucket in c]
+        if not buckets:
+            return np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        gathered = self.matrix[buckets]
+        if len(texts) == 1:  # one live utterance: a vector, without the selector matrix
+            weighted = np.fromiter(counted[0].values(), np.float32, len(buckets)) * gathered[:, -1]
+            norm = np.sqrt(weighted @ weighted)
+            return (weighted @ gathered[:, :-1] / (norm or 1))[None]
+        # (texts x pairs) selector of weighted counts times (pairs x intents)
+        selector = np.zeros((len(texts), len(buckets)), dtype=np.float32)
+        start = 0
+        for row, c in enumerate(counted):
+            selector[row, start:start + len(c)] = list(c.values())
+            start += len(c)
+        selector *= gathered[:, -1]
+        norms = np.sqrt(np.einsum("ij,ij->i", selector, selector))
+        scores = selector @ gathered[:, :-1]
+        return scores / np.where(norms == 0, 1, norms)[:, None]
+
+    def predict(self, texts, allowed=None):
+        """[(intent, confidence)] per text; `allowed` limits the candidate intents."""
+        scores = self.scores(texts)
+        if allowed is not None:
+            scores = scores + self._mask(frozenset(allowed))
+        best = scores.argmax(axis=1)
+        return [(self.labels[b], float(scores[row, b])) for row, b in enumerate(best)]
+
+    @lru_cache(maxsize=64)
+    def _mask(self, allowed):
+        """0 for the `allowed` intents, -inf for the rest; menus reuse a handful of these."""
+        mask = np.full(len(self.labels), -np.inf, dtype=np.float32)
+        mask[[self.index[i] for i in allowed if i in self.index]] = 0
+        return mask
+
+
+def train(examples):
+    """Fit centroids from (intent, utterance) pairs; returns (matrix, labels)."""
+    labels = sorted({intent for intent, _ in examples})
+    counts = np.zeros((len(labels), DIM), dtype=np.float32)
+    for intent, text in examples:
+        np.add.at(counts[labels.index(intent)], features(text), 1.0)
+    # A feature seen under fewer intents says more about the intent.
+    used_by = (counts > 0).sum(axis=0)
+    weights = np.where(used_by > 0, np.log((1 + len(labels)) / (1 + used_by)) + 1, 0).astype(np.float32)
+    centroids = counts * weights
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+    return np.ascontiguousarray(np.vstack([centroids, weights]).T), labels
+
+
+def save(matrix, labels, path=MODEL_PATH):
+    np.save(path, matrix)
+    with open(labels_path(path), "w", encoding="utf-8") as f:
+        json.dump({"labels": labels, "dim": DIM}, f, indent=2)
+        f.write("\n")
+
+
+def labels_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+_model = None
+_load_error = None
+
+
+def load(path=MODEL_PATH):
+    """The memory-mapped model, or None when numpy or the model files are missing."""
+    global _model, _load_error
+    if _model is None and _load_error is None:
+        try:
+            _import_numpy()
+            with open(labels_path(path), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["dim"] != DIM:
+                raise ValueError(f"model has {meta['dim']} buckets, expected {DIM}")
+            # asarray: a plain ndarray view of the map indexes faster than np.memmap
+            _model = Model(np.asarray(np.load(path, mmap_mode="r")), meta["labels"])
+        except (ImportError, OSError, ValueError, KeyError) as e:
+            _load_error = e
+    return _model
+
+
+def predict(text, allowed=None):
+    """(intent, confidence); confidence is None when the keyword engine answered."""
+    intent = intent_engine.classify(text, allowed=allowed)
+    model = load() if ENABLED and text and intent == intent_engine.UNKNOWN else None
+    if model is not None:
+        guess, confidence = model.predict([text], allowed)[0]
+        if confidence >= THRESHOLD:
+            return guess, confidence
+    return intent, None
+
+
+def classify(text, allowed=None):
+    return predict(text, allowed)[0]
+
+
+def classify_many(texts):
+    """classify() for a batch of utterances; the keyword misses are scored with one matrix multiply."""
+    intents = [intent_engine.classify(text) for text in texts]
+    misses = [i for i, (text, intent) in enumerate(zip(texts, intents)) if text and intent == intent_engine.UNKNOWN]
+    model = load() if ENABLED and misses else None
+    if model is not None:
+        for i, (intent, confidence) in zip(misses, model.predict([texts[i] for i in misses])):
+            if confidence >= THRESHOLD:
+                intents[i] = intent
+    return intents
+
+
+# ------------------ Training / Evaluation ------------------
+def evaluate(examples, model):
+    """Accuracy of the keyword engine, the model alone and classify() on `examples`."""
+    texts = [text for _, text in examples]
+    predicted = model.predict(texts)
+    keywords = [intent_engine.classify(t) for t in texts]
+    rows = {"keywords": keywords,
+            "model": [intent for intent, _ in predicted],
+            "keywords + model": [k if k != intent_engine.UNKNOWN else i if c >= THRESHOLD else k
+                                 for k, (i, c) in zip(keywords, predicted)]}
+    wanted = [intent for intent, _ in examples]
+    return {name: sum(a == b for a, b in zip(got, wanted)) / len(wanted) for name, got in rows.items()}
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "eval"
+    try:
+        _import_numpy()
+    except ImportError:
+        sys.exit("numpy is required to train or evaluate the intent model")
+    if command == "train":
+        matrix, labels = train(read_examples(TRAIN_PATH))
+        save(matrix, labels)
+        print(f"trained {len(labels)} intents -> {MODEL_PATH} ({os.path.getsize(MODEL_PATH)} bytes)")
+    elif command == "eval":
+        model = load()
+        if model is None:
+            sys.exit(f"no model: {_load_error}")
+        for name, accuracy in evaluate(read_examples(EVAL_PATH), model).items():
+            print(f"{name:<18} {accuracy:6.1%}")
+        print(f"threshold {THRESHOLD}")
+    else:
+        sys.exit("usage: python intent_classifier.py [train|eval]")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
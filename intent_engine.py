@@ -0,0 +1,110 @@
+# intent_engine.py
+# Keyword intent engine shared by the local (milestone3) and web (milestone4) IVRs.
+#
+# INTENT_TABLE is compiled once at import into a trie-shaped regex (shared
+# prefixes are factored out, so each position costs one branch on the next
+# character rather than one attempt per keyword) and every utterance is
+# classified in a single leftmost-longest scan. A keyword that contains
+# another ("recharge issue" contains "recharge") implies it, so nested
+# matches are never lost. When several intents match, the lowest priority
+# number wins; the order of rows in the table does not matter.
+import re
+
+UNKNOWN = "unknown"
+
+INTENT_TABLE = (
+    # intent            priority  keywords
+    ("check_balance",     10, ("balance",)),
+    ("plan_details",      20, ("plan",)),
+    ("offers",            30, ("offer",)),
+    ("data_packs",        40, ("data", "upgrade")),
+    ("recharge_issue",    50, ("recharge issue", "recharge failed", "not recharged", "not reflecting", "deducted")),
+    ("recharge",          60, ("recharge",)),
+    ("menu",              70, ("menu",)),
+    ("network_issue",     80, ("network", "signal", "coverage")),
+    ("sim_issue",         90, ("sim", "activation")),
+    ("customer_care",    100, ("customer", "care", "talk")),
+    ("thank",            110, ("thank",)),
+    ("exit",             120, ("exit", "bye")),
+)
+
+
+def _trie_regex(keywords):
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end of keyword
+
+    def build(node):
+        ends_here = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        # Greedy optional tail: the longest keyword at a position wins.
+        return group + "?" if ends_here else group
+
+    return re.compile(build(trie))
+
+
+class IntentEngine:
+    def __init__(self, table):
+        self.priority = {}
+        owner = {}
+        for intent, priority, keywords in table:
+            self.priority[intent] = priority
+            for keyword in keywords:
+                if keyword in owner:
+                    raise ValueError(f"Keyword {keyword!r} listed for both {owner[keyword]} and {intent}")
+                owner[keyword] = intent
+
+        keywords = list(owner)
+        self.pattern = _trie_regex(keywords)
+
+        # For each keyword: every intent it implies, best first.
+        self.implied = {}
+        for keyword in keywords:
+            intents = {owner[other] for other in keywords if other in keyword}
+            self.implied[keyword] = sorted(intents, key=self.priority.__getitem__)
+        # Best (priority, intent) per keyword, for the unrestricted fast path.
+        self.rank = {k: (self.priority[v[0]], v[0]) for k, v in self.implied.items()}
+
+    def matches(self, text):
+        """Return the set of intents whose keywords occur in `text`."""
+        found = set()
+        for keyword in self.pattern.findall(text):
+            found.update(self.implied[keyword])
+        return found
+
+    def classify(self, text, allowed=None):
+        """Return the highest-priority intent in `text`, or UNKNOWN.
+
+        `allowed` restricts the answer to a subset of intents, for menus
+        that only accept some of them.
+        """
+        if not text:
+            return UNKNOWN
+        found = self.pattern.findall(text)
+        if not found:
+            return UNKNOWN
+        if allowed is None:
+            return min(map(self.rank.__getitem__, found))[1]
+        best = UNKNOWN
+        best_priority = None
+        for keyword in found:
+            for intent in self.implied[keyword]:
+                if intent not in allowed:
+                    continue
+                priority = self.priority[intent]
+                if best_priority is None or priority < best_priority:
+                    best, best_priority = intent, priority
+                break
+        return best
+
+ENGINE = IntentEngine(INTENT_TABLE)
+classify = ENGINE.classify
+matches = ENGINE.matches
@@ -0,0 +1,90 @@
+# ivr_cache.py
+# Small in-process LRU cache with a per-entry TTL and hit/miss counters.
+#
+# Each worker process has its own copy, so the TTL is what bounds how stale
+# an entry can get after another worker writes; local writes should call
+# invalidate() so this worker never serves its own stale data. (Patching the
+# entry in place instead would let two writers land in the wrong order.)
+#
+# A read-through fill races with those writes: a reader that missed can
+# fetch the row just before a write commits and put it back just after the
+# write invalidated the key. Fillers take generation(key) before fetching
+# and pass it to put(), which drops the value if the key was written since.
+import threading
+import time
+from collections import OrderedDict
+
+GENERATION_STRIPES = 256  # keys share write counters by hash; a collision only skips a fill
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=30.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+        self._generations = [0] * GENERATION_STRIPES
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= self.clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def _written(self, key):
+        self._generations[hash(key) % GENERATION_STRIPES] += 1
+
+    def generation(self, key):
+        """Counter that moves whenever `key` is invalidated; see put()."""
+        with self._lock:
+            return self._generations[hash(key) % GENERATION_STRIPES]
+
+    def put(self, key, value, generation=None):
+        """Cache `value`; with `generation`, only if `key` has not been written since it was taken."""
+        with self._lock:
+            if generation is not None and self._generations[hash(key) % GENERATION_STRIPES] != generation:
+                return
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._written(key)
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generations = [n + 1 for n in self._generations]
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,216 @@
+# ivr_db.py
+# Shared SQLite access layer for the IVR backends.
+#
+# Connections are pooled per thread and re-opened after a fork, so every
+# gunicorn worker (and every worker thread inside it) keeps one long-lived
+# connection per database file instead of connecting for each statement.
+# Connections run in WAL mode with a busy timeout, and the fixed SQL below
+# is served from sqlite3's prepared-statement cache.
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+BUSY_TIMEOUT_MS = int(os.environ.get("IVR_DB_BUSY_TIMEOUT_MS", "5000"))
+# NORMAL: a commit in WAL mode does not fsync (a power cut may lose the last
+# commits). FULL fsyncs every commit; pair it with the write queue
+# (IVR_WRITE_BEHIND=1) so concurrent writes share each fsync.
+SYNCHRONOUS = os.environ.get("IVR_DB_SYNCHRONOUS", "NORMAL").upper()
+if SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"invalid IVR_DB_SYNCHRONOUS {SYNCHRONOUS!r}")
+STATEMENT_CACHE_SIZE = 64
+IN_CHUNK_SIZE = 500  # ids per "WHERE id IN (...)" query, well under SQLite's variable limit
+
+CUSTOMER_FIELDS = ("id", "name", "plan", "balance", "phone", "data_left")
+
+# ------------------ SQL ------------------
+SQL_CREATE_CUSTOMERS = """
+    CREATE TABLE IF NOT EXISTS customers (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        plan TEXT,
+        balance REAL,
+        phone TEXT,
+        data_left TEXT
+    )
+"""
+SQL_CREATE_IDEMPOTENCY_KEYS = """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        customer_id TEXT NOT NULL,
+        key TEXT NOT NULL,
+        result TEXT,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (customer_id, key)
+    )
+"""
+SQL_FETCH_CUSTOMER = "SELECT id, name, plan, balance, phone, data_left FROM customers WHERE id=?"
+SQL_FETCH_CUSTOMERS_IN = "SELECT id, name, plan, balance, phone, data_left FROM customers WHERE id IN ({})"
+SQL_FETCH_CUSTOMER_IDS = "SELECT id FROM customers"
+SQL_SAVE_CUSTOMER = """
+    INSERT OR REPLACE INTO customers (id, name, plan, balance, phone, data_left)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SQL_SET_PLAN = "UPDATE customers SET plan=?, data_left=? WHERE id=? RETURNING plan"
+SQL_ADD_BALANCE = "UPDATE customers SET balance=balance+? WHERE id=? RETURNING balance"
+SQL_FETCH_IDEMPOTENT = "SELECT result FROM idempotency_keys WHERE customer_id=? AND key=?"
+SQL_SAVE_IDEMPOTENT = "INSERT INTO idempotency_keys (customer_id, key, result, created_at) VALUES (?, ?, ?, ?)"
+SQL_PRUNE_IDEMPOTENT = "DELETE FROM idempotency_keys WHERE created_at < ?"
+
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+
+# ------------------ Connection Pool ------------------
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = []  # every connection opened by this process, for close_connections()
+_generation = 0  # bumped by close_connections() so other threads drop closed handles
+_savepoint_ids = itertools.count()
+
+
+def _open(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # autocommit; transaction() issues BEGIN itself
+        check_same_thread=False,  # only close_connections() crosses threads
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    with _pool_lock:
+        _pool.append((path, conn))
+    return conn
+
+
+def connect(path):
+    """Return this thread's pooled connection to `path`, opening it on first use."""
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        # Fresh thread, or a forked worker that inherited the parent's
+        # thread-local state: never reuse a connection across a fork.
+        _local.pid = pid
+        _local.generation = _generation
+        _local.conns = {}
+    elif _local.generation != _generation:
+        with _pool_lock:
+            live = {id(conn) for _, conn in _pool}
+        _local.conns = {p: c for p, c in _local.conns.items() if id(c) in live}
+        _local.generation = _generation
+    conn = _local.conns.get(path)
+    if conn is None:
+        conn = _local.conns[path] = _open(path)
+    return conn
+
+
+def close_connections(path=None):
+    """Close pooled connections (all of them, or only those for `path`)."""
+    global _generation
+    with _pool_lock:
+        _generation += 1
+        keep = []
+        for conn_path, conn in _pool:
+            if path is None or conn_path == path:
+                conn.close()
+            else:
+                keep.append((conn_path, conn))
+        _pool[:] = keep
+
+
+@contextmanager
+def transaction(path):
+    """Run the enclosed statements in one write transaction on the pooled connection.
+
+    Nested use opens a SAVEPOINT instead, so an inner block that fails is
+    rolled back on its own while the outer transaction carries on.
+    """
+    conn = connect(path)
+    if conn.in_transaction:
+        name = f"sp{next(_savepoint_ids)}"
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        conn.execute(f"RELEASE {name}")
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# ------------------ Customers ------------------
+def init_schema(path):
+    conn = connect(path)
+    conn.execute(SQL_CREATE_CUSTOMERS)
+    conn.execute(SQL_CREATE_IDEMPOTENCY_KEYS)
+    conn.execute(SQL_PRUNE_IDEMPOTENT, (time.time() - IDEMPOTENCY_TTL_SECONDS,))
+
+
+def row_to_customer(row):
+    return dict(zip(CUSTOMER_FIELDS, row))
+
+
+def fetch_customer(path, cid):
+    row = connect(path).execute(SQL_FETCH_CUSTOMER, (cid,)).fetchone()
+    return row_to_customer(row) if row else None
+
+
+def fetch_customers(path, cids):
+    """Fetch many customers with chunked "WHERE id IN (...)" queries; returns {id: customer}."""
+    cids = list(dict.fromkeys(cids))
+    found = {}
+    conn = connect(path)
+    for start in range(0, len(cids), IN_CHUNK_SIZE):
+        chunk = cids[start:start + IN_CHUNK_SIZE]
+        sql = SQL_FETCH_CUSTOMERS_IN.format(",".join("?" * len(chunk)))
+        for row in conn.execute(sql, chunk):
+            found[row[0]] = row_to_customer(row)
+    return found
+
+
+def fetch_customer_ids(path):
+    return [row[0] for row in connect(path).execute(SQL_FETCH_CUSTOMER_IDS)]
+
+
+def save_customer(path, cid, name, plan, balance, phone, data_left):
+    connect(path).execute(SQL_SAVE_CUSTOMER, (cid, name, plan, balance, phone, data_left))
+
+
+# ------------------ Atomic Mutations ------------------
+# Each mutation is one UPDATE ... RETURNING, so concurrent workers never
+# lose an update and callers need no read before the write. With an
+# idempotency key the update and the key are recorded in one transaction;
+# a retry with the same key returns the recorded result without applying
+# the change again.
+def _mutate(path, cid, sql, params, idempotency_key):
+    if not idempotency_key:
+        row = connect(path).execute(sql, params).fetchone()
+        return row[0] if row else None
+    with transaction(path) as conn:
+        done = conn.execute(SQL_FETCH_IDEMPOTENT, (cid, idempotency_key)).fetchone()
+        if done:
+            return done[0]
+        row = conn.execute(sql, params).fetchone()
+        if row is None:
+            return None
+        conn.execute(SQL_SAVE_IDEMPOTENT, (cid, idempotency_key, row[0], time.time()))
+        return row[0]
+
+
+def add_balance(path, cid, amount, idempotency_key=None):
+    """Credit `amount` and return the new balance (None if the customer does not exist)."""
+    balance = _mutate(path, cid, SQL_ADD_BALANCE, (amount, cid), idempotency_key)
+    return float(balance) if balance is not None else None
+
+
+def set_plan(path, cid, plan, data_left, idempotency_key=None):
+    """Move the customer to `plan`; return the plan name (None if the customer does not exist)."""
+    return _mutate(path, cid, SQL_SET_PLAN, (plan, data_left, cid), idempotency_key)
@@ -0,0 +1,127 @@
+# ivr_logging.py
+# Non-blocking structured logging for the web backend.
+#
+# Request threads only put LogRecords on a queue: the message is not even
+# %-formatted there. A QueueListener thread formats each record as one JSON
+# line (with customer_id / intent / duration_ms / event fields when the
+# caller passes them in `extra`) and writes it to a rotating file. High-volume
+# INFO events can be sampled before they are enqueued, and the queue is
+# drained on interpreter exit.
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+STRUCTURED_FIELDS = ("event", "customer_id", "intent", "duration_ms")
+
+_listeners = []
+
+
+def parse_sample_rates(spec):
+    """Parse "event=rate,event=rate" (e.g. "intent_processed=0.1") into a dict."""
+    rates = {}
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        event, _, rate = part.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of INFO-and-below records for the configured events."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rates.get(getattr(record, "event", None))
+        return rate is None or random.random() < rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    # The stock prepare() formats the message on the calling thread; leave
+    # that to the listener so a request only pays for the enqueue.
+    def prepare(self, record):
+        return record
+
+
+class ReopeningRotatingFileHandler(RotatingFileHandler):
+    # Like WatchedFileHandler: if the file was removed (log cleanup, tests),
+    # start a new one instead of writing into the unlinked inode.
+    def emit(self, record):
+        if self.stream is not None and not os.path.exists(self.baseFilename):
+            self.stream.close()
+            self.stream = None
+        super().emit(record)
+
+
+def setup_logger(name, path, level=logging.INFO, sample_rates=None, max_bytes=1_000_000, backup_count=3):
+    """Attach a queue-backed JSON-lines file pipeline to logger `name` (once)."""
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    file_handler = ReopeningRotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    records = queue.Queue()
+    queue_handler = DeferredQueueHandler(records)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(records, file_handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append((queue_handler, listener))
+    return logger
+
+
+def flush():
+    """Block until every record enqueued so far has been written."""
+    for _, listener in _listeners:
+        listener.queue.join()
+        for handler in listener.handlers:
+            handler.flush()
+
+
+def shutdown():
+    while _listeners:
+        _listeners.pop()[1].stop()  # stop() drains the queue before returning
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork() and the parent's queue may
+    # have been locked mid-operation; give the child a fresh queue and thread.
+    for queue_handler, listener in _listeners:
+        queue_handler.queue = listener.queue = queue.Queue()
+        listener._thread = None
+        listener.start()
+
+
+atexit.register(shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -1,9 +1,19 @@
 # msp_ivr_twilio.py
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI, Form
 from fastapi.responses import Response
 from twilio.rest import Client
 from twilio.twiml.voice_response import VoiceResponse
 
+import dialogue
+import recording_worker
+import ticket_store
+from session_store import CallSession, create_store
+from twiml_cache import TwimlTemplate, render_static
+
 # -----------------------------
 # Twilio Credentials
 # -----------------------------
@@ -21,52 +31,163 @@ client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 # -----------------------------
 # FastAPI app
 # -----------------------------
-app = FastAPI(title="MSP AI-IVR Twilio Demo")
+def init_db():
+    ticket_store.init_schema(TICKET_DB)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    init_db()
+    yield
+
+
+app = FastAPI(title="MSP AI-IVR Twilio Demo", lifespan=lifespan)
 
 # -----------------------------
 # Mock customer database
 # -----------------------------
 customers = {
-    "1001": {"name": "Alice", "plan": "Data 2GB/day", "balance": "500MB", "issues": []},
-    "1002": {"name": "Bob", "plan": "Unlimited Calls", "balance": "1GB", "issues": ["Network drop"]},
+    "1001": {"name": "Alice", "plan": "Data 2GB/day", "balance": "500MB"},
+    "1002": {"name": "Bob", "plan": "Unlimited Calls", "balance": "1GB"},
 }
 
-# Session storage for call context
-call_sessions = {}
+# Issues go to the ticket store shared with the web IVR
+TICKET_DB = ticket_store.DEFAULT_PATH  # schema created by init_db() at startup
+
+# Session storage for call context (expiring; shared across workers by default).
+# The store does blocking SQLite I/O, so handlers that touch it are plain
+# `def`: Starlette runs them on its threadpool instead of the event loop.
+call_sessions = create_store()
 
 # -----------------------------
 # Make a test call from Twilio
 # -----------------------------
 
 @app.get("/")
-def home():
+async def home():
       return {"status": "MSP IVR running"}
 
 
-def make_call():
-    ngrok_url = "https://ned-ecalcarate-blankly.ngrok-free.dev/twilio/start/" 
+# Webhook Twilio fetches when an outbound call is answered
+CALL_WEBHOOK_URL = os.environ.get("IVR_CALL_WEBHOOK_URL", "https://ned-ecalcarate-blankly.ngrok-free.dev/twilio/start/")
+
+
+def place_call(to, url=CALL_WEBHOOK_URL, twilio_client=None):
+    """Start an outbound call and return its SID; raises TwilioRestException (with .status) on failure."""
+    call = (twilio_client or client).calls.create(
+        to=to,
+        from_=TWILIO_NUMBER,
+        url=url
+    )
+    return call.sid
+
+
+def make_call(to=VERIFIED_NUMBER, url=CALL_WEBHOOK_URL):
     try:
-        call = client.calls.create(
-            to=VERIFIED_NUMBER,
-            from_=TWILIO_NUMBER,
-            url=ngrok_url
-        )
-        return {"message": "Test call initiated", "call_sid": call.sid}
+        return {"message": "Test call initiated", "call_sid": place_call(to, url)}
     except Exception as e:
         return {"message": "Call failed", "error": str(e)}
 
 
 # -----------------------------
-# Twilio IVR Start Endpoint
+# Precompiled TwiML documents
 # -----------------------------
-@app.post("/twilio/start")
-def twilio_start(CallSid: str = Form(...), From: str = Form(...)):
-    call_sessions[CallSid] = {"customer_id": "1001", "step": "main_menu"}  # demo customer
+# Rendered once at startup; webhooks only send bytes (see twiml_cache).
+def _welcome():
     resp = VoiceResponse()
     gather = resp.gather(num_digits=1, action="/twilio/handle_input", method="POST")
     gather.say("Welcome to SmartTel Customer Support!", voice="alice")
     gather.say("Press 1 to check balance. Press 2 to recharge. Press 3 to report an issue.", voice="alice")
-    return Response(content=str(resp), media_type="application/xml")
+    return resp
+
+def _session_not_found():
+    resp = VoiceResponse()
+    resp.say("Session not found. Ending call.", voice="alice")
+    resp.hangup()
+    return resp
+
+def _balance(balance):
+    resp = VoiceResponse()
+    resp.say(f"Your remaining data balance is {balance}.", voice="alice")
+    resp.redirect("/twilio/start")
+    return resp
+
+def _recharge_prompt(plan):
+    resp = VoiceResponse()
+    gather = resp.gather(num_digits=4, action="/twilio/handle_input", method="POST")
+    gather.say(f"Your current plan is {plan}. Enter recharge amount.", voice="alice")
+    return resp
+
+def _report_issue():
+    resp = VoiceResponse()
+    resp.say("Please describe your issue after the beep.", voice="alice")
+    resp.record(max_length=30, action="/twilio/recording")
+    return resp
+
+def _invalid_input():
+    resp = VoiceResponse()
+    resp.say("Invalid input. Returning to main menu.", voice="alice")
+    resp.redirect("/twilio/start")
+    return resp
+
+def _recharge_done(amount, name):
+    resp = VoiceResponse()
+    resp.say(f"Recharge of {amount} successful for {name}.", voice="alice")
+    resp.redirect("/twilio/start")
+    return resp
+
+def _issue_recorded():
+    resp = VoiceResponse()
+    resp.say("Your issue has been recorded. Our support team will contact you.", voice="alice")
+    resp.redirect("/twilio/start")
+    return resp
+
+WELCOME_TWIML = render_static(_welcome)
+SESSION_NOT_FOUND_TWIML = render_static(_session_not_found)
+REPORT_ISSUE_TWIML = render_static(_report_issue)
+INVALID_INPUT_TWIML = render_static(_invalid_input)
+ISSUE_RECORDED_TWIML = render_static(_issue_recorded)
+EMPTY_TWIML = render_static(VoiceResponse)
+BALANCE_TWIML = TwimlTemplate(_balance, "balance")
+RECHARGE_PROMPT_TWIML = TwimlTemplate(_recharge_prompt, "plan")
+RECHARGE_DONE_TWIML = TwimlTemplate(_recharge_done, "amount", "name")
+
+def twiml(content):
+    return Response(content=content, media_type="application/xml")
+
+
+# -----------------------------
+# Call flow
+# -----------------------------
+# Symbols are the digits the caller pressed; "recording" arrives from the
+# recording webhook. The session stores the serialized dialogue state.
+TWILIO_FLOW = dialogue.compile_flow("twilio", "main_menu", {
+    "main_menu": {
+        "on": {"1": ("main_menu", "balance"), "2": ("recharge_plan", "recharge_prompt"), "3": ("report_issue", "report_issue")},
+        "default": ("main_menu", "invalid_input"),
+    },
+    "recharge_plan": {"default": ("main_menu", "recharge_done")},
+    "report_issue": {},
+}, global_on={"recording": ("main_menu", "issue_recorded")})
+
+# action -> TwiML body, given the customer record and the digits pressed
+TWILIO_ACTIONS = {
+    "balance": lambda customer, digits: BALANCE_TWIML.render(balance=customer['balance']),
+    "recharge_prompt": lambda customer, digits: RECHARGE_PROMPT_TWIML.render(plan=customer['plan']),
+    "report_issue": lambda customer, digits: REPORT_ISSUE_TWIML,
+    "invalid_input": lambda customer, digits: INVALID_INPUT_TWIML,
+    "recharge_done": lambda customer, digits: RECHARGE_DONE_TWIML.render(amount=digits, name=customer['name']),
+    "issue_recorded": lambda customer, digits: ISSUE_RECORDED_TWIML,
+}
+
+
+# -----------------------------
+# Twilio IVR Start Endpoint
+# -----------------------------
+@app.post("/twilio/start")
+def twilio_start(CallSid: str = Form(...), From: str = Form(...)):
+    call_sessions.save(CallSession(CallSid, "1001", TWILIO_FLOW.dumps(TWILIO_FLOW.start)))  # demo customer
+    return twiml(WELCOME_TWIML)
 
 
 # -----------------------------
@@ -76,55 +197,83 @@ def twilio_start(CallSid: str = Form(...), From: str = Form(...)):
 def twilio_handle_input(Digits: str = Form(...), CallSid: str = Form(...)):
     digits = Digits
     call_id = CallSid
-    response = VoiceResponse()
     
     session = call_sessions.get(call_id)
     if not session:
-        response.say("Session not found. Ending call.", voice="alice")
-        response.hangup()
-        return Response(content=str(response), media_type="application/xml")
-    
-    customer = customers[session["customer_id"]]
+        return twiml(SESSION_NOT_FOUND_TWIML)
     
-    if session["step"] == "main_menu":
-        if digits == "1":
-            session["step"] = "main_menu"
-            response.say(f"Your remaining data balance is {customer['balance']}.", voice="alice")
-            response.redirect("/twilio/start")
-        elif digits == "2":
-            session["step"] = "recharge_plan"
-            gather = response.gather(num_digits=4, action="/twilio/handle_input", method="POST")
-            gather.say(f"Your current plan is {customer['plan']}. Enter recharge amount.", voice="alice")
-        elif digits == "3":
-            session["step"] = "report_issue"
-            response.say("Please describe your issue after the beep.", voice="alice")
-            response.record(max_length=30, action="/twilio/recording")
-        else:
-            response.say("Invalid input. Returning to main menu.", voice="alice")
-            response.redirect("/twilio/start")
-    elif session["step"] == "recharge_plan":
-        session["step"] = "main_menu"
-        response.say(f"Recharge of {digits} successful for {customer['name']}.", voice="alice")
-        response.redirect("/twilio/start")
-    
-    return Response(content=str(response), media_type="application/xml")
+    customer = customers[session.customer_id]
+    state, action = TWILIO_FLOW.step(TWILIO_FLOW.loads(session.step), digits)
+    session.step = TWILIO_FLOW.dumps(state)
+    body = TWILIO_ACTIONS[action](customer, digits) if action else EMPTY_TWIML
+
+    call_sessions.save(session)
+    return twiml(body)
 
 
 # -----------------------------
 # Handle Recorded Issues
 # -----------------------------
+# The webhook only queues the recording; workers fetch, transcribe and
+# classify it in the background and then file the ticket. A recording that
+# could not be queued or processed is filed as a general ticket with its URL.
+# The URL is the idempotency key, so a retried webhook files one ticket.
+# The webhook is a plain def (threadpool), so that fallback write and the
+# session store never run on the event loop.
+def _file_recording(customer_id, url, category=ticket_store.GENERAL, transcript=None):
+    summary = f"Voice message: {transcript} [{url}]" if transcript else f"Voice message: {url}"
+    ticket_store.add(TICKET_DB, customer_id, category, summary, "twilio", idempotency_key=url)
+
+
+def _recording_processed(recording):
+    if recording.error is not None:
+        _file_recording(recording.customer_id, recording.url)
+    else:
+        _file_recording(recording.customer_id, recording.url, ticket_store.category_for(recording.intent),
+                        recording.transcript)
+
+
+recordings = recording_worker.RecordingPipeline(
+    recording_worker.HttpSource(auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN), suffix=".wav"),
+    on_done=_recording_processed)
+
+
 @app.post("/twilio/recording")
 def twilio_recording(RecordingUrl: str = Form(...), CallSid: str = Form(...)):
     session = call_sessions.get(CallSid)
     if session:
-        customer = customers[session["customer_id"]]
-        customer["issues"].append(f"Voice message: {RecordingUrl}")
-        session["step"] = "main_menu"
+        if recordings.submit(CallSid, session.customer_id, RecordingUrl) is None:  # queue full
+            _file_recording(session.customer_id, RecordingUrl)
+        state, _ = TWILIO_FLOW.step(TWILIO_FLOW.loads(session.step), "recording")
+        session.step = TWILIO_FLOW.dumps(state)
+        call_sessions.save(session)
     
-    resp = VoiceResponse()
-    resp.say("Your issue has been recorded. Our support team will contact you.", voice="alice")
-    resp.redirect("/twilio/start")
-    return Response(content=str(resp), media_type="application/xml")
+    return twiml(ISSUE_RECORDED_TWIML)
+
+
+@app.get("/ivr/recordings/stats")
+async def recording_stats():
+    return recordings.stats()
+
+
+# -----------------------------
+# Issue tickets
+# -----------------------------
+# Newest first; pass "next" back as `before` for the following page. These
+# read SQLite, so they are plain def and run on Starlette's threadpool.
+@app.get("/ivr/issues")
+def list_issues(category: Optional[str] = None, status: Optional[str] = None,
+                customer_id: Optional[str] = None, since: Optional[float] = None,
+                until: Optional[float] = None, before: Optional[int] = None,
+                limit: int = ticket_store.PAGE_SIZE):
+    issues, cursor = ticket_store.page(TICKET_DB, limit, category=category, status=status, customer_id=customer_id,
+                                       since=since, until=until, before=before)
+    return {"issues": issues, "next": cursor}
+
+
+@app.get("/ivr/issues/counts")
+def issue_counts():
+    return ticket_store.counts(TICKET_DB)
 
 
 # -----------------------------
@@ -134,4 +283,5 @@ def twilio_recording(RecordingUrl: str = Form(...), CallSid: str = Form(...)):
 def customer_status(customer_id: str):
     if customer_id not in customers:
         return {"error": "Customer not found"}
-    return customers[customer_id]
+    issues, _ = ticket_store.page(TICKET_DB, 10, customer_id=customer_id)
+    return {**customers[customer_id], "issues": [issue["summary"] for issue in issues]}
@@ -1,35 +1,61 @@
-import sqlite3
 from datetime import datetime
 import speech_recognition as sr
-import pyttsx3
-import time
 import os
 
+import dialogue
+import entities
+import intent_classifier
+import ivr_db
+import speech_input
+import speech_output
+
 # ------------------ Voice Engine ------------------
+WELCOME_PROMPT = "Welcome to SmartTel Hybrid Voice IVR system."
+CUSTOMER_ID_PROMPT = "Please say your customer I D, for example one zero zero one."
+MAIN_MENU_PROMPT = "Main menu. You can say check balance, plan details, offers, data packs, recharge, talk to customer care, or exit."
+OFFERS_PROMPT = "Here are your latest offers: 10% cashback on recharge above 299, double data on Premium plan, and weekend free calls on Super 699 plan."
+GOODBYE_PROMPT = "Thank you for using SmartTel IVR. Goodbye!"
+FIXED_PROMPTS = [WELCOME_PROMPT, CUSTOMER_ID_PROMPT, MAIN_MENU_PROMPT, OFFERS_PROMPT, GOODBYE_PROMPT]
+
+# IVR_TTS_OUTPUT_DIR renders every utterance to WAV files instead of the speakers.
+TTS_CACHE_DIR = os.environ.get("IVR_TTS_CACHE_DIR", "prompt_cache")
+TTS_OUTPUT_DIR = os.environ.get("IVR_TTS_OUTPUT_DIR") or None
+
+tts = None
+
+def start_tts():
+    """Start the TTS worker once and queue the fixed prompts for pre-rendering."""
+    global tts
+    if tts is None:
+        tts = speech_output.TTSWorker(cache_dir=TTS_CACHE_DIR, output_dir=TTS_OUTPUT_DIR)
+        tts.prerender(FIXED_PROMPTS)
+    return tts
+
 def speak(text):
     print(f"🗣 BOT: {text}")
     try:
-        engine = pyttsx3.init()
-        voices = engine.getProperty('voices')
-        engine.setProperty('voice', voices[1].id)
-        engine.setProperty('rate', 165)
-        engine.say(text)
-        engine.runAndWait()
-        engine.stop()
-        time.sleep(0.3)
+        start_tts().speak(text)
     except Exception as e:
         print(f"[Speech error] {e}")
 
+# IVR_SPEECH_BACKEND picks the recognizer (google, sphinx); IVR_SPEECH_REPLAY
+# names a script of caller turns to run without a microphone.
+speech_in = None
+
+def start_input():
+    """Open and calibrate the microphone (or load the replay script) once."""
+    global speech_in
+    if speech_in is None:
+        speech_in = speech_input.create_input()
+    return speech_in
+
 def listen():
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("\n🎧 Listening...")
-        r.pause_threshold = 1
-        audio = r.listen(source)
+    source = start_input()
+    print("\n🎧 Listening...")
     try:
-        text = r.recognize_google(audio, language='en-IN')
+        text = source.listen()
         print(f"👤 YOU: {text}")
-        return text.lower()
+        return text
     except sr.UnknownValueError:
         speak("Sorry, I didn’t catch that.")
         return ""
@@ -38,40 +64,25 @@ def listen():
         return ""
 
 # ------------------ Database ------------------
+DB_FILE = "ivr.db"
+
 def init_db():
-    conn = sqlite3.connect("ivr.db")
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS customers (
-            id TEXT PRIMARY KEY,
-            name TEXT,
-            plan TEXT,
-            balance REAL,
-            phone TEXT,
-            data_left TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    ivr_db.init_schema(DB_FILE)
 
 def fetch_customer(cid):
-    conn = sqlite3.connect("ivr.db")
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM customers WHERE id=?", (cid,))
-    row = cur.fetchone()
-    conn.close()
-    if row:
-        return {"id": row[0], "name": row[1], "plan": row[2], "balance": row[3], "phone": row[4], "data_left": row[5]}
-    return None
+    return ivr_db.fetch_customer(DB_FILE, cid)
 
 def save_customer(cid, name):
-    conn = sqlite3.connect("ivr.db")
-    conn.execute("""
-        INSERT OR REPLACE INTO customers (id, name, plan, balance, phone, data_left)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (cid, name, "SmartPlan 299", 150.0, "9999999999", "1.5 GB"))
-    conn.commit()
-    conn.close()
+    ivr_db.save_customer(DB_FILE, cid, name, "SmartPlan 299", 150.0, "9999999999", "1.5 GB")
+    known_ids.add(cid)
+
+# Every customer ID in the database, loaded once in main_ivr(); unknown and
+# near-miss IDs are settled here without a query per guess.
+known_ids = entities.CustomerIndex()
+
+def load_known_ids():
+    global known_ids
+    known_ids = entities.CustomerIndex(ivr_db.fetch_customer_ids(DB_FILE))
 
 # ------------------ Intents ------------------
 def intent_check_balance(cust):
@@ -88,41 +99,33 @@ def intent_data_packs(cust):
     speak(f"Your current plan is {cust['plan']} with {cust['data_left']} data per day.")
     speak("Available upgrades include: Premium 499 with 2.5 GB per day, and Super 699 with 4 GB per day. Would you like to upgrade?")
     ans = listen()
-    if "yes" in ans:
-        speak("Upgrading you to Premium Plan 499. Enjoy higher data speed and extra benefits!")
-        cust['plan'] = "Premium 499"
-        cust['data_left'] = "2.5 GB"
-        conn = sqlite3.connect("ivr.db")
-        conn.execute("UPDATE customers SET plan=?, data_left=? WHERE id=?", (cust['plan'], cust['data_left'], cust['id']))
-        conn.commit()
-        conn.close()
+    plan = entities.plan_name(ans) or ("Premium 499" if "yes" in ans else None)
+    if plan and "no" not in ans.split():
+        speak(f"Upgrading you to {plan}. Enjoy higher data speed and extra benefits!")
+        cust['plan'] = ivr_db.set_plan(DB_FILE, cust['id'], plan, entities.PLANS[plan])
+        cust['data_left'] = entities.PLANS[plan]
         speak("Upgrade successful.")
-        return "Upgraded to Premium Plan."
+        return f"Upgraded to {plan}."
     else:
         speak("No problem. You can upgrade anytime from the main menu.")
         return "Upgrade skipped."
 
 def intent_offers(cust):
-    speak("Here are your latest offers: 10% cashback on recharge above 299, double data on Premium plan, and weekend free calls on Super 699 plan.")
+    speak(OFFERS_PROMPT)
     return "Offers shared."
 
+RECHARGE_AMOUNTS = (199, 299, 499)
+
 def intent_recharge(cust):
     speak("Here are some recharge options: 199, 299, or 499 rupees. Please say your choice.")
-    choice = listen()
-    if "199" in choice:
-        amount = 199
-    elif "299" in choice:
-        amount = 299
-    elif "499" in choice:
-        amount = 499
-    else:
+    amount = entities.amount(listen(), RECHARGE_AMOUNTS)
+    if amount is None:
+        speak("Sorry, please say 199, 299, or 499.")
+        amount = entities.amount(listen(), RECHARGE_AMOUNTS)
+    if amount is None:
         speak("Invalid option. Defaulting to 199 rupees.")
         amount = 199
-    cust['balance'] += amount
-    conn = sqlite3.connect("ivr.db")
-    conn.execute("UPDATE customers SET balance=? WHERE id=?", (cust["balance"], cust["id"]))
-    conn.commit()
-    conn.close()
+    cust['balance'] = ivr_db.add_balance(DB_FILE, cust["id"], amount)
     reply = f"Recharge of rupees {amount} successful. New balance is {cust['balance']} rupees."
     speak(reply)
     return reply
@@ -141,124 +144,75 @@ def intent_sim_issue(cust):
 
 def intent_customer_care(cust):
     speak("Connecting you to SmartTel customer care. Please describe your issue.")
-    while True:
-        issue = listen()
-        if not issue:
-            continue
-
-        # Direct mapping from customer care
-        if "menu" in issue or "main menu" in issue:
-            speak("Opening main menu for you.")
-            main_menu(cust)
-            break
-        elif "balance" in issue:
-            intent_check_balance(cust)
-        elif "plan" in issue:
-            intent_plan_details(cust)
-        elif "recharge issue" in issue:
-            intent_recharge_issue(cust)
-        elif "recharge" in issue:
-            intent_recharge(cust)
-        elif "data" in issue or "upgrade" in issue:
-            intent_data_packs(cust)
-        elif "offer" in issue:
-            intent_offers(cust)
-        elif "network" in issue or "signal" in issue or "coverage" in issue:
-            intent_network_issue(cust)
-        elif "sim" in issue or "activation" in issue:
-            intent_sim_issue(cust)
-        elif "thank" in issue:
-            speak("Would you like to continue or exit?")
-            ans = listen()
-            if "exit" in ans:
-                speak("Thank you for contacting SmartTel support. Have a nice day!")
-                break
-        elif "bye" in issue or "exit" in issue:
-            speak("Thank you for contacting SmartTel support. Goodbye!")
-            break
-        else:
-            speak("Sorry, could you please explain again?")
-    return "Customer care ended."
+    return "Customer care started."
 
 def intent_exit(cust):
-    speak("Thank you for using SmartTel IVR. Goodbye!")
+    speak(GOODBYE_PROMPT)
     return "exit"
 
 def intent_unknown(cust):
     speak("Sorry, I didn’t understand that.")
     return "unknown"
 
-# ------------------ Menu ------------------
+# ------------------ Dialogue ------------------
 def detect_intent(user_text):
-    if not user_text:
-        return "unknown"
-    if "balance" in user_text:
-        return "check_balance"
-    elif "plan" in user_text:
-        return "plan_details"
-    elif "offer" in user_text:
-        return "offers"
-    elif "data" in user_text or "upgrade" in user_text:
-        return "data_packs"
-    elif "recharge issue" in user_text:
-        return "recharge_issue"
-    elif "recharge" in user_text:
-        return "recharge"
-    elif "network" in user_text or "signal" in user_text:
-        return "network_issue"
-    elif "sim" in user_text or "activation" in user_text:
-        return "sim_issue"
-    elif "customer" in user_text or "care" in user_text or "talk" in user_text:
-        return "customer_care"
-    elif "exit" in user_text or "bye" in user_text:
-        return "exit"
-    else:
-        return "unknown"
-
-def main_menu(cust):
-    while True:
-        speak("Main menu. You can say check balance, plan details, offers, data packs, recharge, talk to customer care, or exit.")
+    return intent_classifier.classify(user_text)
+
+# Prompt keys of dialogue.VOICE_FLOW; formatted with the customer record.
+PROMPTS = {
+    "welcome": "Welcome back {name}. Would you like to open the main menu or talk to customer care?",
+    "main_menu": MAIN_MENU_PROMPT,
+    "care_confirm": "Would you like to continue or exit?",
+}
+
+ACTIONS = {
+    "check_balance": intent_check_balance,
+    "plan_details": intent_plan_details,
+    "offers": intent_offers,
+    "data_packs": intent_data_packs,
+    "recharge": intent_recharge,
+    "recharge_issue": intent_recharge_issue,
+    "network_issue": intent_network_issue,
+    "sim_issue": intent_sim_issue,
+    "customer_care": intent_customer_care,
+    "exit": intent_exit,
+    "unknown": intent_unknown,
+    "default_menu": lambda cust: speak("Opening main menu by default."),
+    "care_menu": lambda cust: speak("Opening main menu for you."),
+    "care_retry": lambda cust: speak("Sorry, could you please explain again?"),
+    "care_exit": lambda cust: speak("Thank you for contacting SmartTel support. Goodbye!"),
+    "care_thanks": lambda cust: speak("Thank you for contacting SmartTel support. Have a nice day!"),
+}
+
+def run_dialogue(cust, flow=dialogue.VOICE_FLOW):
+    """One loop iteration per caller turn until the flow ends; no recursion between menus."""
+    state = flow.start
+    while state != flow.end:
+        prompt = PROMPTS.get(flow.prompt(state))
+        if prompt:
+            speak(prompt.format(**cust))
         user_text = listen()
-        intent = detect_intent(user_text)
-
-        if intent == "check_balance":
-            intent_check_balance(cust)
-        elif intent == "plan_details":
-            intent_plan_details(cust)
-        elif intent == "offers":
-            intent_offers(cust)
-        elif intent == "data_packs":
-            intent_data_packs(cust)
-        elif intent == "recharge":
-            intent_recharge(cust)
-        elif intent == "recharge_issue":
-            intent_recharge_issue(cust)
-        elif intent == "network_issue":
-            intent_network_issue(cust)
-        elif intent == "sim_issue":
-            intent_sim_issue(cust)
-        elif intent == "customer_care":
-            intent_customer_care(cust)
-        elif intent == "exit":
-            intent_exit(cust)
-            break
-        else:
-            intent_unknown(cust)
+        state, action = flow.step(state, detect_intent(user_text) if user_text else dialogue.SILENCE)
+        if action:
+            ACTIONS[action](cust)
 
 # ------------------ Main ------------------
 def main_ivr():
     init_db()
+    load_known_ids()
     save_customer("1001", "Aiza")
-
-    speak("Welcome to SmartTel Hybrid Voice IVR system.")
-    speak("Please say your customer I D, for example one zero zero one.")
-    cid_text = listen().replace(" ", "")
-
-    mapping = {"one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9", "zero": "0"}
-    for w, n in mapping.items():
-        cid_text = cid_text.replace(w, n)
-
-    cust = fetch_customer(cid_text)
+    start_input()  # calibrate against ambient noise before the bot starts talking
+
+    speak(WELCOME_PROMPT)
+    speak(CUSTOMER_ID_PROMPT)
+    cid_text = entities.customer_id(listen())
+
+    cid = known_ids.resolve(cid_text)
+    if cid and cid != cid_text:
+        speak(f"Did you mean customer I D {' '.join(cid)}?")
+        if "yes" not in listen():
+            cid = None
+    cust = fetch_customer(cid) if cid else None
     if not cust:
         speak(f"Customer I D {cid_text} not found. Would you like to register?")
         ans = listen()
@@ -272,17 +226,12 @@ def main_ivr():
             speak("Okay, please register later. Goodbye.")
             return
 
-    speak(f"Welcome back {cust['name']}. Would you like to open the main menu or talk to customer care?")
-    choice = listen()
-    if "menu" in choice:
-        main_menu(cust)
-    elif "customer" in choice or "care" in choice or "talk" in choice:
-        intent_customer_care(cust)
-    else:
-        speak("Opening main menu by default.")
-        main_menu(cust)
+    run_dialogue(cust)
 
 if __name__ == "__main__":
     os.system('cls' if os.name == 'nt' else 'clear')
     print("🎤 Starting SmartTel Voice IVR...")
-    main_ivr()
+    try:
+        main_ivr()
+    except EOFError:
+        print("Replay script finished.")
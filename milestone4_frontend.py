@@ -29,6 +29,7 @@ header h1 {margin:0; font-size:2.5rem; letter-spacing:1px; animation:fadeInDown
 <script>
 const logDiv = document.getElementById("log");
 const startBtn = document.getElementById("startBtn");
+const BACKEND_URL = "https://smarttel-ivr.onrender.com";
 let voices = [];
 let voicesLoaded = false;
 
@@ -58,7 +59,50 @@ function log(text, type="bot") {
 }
 
 // ----------------- TTS -----------------
-async function speak(text) {
+// Prompts are played from the backend's cached audio (/tts); the browser's
+// HTTP cache keeps repeated prompts local. If the backend cannot synthesize,
+// fall back to speechSynthesis for the rest of the session. The backend
+// only voices its own text: the fixed prompts, and replies passed with the
+// `sig` they came with. Text composed here (with a name or an id in it) is
+// spoken with sig = null and always goes to speechSynthesis.
+let serverAudio = true;
+let currentPlayback = null;  // {audio, resolve} while a server prompt is playing
+
+function playServerAudio(text, sig) {
+    return new Promise((resolve, reject) => {
+        const query = `text=${encodeURIComponent(text)}` + (sig ? `&sig=${encodeURIComponent(sig)}` : "");
+        const audio = new Audio(`${BACKEND_URL}/tts?${query}`);
+        const done = () => { currentPlayback = null; resolve(); };
+        currentPlayback = { audio, resolve: done };
+        audio.onended = done;
+        audio.onerror = () => { currentPlayback = null; reject(audio.error); };
+        audio.play().then(() => log(text, "bot"), reject);
+    });
+}
+
+// Barge-in: cut the prompt short as soon as the caller starts talking.
+function stopSpeaking() {
+    if (currentPlayback) {
+        currentPlayback.audio.pause();
+        currentPlayback.resolve();
+    }
+    if ('speechSynthesis' in window) speechSynthesis.cancel();
+}
+
+async function speak(text, sig) {
+    if (serverAudio && sig !== null) {
+        try {
+            await playServerAudio(text, sig);
+            return;
+        } catch (err) {
+            console.warn("Server audio unavailable, using browser TTS:", err);
+            serverAudio = false;
+        }
+    }
+    return speakInBrowser(text);
+}
+
+async function speakInBrowser(text) {
     ensureVoices();  // Ensure voices are ready
     return new Promise((resolve) => {
         try {
@@ -76,6 +120,10 @@ async function speak(text) {
             u.rate = 1;
             u.onend = () => resolve();
             u.onerror = (err) => {
+                if (err.error === "interrupted" || err.error === "canceled") {  // stopped by barge-in
+                    resolve();
+                    return;
+                }
                 console.error("TTS Error:", err);
                 log("Voice error. " + text, "bot");
                 alert("Voice error. Continuing.");
@@ -94,9 +142,10 @@ async function speak(text) {
 
 // ----------------- Safe STT -----------------
 // ----------------- Safe STT (Improved Version) -----------------
-async function safeListen(prompt = "") {
-    if (prompt) await speak(prompt);
-
+// Recognition starts before the prompt is spoken, and the prompt stops as
+// soon as speech is detected, so callers who know their answer can say it
+// right away.
+async function safeListen(prompt = "", sig) {
     return new Promise(async (resolve) => {
         try {
             // Ask microphone permission
@@ -119,6 +168,7 @@ async function safeListen(prompt = "") {
 
             let heard = false;
             let finished = false;
+            let prompting = !!prompt;
 
             function safeResolve(val) {
                 if (finished) return;
@@ -128,6 +178,10 @@ async function safeListen(prompt = "") {
                 resolve(val);
             }
 
+            r.onspeechstart = () => {
+                if (prompting) stopSpeaking();
+            };
+
             r.onresult = (event) => {
                 heard = true;
                 const text = event.results[0][0].transcript.toLowerCase().trim();
@@ -136,11 +190,17 @@ async function safeListen(prompt = "") {
             };
 
             r.onerror = (err) => {
+                if (prompting && err.error === "no-speech") return;  // onend restarts it
                 console.error("STT Error:", err);
                 safeResolve("");
             };
 
             r.onend = () => {
+                if (prompting && !heard && !finished) {
+                    // Recognition timed out while a long prompt was still playing; keep listening
+                    try { r.start(); } catch (e) {}
+                    return;
+                }
                 if (!heard && !finished) {
                     // No speech detected — retry prompt
                     log("No speech detected.", "bot");
@@ -148,10 +208,12 @@ async function safeListen(prompt = "") {
                 }
             };
 
-            // Start recognition
+            // Start recognition, then the prompt; the caller may talk over it
             try { r.start(); } catch (e) {}
+            if (prompt) await speak(prompt, sig);
+            prompting = false;
 
-            // Wait up to 15 seconds
+            // Wait up to 15 seconds after the prompt
             setTimeout(() => {
                 if (!heard && !finished) {
                     log("Timeout reached.", "bot");
@@ -177,7 +239,7 @@ async function safeListen(prompt = "") {
 // ----------------- Backend Call -----------------
 async function callBackend(endpoint, data = {}) {
     try {
-        const res = await fetch(`https://smarttel-ivr.onrender.com/${endpoint}`, {
+        const res = await fetch(`${BACKEND_URL}/${endpoint}`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(data)
@@ -192,80 +254,154 @@ async function callBackend(endpoint, data = {}) {
 }
 
 
-// ----------------- Show Customer Support Menu -----------------
-async function showCustomerSupportMenu() {
-    const items = [
-        "Network issue", 
-        "SIM/Activation issue", 
-        "Recharge/Payment issue", 
-        "Billing/Plan issue", 
-        "App/Login/Device issue", 
-        "Other issue"
-    ];
-    for (let item of items) {
-        const div = document.createElement("div");
-        div.className = "menu-item";
-        div.textContent = item;
-        logDiv.appendChild(div);
-        logDiv.scrollTop = logDiv.scrollHeight;
-        await speak(item);
+// ----------------- Streaming Intent -----------------
+// Posts to /intent/stream and speaks each sentence as soon as its event
+// arrives, while the rest of the reply is still in flight. Resolves with the
+// final payload (marked `spoken`) once everything has been said; errors come
+// back as plain JSON and are returned unspoken. A request that fails on the
+// network or times out is sent again as is, idempotency key included, so
+// the backend applies the action once; sentences already spoken are not
+// repeated.
+const INTENT_TIMEOUT_MS = 15000;
+const INTENT_RETRIES = 2;
+
+function parseEvent(block) {
+    const event = { type: "message", data: null };
+    for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) event.type = line.slice(6).trim();
+        else if (line.startsWith("data:")) event.data = JSON.parse(line.slice(5));
+    }
+    return event;
+}
+
+async function streamIntent(data) {
+    let speaking = Promise.resolve();
+    let result = null;
+    let said = 0;  // sentences queued so far; a retried reply starts again at index 0
+    const onEvent = (event) => {
+        if (event.type === "sentence") {
+            if (event.data.index < said) return;
+            said = event.data.index + 1;
+            speaking = speaking.then(() => speak(event.data.text, event.data.sig));
+        } else if (event.type === "done") result = { ...event.data, spoken: true };
+    };
+    for (let attempt = 0; ; attempt++) {
+        const controller = new AbortController();
+        const timer = setTimeout(() => controller.abort(), INTENT_TIMEOUT_MS);
+        try {
+            const res = await fetch(`${BACKEND_URL}/intent/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(data),
+                signal: controller.signal
+            });
+            if (!res.ok) return { ...(await res.json()), http_status: res.status };
+            let buffer = "";
+            if (res.body && res.body.getReader) {
+                const reader = res.body.getReader();
+                const decoder = new TextDecoder();
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    let end;
+                    while ((end = buffer.indexOf("\n\n")) >= 0) {
+                        onEvent(parseEvent(buffer.slice(0, end)));
+                        buffer = buffer.slice(end + 2);
+                    }
+                }
+            } else {
+                buffer = await res.text();  // no streaming support: take the events all at once
+            }
+            buffer.split("\n\n").filter(b => b.trim()).forEach(b => onEvent(parseEvent(b)));
+            clearTimeout(timer);
+            await speaking;
+            return result;
+        } catch (err) {
+            clearTimeout(timer);
+            console.error("Stream Error:", err);
+            if (!result && attempt < INTENT_RETRIES) continue;  // same body, same idempotency key
+            await speaking;
+            log("Backend error.", "bot");
+            return result;
+        }
     }
 }
-// ----------------- Show Main Menu -----------------
-async function showMenu() {
-    const items = [
-        "Check balance",
-        "Plan details",
-        "Latest offers",
-        "Data upgrade",
-        "Recharge",
-        "Talk to customer care"
-    ];
-    for (let item of items) {
+
+
+// One key per user action, made once and reused by every retry of that
+// action's request: the backend applies a key only once.
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+
+// ----------------- Menus -----------------
+// Menu items and the single utterance that reads them out come from the
+// backend (/menu/<name>), fetched once per page; the lists below are only
+// used if that request fails.
+const FALLBACK_MENUS = {
+    main: {
+        items: ["Check balance", "Plan details", "Latest offers", "Data upgrade", "Recharge", "Talk to customer care"],
+        prompt: "Please choose an option from the menu."
+    },
+    support: {
+        items: ["Network issue", "SIM/Activation issue", "Recharge/Payment issue", "Billing/Plan issue", "App/Login/Device issue", "Other issue"],
+        prompt: "Please describe your issue."
+    }
+};
+const menus = {};
+
+async function loadMenu(name) {
+    if (!menus[name]) {
+        try {
+            const res = await fetch(`${BACKEND_URL}/menu/${name}`);
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            menus[name] = await res.json();
+        } catch (err) {
+            console.warn("Menu unavailable, using built-in list:", err);
+            return FALLBACK_MENUS[name];
+        }
+    }
+    return menus[name];
+}
+
+// Shows the menu items and returns the prompt to speak (with barge-in) via safeListen.
+async function showMenu(name = "main") {
+    const menu = await loadMenu(name);
+    for (let item of menu.items) {
         const div = document.createElement("div");
         div.className = "menu-item";
         div.textContent = item;
         logDiv.appendChild(div);
-        logDiv.scrollTop = logDiv.scrollHeight;
-        await speak(item);
     }
+    logDiv.scrollTop = logDiv.scrollHeight;
+    return menu.prompt;
 }
 
 
 // ----------------- Handle Intent -----------------
-async function handleIntent(cid, text) {
-    text = text.toLowerCase();
-    let res = null;
+// `session` is {session, id, state, prompt, menu} from /session/start or
+// /register; the customer is resolved from the token alone, which any
+// backend worker can check (401 once it has expired). The backend
+// classifies the raw utterance and walks the shared dialogue flow
+// from the welcome state: each reply carries the state to send back with
+// the next turn, the prompt to ask next, the menu to show on entering a
+// menu and whether the call has ended.
+async function handleIntent(session, text) {
+    const idempotencyKey = newIdempotencyKey();  // this utterance's action; streamIntent's retries reuse it
     try {
-        if (text.includes("balance")) res = await callBackend("intent", { id: cid, text: "balance" });
-        else if (text.includes("plan")) res = await callBackend("intent", { id: cid, text: "plan" });
-        else if (text.includes("offer")) res = await callBackend("intent", { id: cid, text: "offer" });
-        else if (text.includes("data") || text.includes("upgrade")) res = await callBackend("intent", { id: cid, text: "data", upgrade: true });
-        else if (text.includes("recharge") || text.includes("payment") || text.includes("wallet")) res = await callBackend("intent", { id: cid, text: "recharge" });
-        else if (text.includes("network") || text.includes("signal") || text.includes("internet") ||
-                 text.includes("sim") || text.includes("activation") ||
-                 text.includes("bill") || text.includes("plan") ||
-                 text.includes("app") || text.includes("login") || text.includes("device") ||
-                 text.includes("customer") || text.includes("care") || text.includes("other")) {
-            res = await callBackend("intent", { id: cid, text: text });
-        }
-        else if (text.includes("menu") || text.includes("main menu")) {
-        res = await callBackend("intent", { id: cid, text: "menu" });
-        }
-
-        else if (text.includes("exit") || text.includes("bye" || text.includes("thank you"))) {
-            await speak("Thank you for using SmartTel IVR. Goodbye!");
-            return false;
-        } 
-        
-        
-        else {
-            await speak("Sorry, I didn't understand that. Could you please repeat?");
-            return true;
+        const res = await streamIntent({ session: session.session, id: session.id, state: session.state,
+                                         text: text, idempotency_key: idempotencyKey });
+        if (res && res.message && !res.spoken) await speak(res.message, res.sig);
+        if (res && res.http_status === 401) return false;  // session expired
+        if (res && res.state) {
+            session.state = res.state;
+            session.prompt = res.prompt;
+            session.menu = res.menu;
         }
-
-        if (res && res.message) await speak(res.message);
-        return true;
+        return !(res && res.end);
     } catch (err) {
         console.error("Intent Error:", err);
         log("Error processing intent.", "bot");
@@ -274,12 +410,21 @@ async function handleIntent(cid, text) {
     }
 }
 
+// What to ask before the next turn: entering a menu shows its items and asks
+// with the menu's own prompt, unless the reply already asked (no prompt).
+async function nextPrompt(session) {
+    if (!session.menu) return session.prompt || "";
+    const menuPrompt = await showMenu(session.menu);
+    return session.prompt === null ? "" : menuPrompt;
+}
+
 
 // ----------------- Main Flow -----------------
 async function mainFlow() {
     try {
         startBtn.disabled = true;
         log("Starting IVR session.", "bot");
+        loadMenu("main"); loadMenu("support");  // warm up while the welcome plays
         await speak("Welcome to SmartTel Voice IVR.");
 
         // ---------------- Ask Customer ID ----------------
@@ -287,7 +432,7 @@ async function mainFlow() {
         let retries = 0;
         while (!cid && retries < 3) {
             cid = await safeListen("Please say your customer ID.");
-            cid = cid.replace(/\s/g, "");
+            cid = cid.trim();  // the backend reads spoken digits ("one double oh one")
             retries++;
         }
         if (!cid) {
@@ -297,12 +442,27 @@ async function mainFlow() {
             return;
         }
 
-        // ---------------- Fetch Customer ----------------
-        let custRes = await callBackend("fetch_customer", { id: cid });
+        // ---------------- Start Session ----------------
+        let custRes = await callBackend("session/start", { id: cid });
+        if (custRes && custRes.did_you_mean) {
+            let ans = await safeListen(`Did you mean customer ID ${custRes.did_you_mean.split("").join(" ")}?`, null);
+            if (ans.includes("yes")) {
+                cid = custRes.did_you_mean;
+                custRes = await callBackend("session/start", { id: cid });
+            }
+        }
         
+        // Rate limited (429) or a server error: there is no session to continue with
+        if (custRes && custRes.status === "error") {
+            log(custRes.message, "bot");
+            await speak("We could not start your session right now. Please try again in a few minutes.");
+            startBtn.disabled = false;
+            return;
+        }
+
         // ---------------- Registration Flow ----------------
         if (!custRes || custRes.status === "not_found") {
-            let ans = await safeListen(`Customer ID ${cid} not found. Would you like to register?`);
+            let ans = await safeListen(`Customer ID ${cid} not found. Would you like to register?`, null);
             if (ans.includes("yes")) {
                 let name = "";
                 retries = 0;
@@ -330,31 +490,17 @@ async function mainFlow() {
                     return;
                 }
 
-                // Use the registered data directly
-                custRes = {
-                    status: "ok",
-                    customer: {
-                        id: cid,
-                        name: name,
-                        plan: "SmartPlan 299",
-                        balance: 150.0,
-                        phone: "9999999999",
-                        data_left: "1.5 GB"
-                    }
-                };
+                // Registration returns the stored record and a session
+                custRes = regRes;
 
                 log(`Registration successful. Welcome ${name}!`, "bot");
-                await speak(`Registration successful. Welcome ${name}!`);
+                await speak(`Registration successful. Welcome ${name}!`, null);
 
                 // --- FIX: Reset speech engines after registration ---
                 await new Promise(r => setTimeout(r, 1200));  // allow mic + TTS reset
                 speechSynthesis.cancel(); // clear queued voices
                 console.log("Speech engines reset.");
 
-                // --- EXTRA FIX ---
-                let initialChoice = await safeListen("Do you want to access the main menu or talk to customer care?");
-                initialChoice = initialChoice || "";  // prevents null crash
-
             } else {
                 log("Registration declined.", "bot");
                 await speak("Okay, please register later. Goodbye.");
@@ -363,38 +509,21 @@ async function mainFlow() {
             }
         } else {
             log(`Welcome back ${custRes.customer.name}!`, "bot");
-            await speak(`Welcome back ${custRes.customer.name}!`);
+            await speak(`Welcome back ${custRes.customer.name}!`, null);
         }
 
-        const cidActive = custRes.customer.id;
-
-        // ---------------- Initial Choice ----------------
-        let initialChoice = await safeListen("Do you want to access the main menu or talk to customer care?");
-        if (initialChoice.includes("menu"))
-         {
-            await showMenu();
-            let firstIntent = await safeListen("Please choose an option from the menu.");
-            if(firstIntent) await handleIntent(cidActive, firstIntent);
-        } 
-        else if (initialChoice.includes("customer") || initialChoice.includes("care"))
-         {
-            await showCustomerSupportMenu();
-            let issue = await safeListen("Please describe your issue.");
-            if(issue) await handleIntent(cidActive, issue);
-        } 
-        else
-        {
-           await handleIntent(cidActive, initialChoice);
-         }
-
+        // The session starts in the dialogue's welcome state
+        const session = { session: custRes.session, id: custRes.customer.id, state: custRes.state,
+                          prompt: custRes.prompt, menu: null };
 
         // ---------------- Conversational Loop ----------------
+        // Silence is sent too: the backend decides what it means in each state.
         let continueSession = true;
         let queryCount = 0;
         while (continueSession && queryCount < 10) {
             queryCount++;
-            let userInput = await safeListen("What else can I help with?");
-            continueSession = await handleIntent(cidActive, userInput);
+            let userInput = await safeListen(await nextPrompt(session));
+            continueSession = await handleIntent(session, userInput);
         }
 
         if (queryCount >= 10) {
@@ -0,0 +1,192 @@
+# prompt_audio.py
+# Synthesized speech for the web IVR, served by the backend so the browser
+# does not depend on speechSynthesis being ready.
+#
+# Audio is rendered once per (voice, rate, text) into a disk cache by the
+# speech_output TTS worker and served from read-only memory maps; the cache
+# key doubles as a strong ETag, so browsers revalidate with a 304 and can
+# fetch byte ranges. Bodies are streamed from the map a chunk at a time
+# rather than copied whole per request. Servers call start() at boot so the
+# fixed prompts render before the first request asks for them.
+#
+# Only text the server produced is synthesized: the fixed prompts, or a
+# reply carrying the signature from sign(). Fixed prompts stay on disk for
+# good; rendered replies share MAX_CACHE_BYTES and the least recently used
+# ones are evicted first.
+import hashlib
+import hmac
+import mmap
+import os
+import secrets
+import threading
+
+import ivr_cache
+import speech_output
+
+MAX_TEXT_CHARS = 400
+CHUNK_BYTES = 64 * 1024
+MAX_CACHE_BYTES = int(os.environ.get("IVR_TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class SpeechUnavailable(RuntimeError):
+    pass
+
+
+class PromptAudio:
+    def __init__(self, cache_dir="prompt_cache", voice_index=speech_output.DEFAULT_VOICE_INDEX,
+                 rate=speech_output.DEFAULT_RATE, prerender=(), max_maps=256, secret=None,
+                 max_cache_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.voice_index = voice_index
+        self.rate = rate
+        self.prerender_texts = list(dict.fromkeys(prerender))
+        self.fixed = frozenset(self.prerender_texts)
+        self._fixed_files = {self.key(text) + ".wav" for text in self.fixed}
+        # Workers forked from one preloaded app share the random default;
+        # separately started processes need a common secret.
+        self.secret = secret or secrets.token_bytes(32)
+        self.max_cache_bytes = max_cache_bytes
+        self.maps = ivr_cache.TTLCache(maxsize=max_maps, ttl=float("inf"))
+        self._worker = None
+        self._worker_error = None
+        self._lock = threading.Lock()
+
+    def key(self, text):
+        # Keyed on the configured voice index rather than the engine's voice
+        # id, so cached files can be found without starting the engine.
+        return speech_output.cache_key(text, f"index:{self.voice_index}", self.rate)
+
+    def path(self, text):
+        return os.path.join(self.cache_dir, self.key(text) + ".wav")
+
+    def sign(self, text):
+        """Signature that lets a client fetch the audio of `text`, a reply this server produced."""
+        return hmac.new(self.secret, text.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def accepts(self, text, sig=None):
+        """True for a fixed prompt or a text carrying its signature."""
+        return text in self.fixed or (sig is not None and hmac.compare_digest(sig, self.sign(text)))
+
+    def worker(self):
+        """Start the TTS worker on first use and queue the fixed prompts behind it."""
+        with self._lock:
+            if self._worker is None and self._worker_error is None:
+                try:
+                    self._worker = speech_output.TTSWorker(self.voice_index, self.rate, self.cache_dir)
+                except Exception as e:  # no TTS engine on this host; remember, don't retry per request
+                    self._worker_error = e
+                else:
+                    self._worker.prerender(self.prerender_texts, self.path)
+            if self._worker is None:
+                raise SpeechUnavailable(str(self._worker_error))
+            return self._worker
+
+    def start(self):
+        """Start the TTS worker (and the fixed-prompt prerender) now; a host without an engine serves 503s later."""
+        try:
+            self.worker()
+        except SpeechUnavailable:
+            pass
+
+    def get(self, text):
+        """Return (etag, mmap) for `text`, rendering it first if it is not cached."""
+        key = self.key(text)
+        mapped = self.maps.get(key)
+        if mapped is not None:
+            return key, mapped
+        path = self.path(text)
+        if not os.path.exists(path):
+            self.worker().render(text, path)
+            if text not in self.fixed:
+                self.prune()
+        elif text not in self.fixed:
+            os.utime(path)  # recency for prune(); hits on the map itself are not recorded
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.maps.put(key, mapped)
+        return key, mapped
+
+    def prune(self):
+        """Evict the least recently used rendered replies until they fit in max_cache_bytes; returns the count."""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".wav") and not entry.name.endswith(".part.wav") \
+                        and entry.name not in self._fixed_files:
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            try:
+                os.remove(path)  # a map already open on it stays readable
+            except FileNotFoundError:  # evicted by another worker
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def parse_range(header, length):
+    """Parse a single "bytes=start-end" range; returns (start, stop), None for no range, or False if unsatisfiable."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[6:].strip().partition("-")
+    try:
+        if not start:  # suffix range: the last N bytes
+            n = int(end)
+            return (max(0, length - n), length) if n > 0 else False
+        start = int(start)
+        stop = min(int(end) + 1, length) if end else length
+    except ValueError:
+        return None
+    if start >= length or stop <= start:
+        return False
+    return start, stop
+
+
+def iter_span(mapped, start, stop):
+    """Yield mapped[start:stop] in CHUNK_BYTES pieces."""
+    for offset in range(start, stop, CHUNK_BYTES):
+        yield mapped[offset:min(offset + CHUNK_BYTES, stop)]
+
+
+def audio_response(audio, text, range_header=None, if_none_match=None, sig=None):
+    """Transport-neutral audio response: returns (body, status, headers).
+
+    The body is bytes when empty, else an iterator of chunks of the mapped
+    file; Content-Length is always set. Text the server did not produce
+    (see PromptAudio.accepts) gets a 403.
+    """
+    text = (text or "").strip()
+    if not text or len(text) > MAX_TEXT_CHARS:
+        return b"", 400, {}
+    if not audio.accepts(text, sig):
+        return b"", 403, {}
+    etag = f'"{audio.key(text)}"'
+    headers = {
+        "Content-Type": "audio/wav",
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": "public, max-age=86400",
+    }
+    if if_none_match and etag in if_none_match and os.path.exists(audio.path(text)):
+        return b"", 304, headers
+    try:
+        _, mapped = audio.get(text)
+    except SpeechUnavailable:
+        return b"", 503, {}
+    length = len(mapped)
+    span = parse_range(range_header, length)
+    if span is False:
+        headers["Content-Range"] = f"bytes */{length}"
+        return b"", 416, headers
+    if span is None:
+        headers["Content-Length"] = str(length)
+        return iter_span(mapped, 0, length), 200, headers
+    start, stop = span
+    headers["Content-Range"] = f"bytes {start}-{stop - 1}/{length}"
+    headers["Content-Length"] = str(stop - start)
+    return iter_span(mapped, start, stop), 206, headers
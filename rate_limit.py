@@ -0,0 +1,82 @@
+# rate_limit.py
+# Token-bucket rate limiting shared by every worker process on the host.
+#
+# Bucket state lives in a small SQLite table (WAL, pooled connections via
+# ivr_db), so all gunicorn workers see the same counts without a network
+# hop. Each check is one UPSERT ... RETURNING statement: the bucket is
+# refilled for the time elapsed and one token taken in the same write, so
+# the cost is O(1) per check whatever the window or call volume.
+import re
+import time
+
+import ivr_db
+
+SQL_CREATE_BUCKETS = """
+    CREATE TABLE IF NOT EXISTS rate_buckets (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL
+    ) WITHOUT ROWID
+"""
+# Refill, then take a token only if one is available; no row comes back when denied.
+SQL_TAKE_TOKEN = """
+    INSERT INTO rate_buckets (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+    ON CONFLICT(key) DO UPDATE SET
+        tokens = MIN(:capacity, tokens + (:now - updated) * :refill) - 1,
+        updated = :now
+    WHERE MIN(:capacity, tokens + (:now - updated) * :refill) >= 1
+    RETURNING tokens
+"""
+SQL_FETCH_TOKENS = "SELECT MIN(:capacity, tokens + (:now - updated) * :refill) FROM rate_buckets WHERE key=:key"
+# Only this limiter's keys: another limiter's buckets may refill more slowly.
+SQL_PRUNE_BUCKETS = "DELETE FROM rate_buckets WHERE substr(key, 1, length(:prefix)) = :prefix AND updated < :before"
+SQL_CLEAR_BUCKETS = "DELETE FROM rate_buckets"
+
+PRUNE_EVERY = 1024  # checks between sweeps of idle (already full) buckets
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def init_schema(path):
+    ivr_db.connect(path).execute(SQL_CREATE_BUCKETS)
+
+
+def parse_limit(spec):
+    """Parse "10 per minute" / "10/minute" into (count, seconds)."""
+    match = re.fullmatch(r"\s*(\d+)\s*(?:per|/)\s*(second|minute|hour|day)s?\s*", spec or "")
+    if not match:
+        raise ValueError(f"invalid rate limit {spec!r}")
+    return int(match.group(1)), PERIODS[match.group(2)]
+
+
+class TokenBucketLimiter:
+    """`count` requests per `period` seconds per key; limiters sharing a file need distinct names."""
+
+    def __init__(self, path, count, period, burst=None, name="", enabled=True, clock=time.time):
+        self.path = path
+        self.prefix = f"{name}:" if name else ""
+        self.capacity = float(burst or count)
+        self.refill = count / period  # tokens per second
+        self.enabled = enabled
+        self.clock = clock  # wall clock: shared by all processes
+        self._checks = 0
+
+    def hit(self, key):
+        """Take one token for `key`; returns (allowed, retry_after_seconds)."""
+        if not self.enabled:
+            return True, 0.0
+        params = {"key": self.prefix + key, "capacity": self.capacity, "refill": self.refill, "now": self.clock()}
+        conn = ivr_db.connect(self.path)
+        if conn.execute(SQL_TAKE_TOKEN, params).fetchall():  # fetchall: finish the statement so the write commits
+            self._checks += 1
+            if self._checks % PRUNE_EVERY == 0:
+                conn.execute(SQL_PRUNE_BUCKETS, {"prefix": self.prefix,
+                                                 "before": params["now"] - self.capacity / self.refill})
+            return True, 0.0
+        row = conn.execute(SQL_FETCH_TOKENS, params).fetchone()
+        tokens = row[0] if row else 0.0
+        return False, max(0.0, (1 - tokens) / self.refill)
+
+    def reset(self):
+        """Forget every bucket in the file, not just this limiter's."""
+        ivr_db.connect(self.path).execute(SQL_CLEAR_BUCKETS)
@@ -0,0 +1,232 @@
+# recording_worker.py
+# Background ingestion of the issues callers record on the Twilio IVR
+# (milestone2).
+#
+# The recording webhook only calls submit(), which puts the recording on a
+# bounded queue without waiting: when the queue is full the recording is
+# refused and counted, so a burst never holds up a webhook. A fixed pool of
+# worker threads fetches each recording from a pluggable source, transcribes
+# it and classifies the issue with intent_classifier, then hands the result
+# to a callback. stats() reports queue depth, progress and latency.
+#
+# StubRecordingServer serves recordings from memory over local HTTP, so the
+# whole pipeline can be run and timed without Twilio.
+import base64
+import io
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import intent_classifier
+
+WORKERS = int(os.environ.get("IVR_RECORDING_WORKERS", "4"))
+MAX_QUEUED = int(os.environ.get("IVR_RECORDING_MAX_QUEUED", "256"))
+FETCH_TIMEOUT = float(os.environ.get("IVR_RECORDING_FETCH_TIMEOUT", "10"))
+
+# Intents a recorded issue can be filed under.
+ISSUE_INTENTS = ("network_issue", "sim_issue", "recharge_issue", "customer_care")
+
+log = logging.getLogger("ivr.recordings")
+
+
+class Recording:
+    __slots__ = ("call_sid", "customer_id", "url", "queued_at", "transcript", "intent", "confidence", "error")
+
+    def __init__(self, call_sid, customer_id, url):
+        self.call_sid = call_sid
+        self.customer_id = customer_id
+        self.url = url
+        self.queued_at = time.monotonic()
+        self.transcript = None
+        self.intent = None
+        self.confidence = None  # None when the keyword engine answered
+        self.error = None
+
+    def __repr__(self):
+        return f"Recording({self.call_sid!r}, {self.customer_id!r}, {self.intent!r})"
+
+
+# ------------------ Sources ------------------
+class HttpSource:
+    """Recordings over HTTP(S). Twilio serves a RecordingUrl as WAV with suffix=".wav" and
+    needs the account SID and auth token as basic auth."""
+
+    def __init__(self, auth=None, suffix="", timeout=FETCH_TIMEOUT):
+        self.headers = {}
+        if auth and all(auth):
+            token = base64.b64encode(":".join(auth).encode("utf-8")).decode("ascii")
+            self.headers["Authorization"] = f"Basic {token}"
+        self.suffix = suffix
+        self.timeout = timeout
+
+    def fetch(self, url):
+        if self.suffix and not url.endswith(self.suffix):
+            url += self.suffix
+        request = urllib.request.Request(url, headers=self.headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+
+class StubRecordingServer:
+    """Serves {path: bytes} on 127.0.0.1 from a background thread; `delay` seconds per request."""
+
+    def __init__(self, recordings, delay=0.0):
+        self.recordings = recordings
+        self.delay = delay
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                body = stub.recordings.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/x-wav")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="ivr-recording-stub", daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ------------------ Transcription ------------------
+class Transcriber:
+    """WAV bytes -> lower-case text through a speech_input recognition backend ("" if nothing was heard)."""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def __call__(self, data):
+        import speech_input  # speech_recognition is only needed once a recording arrives
+        sr = speech_input.sr
+        if self.backend is None:
+            self.backend = speech_input.create_backend()
+        with sr.AudioFile(io.BytesIO(data)) as source:
+            audio = self.backend.recognizer.record(source)
+        try:
+            return self.backend.recognize(audio).lower()
+        except sr.UnknownValueError:
+            return ""
+
+
+def classify_issue(transcript):
+    """(intent, confidence) of a transcribed issue, limited to ISSUE_INTENTS."""
+    return intent_classifier.predict(transcript, allowed=ISSUE_INTENTS)
+
+
+# ------------------ Pipeline ------------------
+class RecordingPipeline:
+    def __init__(self, source, transcribe=None, on_done=None, workers=WORKERS, max_queued=MAX_QUEUED):
+        self.source = source
+        self.transcribe = transcribe or Transcriber()
+        self.on_done = on_done  # called from a worker with each finished Recording (error set if it failed)
+        self.workers = workers
+        self._queue = queue.Queue(max_queued)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self.accepted = 0
+        self.rejected = 0
+        self.in_progress = 0
+        self.done = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=1024)  # seconds from submit to done, most recent recordings
+
+    def submit(self, call_sid, customer_id, url):
+        """Queue a recording; returns it, or None when the queue is full. Never blocks."""
+        recording = Recording(call_sid, customer_id, url)
+        with self._lock:
+            self._start()
+            try:
+                self._queue.put_nowait(recording)
+            except queue.Full:
+                self.rejected += 1
+                return None
+            self.accepted += 1
+        return recording
+
+    def process(self, recording):
+        with self._lock:
+            self.in_progress += 1
+        try:
+            data = self.source.fetch(recording.url)
+            recording.transcript = self.transcribe(data)
+            recording.intent, recording.confidence = classify_issue(recording.transcript)
+        except Exception as e:
+            recording.error = e
+        with self._lock:
+            self.in_progress -= 1
+            if recording.error is None:
+                self.done += 1
+            else:
+                self.failed += 1
+            self.latencies.append(time.monotonic() - recording.queued_at)
+        if self.on_done:
+            try:
+                self.on_done(recording)
+            except Exception:  # keep the worker alive
+                log.exception("recording callback failed for %s", recording.call_sid)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = {"queued": self._queue.qsize(), "in_progress": self.in_progress, "accepted": self.accepted,
+                     "rejected": self.rejected, "done": self.done, "failed": self.failed, "workers": self.workers}
+        for pct in (50, 90, 99):
+            stats[f"p{pct}_ms"] = (round(latencies[min(len(latencies) - 1, len(latencies) * pct // 100)] * 1000, 1)
+                                   if latencies else None)
+        return stats
+
+    # ------------------ Workers ------------------
+    def _start(self):
+        if not self._threads or self._pid != os.getpid():  # not inherited across a fork
+            self._pid = os.getpid()
+            self._threads = [threading.Thread(target=self._run, name=f"ivr-recording-{n}", daemon=True)
+                             for n in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        while True:
+            recording = self._queue.get()
+            try:
+                if recording is None:
+                    return
+                self.process(recording)
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Wait until every accepted recording has been processed."""
+        self._queue.join()
+
+    def close(self):
+        if self._threads and self._pid == os.getpid():
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
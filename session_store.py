@@ -0,0 +1,148 @@
+# session_store.py
+# Call-session storage for the Twilio IVR (milestone2).
+#
+# Sessions expire TTL seconds after their last write. MemorySessionStore
+# keeps them in this process only; SQLiteSessionStore keeps them in a local
+# SQLite file (through the pooled ivr_db connections) so webhook turns for
+# one call can land on any uvicorn worker. create_store() picks one from
+# IVR_SESSION_BACKEND; the web IVR (milestone4_backend) keeps its session
+# tokens in a store of its own. The memory backend is for single-worker runs.
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import ivr_db
+
+SESSION_TTL_SECONDS = float(os.environ.get("IVR_SESSION_TTL", "3600"))
+SWEEP_EVERY = 256  # writes between expiry sweeps
+
+
+class CallSession:
+    __slots__ = ("call_sid", "customer_id", "step", "expires_at")
+
+    def __init__(self, call_sid, customer_id, step="main_menu", expires_at=0.0):
+        self.call_sid = call_sid
+        self.customer_id = customer_id
+        self.step = step
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return f"CallSession({self.call_sid!r}, {self.customer_id!r}, {self.step!r})"
+
+
+class MemorySessionStore:
+    def __init__(self, ttl=SESSION_TTL_SECONDS, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        # Every write pushes the session to the end with a later expiry, so
+        # the dict stays ordered by expiry and sweeping stops at the first
+        # live entry.
+        self._sessions = OrderedDict()
+        self._writes = 0
+        # milestone2's plain-def handlers run on the threadpool, so saves
+        # and sweeps from different calls can interleave.
+        self._lock = threading.Lock()
+
+    def get(self, call_sid):
+        with self._lock:
+            session = self._sessions.get(call_sid)
+        if session is None or session.expires_at <= self.clock():
+            return None
+        return session
+
+    def save(self, session):
+        with self._lock:
+            session.expires_at = self.clock() + self.ttl
+            self._sessions[session.call_sid] = session
+            self._sessions.move_to_end(session.call_sid)
+            self._writes += 1
+            if self._writes % SWEEP_EVERY == 0:
+                self._sweep()
+
+    def delete(self, call_sid):
+        with self._lock:
+            self._sessions.pop(call_sid, None)
+
+    def sweep(self):
+        with self._lock:
+            return self._sweep()
+
+    def _sweep(self):
+        now = self.clock()
+        removed = 0
+        while self._sessions:
+            call_sid, session = next(iter(self._sessions.items()))
+            if session.expires_at > now:
+                break
+            del self._sessions[call_sid]
+            removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    SQL_CREATE = """
+        CREATE TABLE IF NOT EXISTS call_sessions (
+            call_sid TEXT PRIMARY KEY,
+            customer_id TEXT NOT NULL,
+            step TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """
+    SQL_CREATE_INDEX = "CREATE INDEX IF NOT EXISTS idx_call_sessions_expires ON call_sessions (expires_at)"
+    SQL_GET = "SELECT customer_id, step, expires_at FROM call_sessions WHERE call_sid=? AND expires_at>?"
+    SQL_SAVE = "INSERT OR REPLACE INTO call_sessions (call_sid, customer_id, step, expires_at) VALUES (?, ?, ?, ?)"
+    SQL_DELETE = "DELETE FROM call_sessions WHERE call_sid=?"
+    SQL_SWEEP = "DELETE FROM call_sessions WHERE expires_at<=?"
+    SQL_COUNT = "SELECT COUNT(*) FROM call_sessions"
+    SQL_CLEAR = "DELETE FROM call_sessions"
+
+    def __init__(self, path, ttl=SESSION_TTL_SECONDS, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._writes = 0
+        conn = ivr_db.connect(path)
+        conn.execute(self.SQL_CREATE)
+        conn.execute(self.SQL_CREATE_INDEX)
+
+    def get(self, call_sid):
+        row = ivr_db.connect(self.path).execute(self.SQL_GET, (call_sid, self.clock())).fetchone()
+        return CallSession(call_sid, row[0], row[1], row[2]) if row else None
+
+    def save(self, session):
+        session.expires_at = self.clock() + self.ttl
+        ivr_db.connect(self.path).execute(
+            self.SQL_SAVE, (session.call_sid, session.customer_id, session.step, session.expires_at))
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            self.sweep()
+
+    def delete(self, call_sid):
+        ivr_db.connect(self.path).execute(self.SQL_DELETE, (call_sid,))
+
+    def sweep(self):
+        return ivr_db.connect(self.path).execute(self.SQL_SWEEP, (self.clock(),)).rowcount
+
+    def clear(self):
+        ivr_db.connect(self.path).execute(self.SQL_CLEAR)
+
+    def __len__(self):
+        return ivr_db.connect(self.path).execute(self.SQL_COUNT).fetchone()[0]
+
+
+def create_store(path=None, ttl=SESSION_TTL_SECONDS):
+    backend = os.environ.get("IVR_SESSION_BACKEND", "sqlite")
+    if backend == "memory":
+        return MemorySessionStore(ttl)
+    if backend == "sqlite":
+        return SQLiteSessionStore(path or os.environ.get("IVR_SESSION_DB", "ivr_sessions.db"), ttl)
+    raise ValueError(f"Unknown IVR_SESSION_BACKEND: {backend}")
@@ -0,0 +1,172 @@
+# speech_input.py
+# Speech input for the local voice IVR (milestone3).
+#
+# One Recognizer and one Microphone are opened for the whole session and
+# calibrated against ambient noise once. Capture runs in the background
+# (speech_recognition's listen_in_background), so a phrase is already being
+# recorded while the dialogue code is busy; listen() only waits for the next
+# captured phrase and hands it to a pluggable recognition backend. Capture
+# also runs while the bot speaks, so each phrase is stamped with when its
+# speech began and listen() skips phrases that began before it was called:
+# the prompt's own echo is usually still being captured when speak()
+# returns, and only ends a pause_threshold later.
+#
+# ReplayInput feeds scripted turns (plain text or WAV files) through the same
+# interface, so a whole dialogue can be run and timed with no microphone or
+# network.
+import os
+import queue
+import time
+
+import speech_recognition as sr
+
+DEFAULT_LANGUAGE = "en-IN"
+
+
+# ------------------ Recognition backends ------------------
+class RecognitionBackend:
+    """Turns captured sr.AudioData into text; raises sr.UnknownValueError / sr.RequestError."""
+    name = "base"
+
+    def __init__(self, recognizer=None):
+        self.recognizer = recognizer or sr.Recognizer()
+
+    def recognize(self, audio):
+        raise NotImplementedError
+
+
+class GoogleBackend(RecognitionBackend):
+    """Google Web Speech API: needs network, one round trip per phrase."""
+    name = "google"
+
+    def __init__(self, recognizer=None, language=DEFAULT_LANGUAGE):
+        super().__init__(recognizer)
+        self.language = language
+
+    def recognize(self, audio):
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+
+class SphinxBackend(RecognitionBackend):
+    """CMU PocketSphinx, in-process and offline (pip install pocketsphinx)."""
+    name = "sphinx"
+
+    def __init__(self, recognizer=None, language="en-US", keywords=None):
+        super().__init__(recognizer)
+        self.language = language
+        self.keywords = keywords
+
+    def recognize(self, audio):
+        return self.recognizer.recognize_sphinx(audio, language=self.language, keyword_entries=self.keywords)
+
+
+BACKENDS = {backend.name: backend for backend in (GoogleBackend, SphinxBackend)}
+
+
+def create_backend(name=None, recognizer=None):
+    name = name or os.environ.get("IVR_SPEECH_BACKEND", "google")
+    try:
+        return BACKENDS[name](recognizer)
+    except KeyError:
+        raise ValueError(f"unknown speech backend {name!r}; choose from {', '.join(BACKENDS)}") from None
+
+
+# ------------------ Inputs ------------------
+class PhraseQueue:
+    """Captured phrases, stamped with when the speech in them began."""
+
+    def __init__(self, lead_in=0.0, clock=time.monotonic):
+        self.lead_in = lead_in  # silence captured ahead of the speech (Recognizer.non_speaking_duration)
+        self.clock = clock
+        self._queue = queue.Queue()
+
+    def put(self, audio):
+        """Add a phrase that has just ended; its start is worked out from its length."""
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        self._queue.put((self.clock() - seconds + self.lead_in, audio))
+
+    def get(self, since=None, timeout=None):
+        """Next phrase whose speech began at or after `since`; earlier ones are dropped. Raises queue.Empty."""
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - self.clock())
+            started, audio = self._queue.get(timeout=remaining)
+            if since is None or started >= since:
+                return audio
+
+
+class MicrophoneInput:
+    def __init__(self, backend=None, calibrate_seconds=0.5, pause_threshold=1.0, phrase_time_limit=15):
+        self.recognizer = sr.Recognizer()
+        self.recognizer.pause_threshold = pause_threshold
+        self.backend = backend or create_backend(recognizer=self.recognizer)
+        self.backend.recognizer = self.recognizer
+        self.microphone = sr.Microphone()
+        with self.microphone as source:
+            self.recognizer.adjust_for_ambient_noise(source, duration=calibrate_seconds)
+        self.phrases = PhraseQueue(lead_in=self.recognizer.non_speaking_duration)
+        self._stop = self.recognizer.listen_in_background(
+            self.microphone, lambda _, audio: self.phrases.put(audio), phrase_time_limit=phrase_time_limit)
+
+    def listen(self, timeout=None, discard_pending=True):
+        """Return the next phrase as lower-case text.
+
+        Phrases whose speech began before the call (usually the bot's own
+        prompt picked up by the microphone, even if it is still being
+        captured) are dropped unless discard_pending is False.
+        """
+        since = self.phrases.clock() if discard_pending else None
+        try:
+            audio = self.phrases.get(since, timeout)
+        except queue.Empty:
+            raise sr.WaitTimeoutError("no speech within timeout") from None
+        return self.backend.recognize(audio).lower()
+
+    def close(self):
+        self._stop(wait_for_stop=False)
+
+
+class ReplayInput:
+    """Scripted turns: each item is the caller's text, or a path to a WAV file to recognize."""
+
+    def __init__(self, items, backend=None):
+        self.items = list(items)
+        self.position = 0
+        self.backend = backend
+        self.latencies = []  # seconds spent in each listen() call
+
+    @classmethod
+    def from_file(cls, path, backend=None):
+        """One turn per line; blank lines are empty turns (nothing heard)."""
+        with open(path, encoding="utf-8") as f:
+            return cls((line.rstrip("\n") for line in f), backend)
+
+    def listen(self, timeout=None):
+        if self.position >= len(self.items):
+            raise EOFError("replay script exhausted")
+        item = self.items[self.position]
+        self.position += 1
+        start = time.perf_counter()
+        try:
+            if item.lower().endswith(".wav"):
+                if self.backend is None:
+                    self.backend = create_backend()
+                with sr.AudioFile(item) as source:
+                    audio = self.backend.recognizer.record(source)
+                return self.backend.recognize(audio).lower()
+            if not item.strip():
+                raise sr.UnknownValueError()
+            return item.lower()
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def close(self):
+        pass
+
+
+def create_input():
+    """Microphone capture, or the replay script named by IVR_SPEECH_REPLAY."""
+    replay = os.environ.get("IVR_SPEECH_REPLAY")
+    if replay:
+        return ReplayInput.from_file(replay)
+    return MicrophoneInput()
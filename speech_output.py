@@ -0,0 +1,144 @@
+# speech_output.py
+# Text-to-speech for the local voice IVR (milestone3).
+#
+# One pyttsx3 engine is initialized once and owned by a worker thread that
+# is fed through a queue (the engine is slow to create and must stay on the
+# thread that made it). Fixed prompts are rendered to WAV files once and
+# replayed from a disk cache keyed by text and voice settings. In
+# file-output mode every utterance goes to a file instead of the speakers,
+# so the dialogue can be timed on a machine without audio.
+import hashlib
+import itertools
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+try:
+    import winsound
+except ImportError:
+    winsound = None
+try:
+    import simpleaudio
+except ImportError:
+    simpleaudio = None
+
+DEFAULT_VOICE_INDEX = 1
+DEFAULT_RATE = 165
+
+# Job priorities: a caller waiting on speech goes ahead of background prerendering.
+URGENT, BACKGROUND = 0, 1
+
+
+def cache_key(text, voice_id, rate):
+    return hashlib.sha1(f"{voice_id}\0{rate}\0{text}".encode("utf-8")).hexdigest()
+
+
+def play_file(path):
+    """Play a WAV file synchronously; returns False when no player is available."""
+    if winsound is not None:
+        winsound.PlaySound(path, winsound.SND_FILENAME)
+        return True
+    if simpleaudio is not None:
+        simpleaudio.WaveObject.from_wave_file(path).play().wait_done()
+        return True
+    return False
+
+
+class TTSWorker:
+    def __init__(self, voice_index=DEFAULT_VOICE_INDEX, rate=DEFAULT_RATE,
+                 cache_dir="prompt_cache", output_dir=None):
+        self.voice_index = voice_index
+        self.rate = rate
+        self.cache_dir = cache_dir
+        self.output_dir = output_dir
+        self.voice_id = None
+        self._jobs = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._started = Future()
+        self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+        self._thread.start()
+        self._started.result()  # re-raises engine initialization errors here
+        os.makedirs(cache_dir, exist_ok=True)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    # ------------------ Worker thread ------------------
+    def _run(self):
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+            voices = engine.getProperty('voices')
+            if voices:
+                voice = voices[min(self.voice_index, len(voices) - 1)]
+                engine.setProperty('voice', voice.id)
+                self.voice_id = voice.id
+            engine.setProperty('rate', self.rate)
+        except Exception as e:
+            self._started.set_exception(e)
+            return
+        self._started.set_result(None)
+
+        while True:
+            _, _, job = self._jobs.get()
+            if job is None:
+                break
+            text, path, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if path is None:
+                    engine.say(text)
+                    engine.runAndWait()
+                else:
+                    # Render beside the target and rename, so a reader never sees a partial file;
+                    # per process, as several server workers may render the same prompt.
+                    partial = f"{path}.{os.getpid()}.part.wav"
+                    engine.save_to_file(text, partial)
+                    engine.runAndWait()
+                    os.replace(partial, path)
+                future.set_result(path)
+            except Exception as e:
+                future.set_exception(e)
+        engine.stop()
+
+    def _submit(self, text, path=None, priority=URGENT):
+        future = Future()
+        self._jobs.put((priority, next(self._seq), (text, path, future)))
+        return future
+
+    # ------------------ Public API ------------------
+    def cache_path(self, text):
+        return os.path.join(self.cache_dir, cache_key(text, self.voice_id, self.rate) + ".wav")
+
+    def cached(self, text):
+        path = self.cache_path(text)
+        return path if os.path.exists(path) else None
+
+    def prerender(self, texts, path_for=None):
+        """Render prompts missing from the cache in the background; returns their futures."""
+        path_for = path_for or self.cache_path
+        return [self._submit(text, path_for(text), BACKGROUND) for text in texts if not os.path.exists(path_for(text))]
+
+    def render(self, text, path):
+        """Render `text` to the WAV file `path` and wait for it."""
+        return self._submit(text, path).result()
+
+    def speak(self, text):
+        """Speak `text` and wait until done; returns the file used, if any.
+
+        Cached prompts are played from disk. In file-output mode nothing is
+        played: uncached text is rendered into output_dir instead.
+        """
+        path = self.cached(text)
+        if self.output_dir:
+            if path:
+                return path
+            return self.render(text, os.path.join(self.output_dir, cache_key(text, self.voice_id, self.rate) + ".wav"))
+        if path and play_file(path):
+            return path
+        return self._submit(text).result()
+
+    def close(self):
+        self._jobs.put((BACKGROUND, next(self._seq), None))
+        self._thread.join()
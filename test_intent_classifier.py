@@ -0,0 +1,40 @@
+# test_intent_classifier.py
+# pytest suite for the n-gram intent classifier (intent_classifier.py) with the committed model.
+import pytest
+
+pytest.importorskip("numpy")
+
+import intent_classifier
+import intent_engine
+from recording_worker import ISSUE_INTENTS
+
+UNKNOWN = intent_engine.UNKNOWN
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = intent_classifier.load()
+    assert model is not None, intent_classifier._load_error
+    return model
+
+@pytest.mark.parametrize("text, intent", [
+    ("how much money is left", "check_balance"),
+    ("my internet is very slow", "network_issue"),
+])
+def test_model_routes_paraphrases_keywords_miss(model, text, intent):
+    assert intent_engine.classify(text) == UNKNOWN
+    assert intent_classifier.classify(text) == intent
+    assert intent_classifier.classify_many([text, "check balance"]) == [intent, "check_balance"]
+
+def test_allowed_limits_the_model(model):
+    text = "how much money is left"
+    guess, _ = model.predict([text], allowed=ISSUE_INTENTS)[0]
+    assert guess in ISSUE_INTENTS
+    assert intent_classifier.classify(text, allowed={"check_balance", "recharge"}) == "check_balance"
+    assert intent_classifier.classify(text, allowed=ISSUE_INTENTS) == UNKNOWN  # masked guess is far below THRESHOLD
+
+def test_low_confidence_stays_unknown(model, monkeypatch):
+    assert intent_classifier.predict("zxqv blorp") == (UNKNOWN, None)
+    monkeypatch.setattr(intent_classifier, "THRESHOLD", 0.99)
+    assert intent_classifier.predict("how much money is left") == (UNKNOWN, None)
+    assert intent_classifier.classify_many(["how much money is left"]) == [UNKNOWN]
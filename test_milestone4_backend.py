@@ -0,0 +1,427 @@
+# test_milestone4_backend.py
+# pytest suite for the web IVR backend (milestone4_backend.py).
+import json
+import os
+import re
+import threading
+import time
+
+import pytest
+
+import entities
+import ivr_db
+import ivr_logging
+import milestone4_backend
+import rate_limit
+import session_store
+import ticket_store
+import write_queue
+from milestone4_backend import (
+    DB_FILE, FIXED_PROMPTS, app, customer_cache, fetch_customer_db, init_db, intent_limiter, prompt_audio_cache,
+    save_customer_db, sessions,
+)
+
+
+@pytest.fixture
+def client():
+    _cleanup_db()
+    init_db()
+    save_customer_db("1001", "Aiza")
+    _flush_writes()
+    intent_limiter.reset()  # clears every bucket in the rate-limit file
+    with app.test_client() as client:
+        yield client
+
+def _flush_writes():
+    if milestone4_backend.writes:  # IVR_WRITE_BEHIND=1
+        milestone4_backend.writes.flush()
+
+def _cleanup_db():
+    _flush_writes()
+    customer_cache.clear()
+    sessions.clear()
+    ivr_db.close_connections(DB_FILE)
+    for path in (DB_FILE, DB_FILE + "-wal", DB_FILE + "-shm"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def test_db_save_and_fetch():
+    _cleanup_db()
+    init_db()
+    save_customer_db("9001", "UnitUser")
+    c = fetch_customer_db("9001")
+    assert c is not None
+    assert c["name"] == "UnitUser"
+    assert c["plan"].startswith("SmartPlan")
+
+def test_e2e_full_flow(client):
+    # Register
+    resp = client.post("/register", json={"id": "3003", "name": "E2EUser"})
+    assert resp.status_code == 200
+    # Fetch
+    resp = client.post("/fetch_customer", json={"id": "3003"})
+    assert resp.status_code == 200
+    # Check balance
+    resp = client.post("/intent", json={"id": "3003", "text": "check balance"})
+    assert "balance" in resp.get_json()["message"]
+    # Upgrade plan
+    resp = client.post("/intent", json={"id": "3003", "text": "upgrade my data", "upgrade": True})
+    assert "Upgraded" in resp.get_json()["message"]
+    # Recharge
+    resp = client.post("/intent", json={"id": "3003", "text": "recharge", "amount": 299})
+    assert "Recharge" in resp.get_json()["message"]
+
+def test_recharge_issue_not_treated_as_recharge(client):
+    resp = client.post("/intent", json={"id": "1001", "text": "i have a recharge issue"})
+    assert "Recharge issue noted" in resp.get_json()["message"]
+    assert fetch_customer_db("1001")["balance"] == 150.0
+
+def test_recharge_is_idempotent(client):
+    payload = {"id": "1001", "text": "recharge", "amount": 100, "idempotency_key": "retry-1"}
+    first = client.post("/intent", json=payload).get_json()["message"]
+    retried = client.post("/intent", json=payload).get_json()["message"]
+    assert first == retried
+    assert fetch_customer_db("1001")["balance"] == 250.0
+    client.post("/intent", json={"id": "1001", "text": "recharge", "amount": 100})
+    assert fetch_customer_db("1001")["balance"] == 350.0
+
+def test_complaints_are_filed_as_tickets(client, monkeypatch, tmp_path):
+    path = str(tmp_path / "tickets.db")
+    monkeypatch.setattr(milestone4_backend, "TICKET_DB", path)
+    ticket_store.init_schema(path)
+    retried = {"id": "1001", "text": "no network signal", "idempotency_key": "care-1"}
+    for payload in (retried, retried, {"id": "1001", "text": "my sim is blocked"},
+                    {"id": "1001", "text": "network is slow again"}, {"id": "1001", "text": "check balance"}):
+        assert client.post("/intent", json=payload).status_code == 200
+    assert ticket_store.counts(path) == {"network": {"open": 2}, "sim": {"open": 1}}
+    first, cursor = ticket_store.page(path, limit=1, category="network")
+    assert first[0]["summary"] == "network is slow again" and first[0]["channel"] == "web"
+    rest, cursor = ticket_store.page(path, limit=1, category="network", before=cursor)
+    assert rest[0]["summary"] == "no network signal" and cursor is None
+    ticket_store.set_status(path, rest[0]["id"], "resolved")
+    assert ticket_store.counts(path)["network"] == {"open": 1, "resolved": 1}
+
+def test_customer_cache_serves_repeat_turns(client):
+    client.post("/intent", json={"id": "1001", "text": "check balance"})
+    before = customer_cache.stats()
+    client.post("/intent", json={"id": "1001", "text": "what is my plan"})
+    after = customer_cache.stats()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+    client.post("/intent", json={"id": "1001", "text": "recharge", "amount": 50})
+    resp = client.post("/intent", json={"id": "1001", "text": "check balance"})
+    assert "200.0" in resp.get_json()["message"]
+
+def test_cache_fill_does_not_outlive_a_concurrent_write(client, monkeypatch):
+    real_fetch = ivr_db.fetch_customer
+
+    def fetch_then_write(path, cid):
+        record = real_fetch(path, cid)
+        monkeypatch.setattr(ivr_db, "fetch_customer", real_fetch)
+        milestone4_backend.add_balance_db(dict(record), 50)  # commits between this reader's fetch and its put
+        return record
+
+    customer_cache.clear()
+    monkeypatch.setattr(ivr_db, "fetch_customer", fetch_then_write)
+    fetch_customer_db("1001")
+    assert fetch_customer_db("1001")["balance"] == 200.0
+
+def test_concurrent_recharges_leave_cache_consistent(client, monkeypatch):
+    if milestone4_backend.writes:
+        pytest.skip("write-behind serializes recharges on its writer thread")
+    real_add_balance = ivr_db.add_balance
+    committed = []
+    second_done = threading.Event()
+
+    def add_balance(*args):
+        balance = real_add_balance(*args)
+        committed.append(balance)
+        if len(committed) == 1:
+            second_done.wait(5)  # the first writer reaches the cache after the second
+        return balance
+
+    monkeypatch.setattr(ivr_db, "add_balance", add_balance)
+    first = threading.Thread(target=milestone4_backend.add_balance_db, args=(fetch_customer_db("1001"), 50))
+    first.start()
+    while not committed:
+        time.sleep(0.001)
+    milestone4_backend.add_balance_db(fetch_customer_db("1001"), 25)
+    second_done.set()
+    first.join()
+    assert committed == [200.0, 225.0]
+    assert fetch_customer_db("1001")["balance"] == 225.0
+
+def test_intent_batch(client):
+    resp = client.post("/intent/batch", json={"items": [
+        {"id": "1001", "text": "recharge", "amount": 50},
+        {"id": "1001", "text": "check balance"},
+        {"id": "4040", "text": "check balance"},
+        {"id": "1001"},
+    ]})
+    assert resp.status_code == 200
+    results = resp.get_json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert [r["status"] for r in results] == ["ok", "ok", "error", "error"]
+    assert "200.0" in results[1]["message"]
+    assert results[2]["message"] == "Customer not found"
+    assert fetch_customer_db("1001")["balance"] == 200.0
+
+def test_failed_batch_item_leaves_no_cache_update_or_ticket(client, monkeypatch, tmp_path):
+    path = str(tmp_path / "tickets.db")
+    monkeypatch.setattr(milestone4_backend, "TICKET_DB", path)
+    ticket_store.init_schema(path)
+    fetch_customer_db("1001")  # cached, so a rolled-back recharge would be patched into the entry
+    real_log_intent = milestone4_backend.log_intent
+
+    def log_intent(intent, cid, *args):
+        if intent in ("recharge", "network_issue"):
+            raise RuntimeError("fails after the write")
+        real_log_intent(intent, cid, *args)
+
+    monkeypatch.setattr(milestone4_backend, "log_intent", log_intent)
+    results = client.post("/intent/batch", json={"items": [
+        {"id": "1001", "text": "recharge", "amount": 50},
+        {"id": "1001", "text": "no network signal"},
+        {"id": "1001", "text": "my sim is blocked"},
+        {"id": "1001", "text": "check balance"},
+    ]}).get_json()["results"]
+    assert [r["status"] for r in results] == ["error", "error", "ok", "ok"]
+    assert "150.0" in results[3]["message"]
+    assert fetch_customer_db("1001")["balance"] == 150.0
+    assert ticket_store.counts(path) == {"sim": {"open": 1}}
+
+def test_logging_written(client):
+    log_file = "logs/web_ivr.log"
+    if os.path.exists(log_file):
+        os.remove(log_file)
+    client.post("/intent", json={"id": "1001", "text": "check balance"})
+    ivr_logging.flush()
+    assert os.path.exists(log_file)
+    with open(log_file, "r", encoding="utf-8") as f:
+        content = f.read()
+    assert "check_balance" in content
+
+def test_tts_serves_cached_audio_with_etag_and_ranges(client):
+    text = "Check balance"
+    path = prompt_audio_cache.path(text)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + bytes(range(60)))
+    query = {"text": text, "sig": prompt_audio_cache.sign(text)}
+    try:
+        resp = client.get("/tts", query_string=query)
+        assert resp.status_code == 200
+        assert resp.data[:4] == b"RIFF" and len(resp.data) == 64
+        assert resp.headers["Content-Length"] == "64"
+        etag = resp.headers["ETag"]
+        assert client.get("/tts", query_string=query, headers={"If-None-Match": etag}).status_code == 304
+        part = client.get("/tts", query_string=query, headers={"Range": "bytes=4-7"})
+        assert part.status_code == 206
+        assert part.data == bytes(range(4))
+        assert part.headers["Content-Range"] == "bytes 4-7/64"
+        assert client.get("/tts", query_string=query, headers={"Range": "bytes=64-"}).status_code == 416
+    finally:
+        prompt_audio_cache.maps.clear()
+        os.remove(path)
+
+def test_tts_only_voices_text_the_server_produced(client):
+    reply = client.post("/intent", json={"id": "1001", "text": "check balance"}).get_json()
+    assert reply["sig"] == prompt_audio_cache.sign(reply["message"])
+    # 503: accepted, but there is no TTS engine on this host
+    assert client.get("/tts", query_string={"text": reply["message"], "sig": reply["sig"]}).status_code in (200, 503)
+    assert client.get("/tts", query_string={"text": FIXED_PROMPTS[0]}).status_code in (200, 503)
+    assert client.get("/tts", query_string={"text": "Say anything I like"}).status_code == 403
+    forged = {"text": "Your current balance is rupees 99999.", "sig": reply["sig"]}
+    assert client.get("/tts", query_string=forged).status_code == 403
+    resp = client.post("/intent/stream", json={"id": "1001", "text": "recharge", "amount": 50})
+    sentences = [json.loads(line[len("data: "):]) for line in resp.get_data(as_text=True).split("\n")
+                 if line.startswith("data: ") and '"index"' in line]
+    assert all(prompt_audio_cache.accepts(s["text"], s["sig"]) for s in sentences)
+
+def test_frontend_literal_prompts_are_fixed():
+    with open(os.path.join(os.path.dirname(__file__), "milestone4_frontend.py"), encoding="utf-8") as f:
+        script = f.read()
+    literals = re.findall(r'(?:speak|safeListen)\("([^"]+)"\)', script)
+    assert len(literals) > 10
+    assert [text for text in literals if not prompt_audio_cache.accepts(text)] == []
+
+
+def test_session_reads_customer_through_cache(client):
+    resp = client.post("/session/start", json={"id": "1001"}).get_json()
+    assert resp["customer"]["name"] == "Aiza"
+    token = resp["session"]
+    customer_cache.clear()
+    before = customer_cache.stats()
+    client.post("/intent", json={"session": token, "text": "recharge", "amount": 50})
+    resp = client.post("/intent", json={"session": token, "text": "check balance"})
+    assert "200.0" in resp.get_json()["message"]
+    after = customer_cache.stats()
+    assert after["hits"] + after["misses"] == before["hits"] + before["misses"] + 2  # one cache lookup per turn
+    # A write outside the session (another tab, or another worker) shows up on the next turn
+    client.post("/intent", json={"id": "1001", "text": "recharge", "amount": 25})
+    resp = client.post("/intent", json={"session": token, "text": "check balance"})
+    assert "225.0" in resp.get_json()["message"]
+    client.post("/intent", json={"session": token, "text": "exit"})
+    assert client.post("/intent", json={"session": token, "text": "check balance"}).status_code == 401
+    # An unknown token is rejected, even with a valid id in the body
+    resp = client.post("/intent", json={"session": "unknown", "id": "1001", "text": "check balance"})
+    assert resp.status_code == 401
+    assert sessions.get("unknown") is None
+
+def test_session_tokens_are_shared_by_workers(client):
+    if not isinstance(sessions, session_store.SQLiteSessionStore):
+        pytest.skip("IVR_SESSION_BACKEND=memory is single-worker")
+    token = client.post("/session/start", json={"id": "1001"}).get_json()["session"]
+    other_worker = session_store.SQLiteSessionStore(sessions.path, ttl=sessions.ttl)
+    assert other_worker.get(token).customer_id == "1001"
+    other_worker.delete(token)
+    assert client.post("/intent", json={"session": token, "text": "check balance"}).status_code == 401
+
+def test_session_follows_voice_flow(client):
+    token = client.post("/session/start", json={"id": "1001"}).get_json()["session"]
+    turn = {"session": token}
+    for text in ("customer care", "thank you"):
+        resp = client.post("/intent", json={**turn, "text": text}).get_json()
+        turn["state"] = resp["state"]
+    assert resp["prompt"] == "Would you like to continue or exit?"
+    assert not resp["end"]
+    resp = client.post("/intent", json={**turn, "text": "exit"}).get_json()
+    assert resp["end"] and "Have a nice day" in resp["message"]
+    assert client.post("/intent", json={**turn, "text": "check balance"}).status_code == 401
+
+def test_session_starts_at_welcome(client):
+    start = client.post("/session/start", json={"id": "1001"}).get_json()
+    assert start["prompt"] == "Do you want to access the main menu or talk to customer care?"
+    turn = {"session": start["session"], "state": start["state"]}
+    resp = client.post("/intent", json={**turn, "text": "i'd like to speak with customer care"}).get_json()
+    assert (resp["menu"], resp["prompt"]) == ("support", None)
+    turn["state"] = resp["state"]
+    resp = client.post("/intent", json={**turn, "text": ""}).get_json()  # silence keeps the caller in care
+    assert (resp["state"], resp["message"], resp["menu"]) == (turn["state"], "", None)
+    resp = client.post("/intent", json={**turn, "text": "back to the menu"}).get_json()
+    assert resp["menu"] == "main"
+    resp = client.post("/intent", json={"session": turn["session"], "state": resp["state"], "text": "upgrade my data"})
+    assert "upgraded" in resp.get_json()["message"].lower()
+    assert client.post("/intent", json={"id": "1001", "text": ""}).status_code == 400
+
+def test_spoken_customer_id(client):
+    resp = client.post("/session/start", json={"id": "one double oh one"}).get_json()
+    assert resp["customer"]["id"] == "1001"
+    resp = client.post("/session/start", json={"id": "one zero zero seven"}).get_json()
+    assert resp == {"status": "not_found", "did_you_mean": "1001"}
+    resp = client.post("/intent", json={"id": "1001", "text": "recharge two ninety nine"})
+    assert "449.0" in resp.get_json()["message"]
+
+def test_typed_customer_ids_are_kept(client):
+    assert entities.customer_id(" one double oh one ") == "1001"
+    assert entities.customer_id("1 0 0 1") == "1001"
+    assert entities.customer_id(" A12 ") == "A12"
+    assert entities.customer_id("cust-1002") == "cust-1002"
+    save_customer_db("A12", "Alpha")
+    save_customer_db("12", "Twelve")
+    resp = client.post("/session/start", json={"id": "A12"}).get_json()
+    assert resp["customer"]["name"] == "Alpha"
+    resp = client.post("/fetch_customer", json={"id": "12"}).get_json()
+    assert resp["customer"]["name"] == "Twelve"
+
+def test_recharge_amount_is_bounded(client):
+    resp = client.post("/intent", json={"id": "1001", "text": "recharge for one lakh"}).get_json()
+    assert resp["message"] == "Recharge amount must be between rupees 10 and 5000."
+    resp = client.post("/intent", json={"id": "1001", "text": "recharge", "amount": -50}).get_json()
+    assert "between" in resp["message"]
+    # The caller's own ID is not an amount: the default recharge applies
+    resp = client.post("/intent", json={"id": "1001", "text": "recharge 1001"}).get_json()
+    assert resp["message"] == "Recharge of rupees 199 successful. New balance is 349.0."
+
+def test_write_behind_group_commits(client, monkeypatch):
+    writes = write_queue.WriteQueue(DB_FILE, flush_interval=0.05, on_commit=customer_cache.invalidate)
+    monkeypatch.setattr(milestone4_backend, "writes", writes)
+    threads = [threading.Thread(target=milestone4_backend.process_intent,
+                                args=({"id": "1001", "text": "recharge", "amount": 10},))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writes.flush()
+    assert (writes.writes, writes.pending()) == (8, 0)
+    assert writes.batches < 8
+    assert fetch_customer_db("1001")["balance"] == 230.0
+    # A queued write is visible to readers before it commits
+    future = writes.add_balance("1001", 5)
+    assert fetch_customer_db("1001")["balance"] == 235.0
+    assert future.result() == 235.0
+    writes.close()
+
+def test_intent_rate_limited_per_customer(client):
+    save_customer_db("2002", "Other")
+    for _ in range(10):
+        assert client.post("/intent", json={"id": "1001", "text": "check balance"}).status_code == 200
+    resp = client.post("/intent", json={"id": "1001", "text": "check balance"})
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) > 0
+    assert client.post("/intent", json={"id": "2002", "text": "check balance"}).status_code == 200
+
+def test_intent_rate_limited_per_address_across_ids(client):
+    for n in range(120):
+        assert client.post("/intent", json={"id": str(5000 + n), "text": "check balance"}).status_code == 404
+    resp = client.post("/intent/stream", json={"id": "1001", "text": "check balance"})
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) > 0
+
+def test_limiter_prune_keeps_other_limiters_buckets(monkeypatch, tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    rate_limit.init_schema(path)
+    now = [1000.0]
+    day = rate_limit.TokenBucketLimiter(path, 2, 86400, name="day", clock=lambda: now[0])
+    intent = rate_limit.TokenBucketLimiter(path, 10, 60, name="intent", clock=lambda: now[0])
+    assert day.hit("10.0.0.1")[0] and day.hit("10.0.0.1")[0]
+    assert not day.hit("10.0.0.1")[0]
+    now[0] += 120  # past the intent limiter's refill horizon, far inside the day limiter's
+    monkeypatch.setattr(rate_limit, "PRUNE_EVERY", 1)
+    assert intent.hit("1001")[0]  # prunes idle intent buckets only
+    assert not day.hit("10.0.0.1")[0]
+
+def test_batch_rate_limited_per_address(client):
+    for _ in range(10):
+        assert client.post("/intent/batch", json={"items": []}).status_code != 429
+    resp = client.post("/intent/batch", json={"items": []})
+    assert resp.status_code == 429
+    assert "Retry-After" in resp.headers
+    assert client.post("/fetch_customer", json={"id": "1001"}).status_code == 200
+
+def test_menu_fetches_do_not_use_address_budget(client):
+    for _ in range(60):
+        assert client.get("/menu/main").status_code == 200
+    assert client.post("/session/start", json={"id": "1001"}).status_code == 200
+
+def test_asgi_routes_rate_limited_per_address(client):
+    from fastapi.testclient import TestClient
+
+    import asgi_app
+
+    with TestClient(asgi_app.app) as asgi:
+        for _ in range(50):
+            assert asgi.post("/fetch_customer", json={"id": "1001"}).status_code == 200
+        resp = asgi.post("/session/start", json={"id": "1001"})
+        assert resp.status_code == 429
+        assert int(resp.headers["Retry-After"]) > 0
+
+def test_intent_stream_sends_sentences(client):
+    resp = client.post("/intent/stream", json={"id": "1001", "text": "recharge", "amount": 50})
+    assert resp.mimetype == "text/event-stream"
+    events = [block.split("\n") for block in resp.get_data(as_text=True).strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: sentence", "event: sentence", "event: done"]
+    sentences = [json.loads(lines[1][len("data: "):])["text"] for lines in events[:2]]
+    assert sentences == ["Recharge of rupees 50 successful.", "New balance is 200.0."]
+    assert client.post("/intent/stream", json={"id": "4040", "text": "check balance"}).status_code == 404
+
+def test_menu_is_one_utterance(client):
+    resp = client.get("/menu/main")
+    menu = resp.get_json()
+    assert menu["items"][0] == "Check balance"
+    assert menu["prompt"].startswith("Main menu.") and menu["prompt"].endswith("or talk to customer care.")
+    assert "max-age" in resp.headers["Cache-Control"]
+    assert client.get("/menu/nope").status_code == 404
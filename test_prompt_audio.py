@@ -0,0 +1,44 @@
+# test_prompt_audio.py
+# pytest suite for the web IVR prompt audio cache (prompt_audio.py), without a TTS engine.
+import os
+
+import prompt_audio
+from prompt_audio import PromptAudio
+
+
+def _write(path, size, mtime):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+
+def test_signatures_cover_only_server_text(tmp_path):
+    audio = PromptAudio(str(tmp_path), prerender=["Welcome."], secret=b"k")
+    assert audio.accepts("Welcome.")
+    sig = audio.sign("Your balance is 10.")
+    assert audio.accepts("Your balance is 10.", sig)
+    assert not audio.accepts("Your balance is 99.", sig)
+    assert not audio.accepts("Your balance is 10.")
+    assert PromptAudio(str(tmp_path), secret=b"k").sign("x") == audio.sign("x")  # workers sharing IVR_TTS_SECRET
+    assert PromptAudio(str(tmp_path), secret=b"other").sign("x") != audio.sign("x")
+    assert prompt_audio.audio_response(audio, "Your balance is 99.", sig=sig) == (b"", 403, {})
+
+def test_prune_evicts_least_recently_used_replies(tmp_path):
+    audio = PromptAudio(str(tmp_path), prerender=["Welcome."], max_cache_bytes=250)
+    _write(audio.path("Welcome."), 1000, 1)  # fixed prompts are never evicted
+    for i, text in enumerate(["oldest", "older", "newer", "newest"]):
+        _write(audio.path(text), 100, 10 + i)
+    _write(audio.path("older") + ".123.part.wav", 1000, 1)  # a render in progress
+    assert audio.prune() == 2
+    assert [os.path.exists(audio.path(t)) for t in ["Welcome.", "oldest", "older", "newer", "newest"]] == \
+        [True, False, False, True, True]
+    assert os.path.exists(audio.path("older") + ".123.part.wav")
+
+def test_cached_reply_is_served_and_marked_recent(tmp_path):
+    audio = PromptAudio(str(tmp_path), max_cache_bytes=150)
+    _write(audio.path("a"), 100, 10)
+    _write(audio.path("b"), 100, 20)
+    sig = audio.sign("a")
+    body, status, headers = prompt_audio.audio_response(audio, "a", sig=sig)
+    assert status == 200 and b"".join(body) == b"\0" * 100
+    assert audio.prune() == 1
+    assert os.path.exists(audio.path("a")) and not os.path.exists(audio.path("b"))
@@ -0,0 +1,78 @@
+# test_session_store.py
+# pytest suite for call-session storage (session_store.py), both backends.
+import threading
+
+import pytest
+
+import session_store
+from session_store import CallSession, MemorySessionStore, SQLiteSessionStore
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store_and_clock(request, tmp_path):
+    clock = Clock()
+    if request.param == "memory":
+        return MemorySessionStore(ttl=60, clock=clock), clock
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60, clock=clock), clock
+
+def test_round_trip_and_ttl_expiry(store_and_clock):
+    store, clock = store_and_clock
+    store.save(CallSession("CA1", "1001", step="recharge"))
+    session = store.get("CA1")
+    assert (session.customer_id, session.step, session.expires_at) == ("1001", "recharge", 1060.0)
+    clock.now = 1059.0
+    assert store.get("CA1") is not None
+    clock.now = 1060.0
+    assert store.get("CA1") is None  # expired sessions are never returned, swept or not
+    store.save(CallSession("CA2", "1002"))
+    store.delete("CA2")
+    assert store.get("CA2") is None and store.get("missing") is None
+
+def test_sweep_removes_only_expired(store_and_clock):
+    store, clock = store_and_clock
+    for i in range(3):
+        store.save(CallSession(f"CA{i}", "1001"))
+    clock.now += 30
+    store.save(CallSession("CA0", "1001"))  # renewed: now expires last
+    clock.now += 31
+    assert store.sweep() == 2
+    assert len(store) == 1 and store.get("CA0").customer_id == "1001"
+
+def test_saves_sweep_periodically(monkeypatch):
+    monkeypatch.setattr(session_store, "SWEEP_EVERY", 4)
+    clock = Clock()
+    store = MemorySessionStore(ttl=60, clock=clock)
+    for i in range(3):
+        store.save(CallSession(f"old{i}", "1001"))
+    clock.now += 61
+    store.save(CallSession("new", "1002"))  # fourth write triggers the sweep
+    assert len(store) == 1
+
+def test_memory_store_survives_concurrent_saves(monkeypatch):
+    monkeypatch.setattr(session_store, "SWEEP_EVERY", 8)
+    clock = Clock()
+    store = MemorySessionStore(ttl=0.001, clock=lambda: clock.now)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(2000):
+                clock.now += 0.0005
+                store.save(CallSession(f"CA{n}-{i % 50}", "1001"))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
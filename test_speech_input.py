@@ -0,0 +1,45 @@
+# test_speech_input.py
+# pytest suite for speech input (speech_input.py): phrase gating and scripted replay.
+import pytest
+import speech_recognition as sr
+
+import speech_input
+from speech_input import PhraseQueue, ReplayInput
+
+
+def _phrase(seconds):
+    return sr.AudioData(b"\0" * int(16000 * 2 * seconds), 16000, 2)
+
+def test_phrases_begun_before_listen_are_dropped():
+    now = [100.0]
+    phrases = PhraseQueue(lead_in=0.5, clock=lambda: now[0])
+    echo, answer = _phrase(2.0), _phrase(1.5)
+    prompt_ended = 99.5
+    phrases.put(echo)  # the prompt's echo, still being captured when the prompt ended
+    now[0] = 102.0
+    phrases.put(answer)  # speech began at 101.0, after the prompt
+    assert phrases.get(since=prompt_ended, timeout=0.1) is answer
+    with pytest.raises(Exception):
+        phrases.get(since=prompt_ended, timeout=0.01)
+    phrases.put(echo)
+    assert phrases.get(timeout=0.1) is echo  # no gate: everything captured is returned
+
+def test_replay_input_turns():
+    replay = ReplayInput(["Check Balance", "", "exit"])
+    assert replay.listen() == "check balance"
+    with pytest.raises(sr.UnknownValueError):
+        replay.listen()  # a blank line is a turn where nothing was heard
+    assert replay.listen() == "exit"
+    with pytest.raises(EOFError):
+        replay.listen()
+    assert len(replay.latencies) == 3
+
+def test_create_input_replays_script(monkeypatch, tmp_path):
+    script = tmp_path / "turns.txt"
+    script.write_text("one double oh one\n\nRecharge\n", encoding="utf-8")
+    monkeypatch.setenv("IVR_SPEECH_REPLAY", str(script))
+    source = speech_input.create_input()
+    assert isinstance(source, ReplayInput)
+    assert [source.listen(), source.items[1], source.position] == ["one double oh one", "", 1]
+    with pytest.raises(ValueError):
+        speech_input.create_backend("nonexistent")
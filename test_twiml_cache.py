@@ -0,0 +1,36 @@
+# test_twiml_cache.py
+# pytest suite for precompiled TwiML (twiml_cache.py): cached bytes must match VoiceResponse exactly.
+import pytest
+
+import milestone2
+from twiml_cache import TwimlTemplate, render_static
+
+AWKWARD = 'Tom & Jerry\'s <"Unlimited"> plan'
+
+
+def _fresh(build, *args):
+    return str(build(*args)).encode("utf-8")
+
+@pytest.mark.parametrize("name", ["_welcome", "_session_not_found", "_report_issue", "_invalid_input",
+                                  "_issue_recorded"])
+def test_static_documents_match_voice_response(name):
+    build = getattr(milestone2, name)
+    assert render_static(build) == _fresh(build)
+
+@pytest.mark.parametrize("template, build, values", [
+    (milestone2.BALANCE_TWIML, milestone2._balance, {"balance": "500MB"}),
+    (milestone2.BALANCE_TWIML, milestone2._balance, {"balance": AWKWARD}),
+    (milestone2.RECHARGE_PROMPT_TWIML, milestone2._recharge_prompt, {"plan": AWKWARD}),
+    (milestone2.RECHARGE_DONE_TWIML, milestone2._recharge_done, {"amount": "199", "name": AWKWARD}),
+    (milestone2.RECHARGE_DONE_TWIML, milestone2._recharge_done, {"amount": "<&>", "name": '"Bob"'}),
+])
+def test_templates_match_voice_response(template, build, values):
+    assert template.render(**values) == _fresh(build, *values.values())
+
+def test_escaped_value_is_well_formed():
+    body = milestone2.BALANCE_TWIML.render(balance=AWKWARD)
+    assert b"Tom &amp; Jerry's &lt;\"Unlimited\"&gt; plan" in body
+
+def test_template_fields_must_match_placeholders():
+    with pytest.raises(ValueError):
+        TwimlTemplate(lambda balance, plan: milestone2._balance(balance), "balance", "plan")
@@ -0,0 +1,162 @@
+# ticket_store.py
+# Customer issue tickets shared by the Twilio (milestone2) and web
+# (milestone4) IVRs.
+#
+# Tickets live in one SQLite file (pooled connections via ivr_db), appended
+# in id order and never rewritten except for their status. Every filter the
+# query API offers has an index ending in id, so page() walks one index
+# range from a keyset cursor ("tickets older than id N") instead of counting
+# past OFFSET rows, and a deep page costs the same as the first one.
+# Per-category, per-status totals sit in ticket_counts, kept current by
+# triggers in the same transaction as each insert or status change, so
+# counts() never scans the tickets.
+import os
+import time
+
+import ivr_db
+
+DEFAULT_PATH = os.environ.get("IVR_TICKET_DB", "ivr_tickets.db")
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# intent -> ticket category
+CATEGORIES = {
+    "network_issue": "network",
+    "sim_issue": "sim",
+    "recharge_issue": "recharge",
+    "recharge": "recharge",
+}
+GENERAL = "general"
+STATUSES = ("open", "resolved")
+
+TICKET_FIELDS = ("id", "customer_id", "category", "status", "channel", "summary", "created_at")
+
+# ------------------ SQL ------------------
+SQL_CREATE_TICKETS = """
+    CREATE TABLE IF NOT EXISTS tickets (
+        id INTEGER PRIMARY KEY,
+        customer_id TEXT NOT NULL,
+        category TEXT NOT NULL,
+        status TEXT NOT NULL,
+        channel TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        idempotency_key TEXT
+    )
+"""
+SQL_CREATE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_tickets_customer ON tickets (customer_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_category ON tickets (category, id)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status, id)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets (created_at, id)",
+    # a retried request files its ticket once
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_tickets_idempotency ON tickets (customer_id, idempotency_key)
+       WHERE idempotency_key IS NOT NULL""",
+)
+SQL_CREATE_COUNTS = """
+    CREATE TABLE IF NOT EXISTS ticket_counts (
+        category TEXT NOT NULL,
+        status TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (category, status)
+    ) WITHOUT ROWID
+"""
+SQL_CREATE_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS tickets_count_insert AFTER INSERT ON tickets BEGIN
+           INSERT INTO ticket_counts (category, status, count) VALUES (NEW.category, NEW.status, 1)
+           ON CONFLICT (category, status) DO UPDATE SET count = count + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS tickets_count_status AFTER UPDATE OF status ON tickets
+       WHEN OLD.status != NEW.status BEGIN
+           UPDATE ticket_counts SET count = count - 1 WHERE category = OLD.category AND status = OLD.status;
+           INSERT INTO ticket_counts (category, status, count) VALUES (NEW.category, NEW.status, 1)
+           ON CONFLICT (category, status) DO UPDATE SET count = count + 1;
+       END""",
+)
+SQL_ADD_TICKET = """
+    INSERT INTO tickets (customer_id, category, status, channel, summary, created_at, idempotency_key)
+    VALUES (?, ?, 'open', ?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+    RETURNING id
+"""
+SQL_FETCH_IDEMPOTENT = "SELECT id FROM tickets WHERE customer_id=? AND idempotency_key=?"
+SQL_SET_STATUS = "UPDATE tickets SET status=? WHERE id=? RETURNING id"
+SQL_FETCH_COUNTS = "SELECT category, status, count FROM ticket_counts WHERE count > 0"
+SQL_PAGE = "SELECT id, customer_id, category, status, channel, summary, created_at FROM tickets{} ORDER BY id DESC LIMIT ?"
+
+# query parameter -> condition; the order is fixed so every combination is one cached statement
+FILTERS = (
+    ("customer_id", "customer_id = ?"),
+    ("category", "category = ?"),
+    ("status", "status = ?"),
+    ("since", "created_at >= ?"),
+    ("until", "created_at < ?"),
+    ("before", "id < ?"),  # keyset cursor: the last id of the previous page
+)
+
+
+def init_schema(path=DEFAULT_PATH):
+    with ivr_db.transaction(path) as conn:
+        conn.execute(SQL_CREATE_TICKETS)
+        for sql in SQL_CREATE_INDEXES:
+            conn.execute(sql)
+        conn.execute(SQL_CREATE_COUNTS)
+        for sql in SQL_CREATE_TRIGGERS:
+            conn.execute(sql)
+
+
+def category_for(intent):
+    return CATEGORIES.get(intent, GENERAL)
+
+
+def row_to_ticket(row):
+    return dict(zip(TICKET_FIELDS, row))
+
+
+# ------------------ Writes ------------------
+def add(path, customer_id, category, summary, channel, idempotency_key=None):
+    """File an open ticket and return its id; a retry with the same key returns the first ticket's id."""
+    conn = ivr_db.connect(path)
+    row = conn.execute(SQL_ADD_TICKET, (customer_id, category, channel, summary, time.time(),
+                                        idempotency_key)).fetchone()
+    if row is None:  # idempotency key already used
+        row = conn.execute(SQL_FETCH_IDEMPOTENT, (customer_id, idempotency_key)).fetchone()
+    return row[0]
+
+
+def set_status(path, ticket_id, status):
+    """Move a ticket to `status`; returns False if there is no such ticket."""
+    if status not in STATUSES:
+        raise ValueError(f"unknown ticket status {status!r}")
+    return ivr_db.connect(path).execute(SQL_SET_STATUS, (status, ticket_id)).fetchone() is not None
+
+
+# ------------------ Queries ------------------
+def page(path, limit=PAGE_SIZE, **filters):
+    """Newest tickets matching `filters` (see FILTERS); returns (tickets, cursor).
+
+    Pass the returned cursor as `before` for the next page; it is None on the
+    last page.
+    """
+    unknown = set(filters) - {name for name, _ in FILTERS}
+    if unknown:
+        raise ValueError(f"unknown ticket filter {', '.join(sorted(unknown))}")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    clauses, params = [], []
+    for name, clause in FILTERS:
+        if filters.get(name) is not None:
+            clauses.append(clause)
+            params.append(filters[name])
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    # one extra row tells whether another page follows
+    rows = ivr_db.connect(path).execute(SQL_PAGE.format(where), (*params, limit + 1)).fetchall()
+    tickets = [row_to_ticket(row) for row in rows[:limit]]
+    return tickets, tickets[-1]["id"] if len(rows) > limit else None
+
+
+def counts(path):
+    """{category: {status: tickets}} from the counters."""
+    found = {}
+    for category, status, count in ivr_db.connect(path).execute(SQL_FETCH_COUNTS):
+        found.setdefault(category, {})[status] = count
+    return found
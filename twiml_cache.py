@@ -0,0 +1,37 @@
+# twiml_cache.py
+# Render TwiML documents once instead of on every webhook.
+#
+# Static documents are built with the Twilio VoiceResponse API at import
+# and kept as bytes. Documents with a few dynamic fields are built once with
+# placeholder tokens, split into literal chunks around them, and later
+# filled by joining the chunks with the XML-escaped values, which yields the
+# same bytes VoiceResponse would have produced.
+import re
+from xml.sax.saxutils import escape
+
+_TOKEN = "@@{}@@"
+_TOKEN_RE = re.compile("@@([a-z_]+)@@")
+
+
+def render_static(build):
+    """Return the serialized TwiML of `build()` (a VoiceResponse) as bytes."""
+    return str(build()).encode("utf-8")
+
+
+class TwimlTemplate:
+    def __init__(self, build, *fields):
+        """`build` receives one placeholder string per field name and returns a VoiceResponse."""
+        xml = str(build(*(_TOKEN.format(f) for f in fields)))
+        pieces = _TOKEN_RE.split(xml)
+        # split() alternates literal text and captured field names.
+        self.chunks = [p.encode("utf-8") for p in pieces[0::2]]
+        self.fields = pieces[1::2]
+        if set(self.fields) != set(fields):
+            raise ValueError(f"Template fields {fields} do not match placeholders {self.fields}")
+
+    def render(self, **values):
+        out = [self.chunks[0]]
+        for field, chunk in zip(self.fields, self.chunks[1:]):
+            out.append(escape(str(values[field])).encode("utf-8"))
+            out.append(chunk)
+        return b"".join(out)
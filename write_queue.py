@@ -0,0 +1,186 @@
+# write_queue.py
+# Write-behind group commit for customer mutations.
+#
+# Mutations are queued in-process and applied by one writer thread, which
+# takes everything queued while its previous commit ran (waiting up to
+# FLUSH_INTERVAL for more, at most MAX_BATCH writes) and commits it as one
+# transaction, each write in its own savepoint so a failing write is
+# rolled back alone. Concurrent turns then share one commit instead of
+# queueing for SQLite's write lock one by one.
+#
+# Every write returns a Future that completes once its batch has committed.
+# Until then the write is kept as a pending change, and read() layers the
+# pending changes of a customer over the committed record, so readers in
+# this process see their writes before they reach the database.
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import ivr_db
+
+FLUSH_INTERVAL = float(os.environ.get("IVR_WRITE_FLUSH_MS", "0")) / 1000
+MAX_BATCH = int(os.environ.get("IVR_WRITE_MAX_BATCH", "256"))
+
+
+class Write:
+    def __init__(self, cid, apply, change, key=None):
+        self.cid = cid
+        self.apply = apply  # runs the write on the writer's connection; result goes to the future
+        self.change = change  # record -> record as it will be once committed (record may be None)
+        self.key = key
+        self.future = Future()
+
+
+class WriteQueue:
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH, on_commit=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.on_commit = on_commit  # called with each committed customer id, before readers see it
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = {}  # cid -> [Write] not yet committed, in submit order
+        self._by_key = {}  # (cid, idempotency key) -> pending Write
+        self._commits = 0  # bumped under _lock whenever pending writes settle
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.writes = 0
+
+    # ------------------ Submitting ------------------
+    def submit(self, write):
+        with self._lock:
+            if write.key:
+                queued = self._by_key.get((write.cid, write.key))
+                if queued:  # a retry of a write still in the queue
+                    return queued.future
+                self._by_key[write.cid, write.key] = write
+            self._pending.setdefault(write.cid, []).append(write)
+            self._start()
+        self._queue.put(write)
+        return write.future
+
+    def add_balance(self, cid, amount, idempotency_key=None):
+        """Future for the new balance (None if the customer does not exist)."""
+        def change(record):
+            return record and {**record, "balance": record["balance"] + amount}
+        return self.submit(Write(cid, lambda: ivr_db.add_balance(self.path, cid, amount, idempotency_key),
+                                 change, idempotency_key))
+
+    def set_plan(self, cid, plan, data_left, idempotency_key=None):
+        """Future for the plan name (None if the customer does not exist)."""
+        def change(record):
+            return record and {**record, "plan": plan, "data_left": data_left}
+        return self.submit(Write(cid, lambda: ivr_db.set_plan(self.path, cid, plan, data_left, idempotency_key),
+                                 change, idempotency_key))
+
+    def save_customer(self, cid, name, plan, balance, phone, data_left):
+        record = dict(zip(ivr_db.CUSTOMER_FIELDS, (cid, name, plan, balance, phone, data_left)))
+        return self.submit(Write(cid, lambda: ivr_db.save_customer(self.path, *record.values()),
+                                 lambda _: dict(record)))
+
+    # ------------------ Reading ------------------
+    def read(self, cid, fetch):
+        """`fetch(cid)` (the committed record or None) with this process's pending writes applied.
+
+        The fetch runs outside the lock; if a batch committed meanwhile the
+        record may already include writes that are no longer pending, so it
+        is fetched again.
+        """
+        while True:
+            seen = self._commits
+            record = fetch(cid)
+            with self._lock:
+                if self._commits == seen:
+                    for write in self._pending.get(cid, ()):
+                        record = write.change(record)
+                    return record
+
+    def pending(self):
+        with self._lock:
+            return sum(map(len, self._pending.values()))
+
+    # ------------------ Writer ------------------
+    def _start(self):
+        if self._thread is None or self._pid != os.getpid():  # not inherited across a fork
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="ivr-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    write = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if write is None:
+                    stop = True
+                    break
+                batch.append(write)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        conn = ivr_db.connect(self.path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            outcomes = []
+            for write in batch:
+                try:
+                    with ivr_db.transaction(self.path):  # savepoint per write
+                        outcomes.append((write.apply(), None))
+                except Exception as e:
+                    outcomes.append((None, e))
+            with self._lock:
+                conn.execute("COMMIT")
+                self._settle(batch)
+        except Exception as e:  # the batch as a whole failed: nothing was written
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(None, e)] * len(batch)
+            with self._lock:
+                self._settle(batch)
+        for write, (result, error) in zip(batch, outcomes):
+            if error is not None:
+                write.future.set_exception(error)
+            else:
+                write.future.set_result(result)
+
+    def _settle(self, batch):
+        for write in batch:
+            writes = self._pending.get(write.cid)
+            if writes:
+                writes.remove(write)
+                if not writes:
+                    del self._pending[write.cid]
+            if write.key:
+                self._by_key.pop((write.cid, write.key), None)
+        if self.on_commit:
+            for cid in {write.cid for write in batch}:
+                self.on_commit(cid)
+        self._commits += 1
+        self.batches += 1
+        self.writes += len(batch)
+
+    def flush(self, timeout=None):
+        """Wait until everything submitted so far has committed (or failed)."""
+        with self._lock:
+            futures = [write.future for writes in self._pending.values() for write in writes]
+        for future in futures:
+            future.exception(timeout)
+
+    def close(self):
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None